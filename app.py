@@ -1,21 +1,133 @@
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, Response, send_from_directory, jsonify
 from flask_cors import CORS
-from app.core.document_loader import DocumentLoader
-from app.core.text_splitter import TextSplitter
+from app.core.cache import create_response_cache
 from app.core.embeddings import EmbeddingGenerator
-from app.core.vector_store import VectorStore
+from app.core.index_builder import IndexBuilder
+from app.core.metrics import PROMETHEUS_CONTENT_TYPE, registry
 from app.services.retrieval_service import RetrievalService
 from app.services.translation_service import TranslationService
 from app.services.chat_service import ChatService
+from app.services.reload_service import ReloadService
+from app.services.startup_service import StartupService
 from app.api.routes import api, init_api
+from typing import List, Optional, Tuple
 import logging
 import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_app():
-    """Create and configure the Flask application."""
+# Background services held back by build_services(start_background=False)
+_deferred_background: List[ReloadService] = []
+
+def build_services(start_background: bool = True,
+                   startup: Optional[StartupService] = None) -> Tuple[ChatService, ReloadService]:
+    """
+    Load the knowledge base and wire up the services behind the API.
+    With `start_background=False` no threads are started (the file watcher is left to
+    start_background_services()), so the services can be built before forking workers.
+    `startup` is told as each stage begins, for the readiness probe.
+    """
+    begin = startup.begin if startup is not None else lambda stage: None
+    begin("loading_model")
+    model_name = os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2')
+    embedding_generator = EmbeddingGenerator(
+        model_name,
+        backend=os.environ.get('EMBEDDING_BACKEND', 'torch'),
+        model_dir=os.environ.get('EMBEDDING_MODEL_DIR') or None,
+        onnx_file=os.environ.get('EMBEDDING_ONNX_FILE') or None
+    )
+    
+    translation_service = TranslationService(
+        max_workers=int(os.environ.get('TRANSLATION_WORKERS', '8')),
+        min_confidence=float(os.environ.get('LANGDETECT_MIN_CONFIDENCE', '0.9'))
+    )
+    
+    # Load the prebuilt index snapshot, rebuilding it only if the data or settings changed
+    begin("loading_index")
+    logger.info("Loading vector store...")
+    index_builder = IndexBuilder(
+        os.environ.get('DATA_DIR', 'data'),
+        os.environ.get('INDEX_DIR', 'index'),
+        model_name=model_name,
+        chunk_size=int(os.environ.get('CHUNK_SIZE', '500')),
+        chunk_overlap=int(os.environ.get('CHUNK_OVERLAP', '50')),
+        load_chunksize=int(os.environ.get('LOAD_CHUNKSIZE', '5000')),
+        load_workers=int(os.environ.get('LOAD_WORKERS', '0')) or None,
+        index_type=os.environ.get('INDEX_TYPE', 'flat_ip'),
+        index_params={
+            "nlist": int(os.environ.get('IVF_NLIST', '1024')),
+            "hnsw_m": int(os.environ.get('HNSW_M', '32')),
+            "ef_construction": int(os.environ.get('HNSW_EF_CONSTRUCTION', '200'))
+        },
+        mmap=os.environ.get('INDEX_MMAP', 'false').lower() == 'true',
+        # Ingests translate the strings of new documents into the precomputed phrasebook
+        translation_service=translation_service,
+        texts_for_document=ChatService.translatable_texts
+    )
+    vector_store = index_builder.load_or_build(embedding_generator)
+    
+    # Initialize services
+    begin("starting_services")
+    retrieval_service = RetrievalService(
+        vector_store,
+        embedding_generator,
+        query_cache_size=int(os.environ.get('QUERY_CACHE_SIZE', '1024')),
+        collapse_documents=os.environ.get('COLLAPSE_DOCUMENTS', 'true').lower() != 'false',
+        fetch_factor=int(os.environ.get('SEARCH_FETCH_FACTOR', '4')),
+        search_params={
+            "nprobe": int(os.environ.get('SEARCH_NPROBE', '16')),
+            "ef_search": int(os.environ.get('SEARCH_EF', '64'))
+        },
+        mode=os.environ.get('RETRIEVAL_MODE', 'dense'),
+        rrf_k=int(os.environ.get('RRF_K', '60')),
+        batch_max_size=int(os.environ.get('QUERY_BATCH_MAX_SIZE', '32')),
+        batch_max_wait_ms=float(os.environ.get('QUERY_BATCH_MAX_WAIT_MS', '0'))
+    )
+    # Tamil strings precomputed by build_index.py --translate ta; live translation covers the rest
+    translation_service.set_phrasebook(index_builder.load_translations(vector_store.version))
+    retrieval_service.add_swap_listener(
+        lambda new_store: translation_service.set_phrasebook(index_builder.load_translations(new_store.version))
+    )
+    # English queries are recognised from the knowledge base's own words without langdetect
+    translation_service.set_vocabulary(vector_store.lexical.postings)
+    retrieval_service.add_swap_listener(lambda new_store: translation_service.set_vocabulary(new_store.lexical.postings))
+    response_cache = create_response_cache(
+        os.environ.get('RESPONSE_CACHE_BACKEND', 'memory'),
+        maxsize=int(os.environ.get('RESPONSE_CACHE_SIZE', '2048')),
+        ttl=float(os.environ.get('RESPONSE_CACHE_TTL', '3600')),
+        path=os.environ.get('RESPONSE_CACHE_PATH', os.path.join(os.environ.get('INDEX_DIR', 'index'), 'response_cache.sqlite3'))
+    )
+    chat_service = ChatService(retrieval_service, translation_service, response_cache)
+    chat_service.register_metrics()
+    
+    # Pick up data changes without a restart: admin endpoint, snapshot follower and an optional file watcher
+    reload_service = ReloadService(
+        index_builder,
+        retrieval_service,
+        embedding_generator,
+        watch_interval=float(os.environ.get('KB_WATCH_INTERVAL', '0')),
+        snapshot_poll_interval=float(os.environ.get('KB_SNAPSHOT_POLL_INTERVAL', '2'))
+    )
+    if start_background:
+        reload_service.start()
+    else:
+        _deferred_background.append(reload_service)
+    return chat_service, reload_service
+
+def start_background_services():
+    """Start the background threads held back by build_services(); call once per worker after forking."""
+    while _deferred_background:
+        _deferred_background.pop().start()
+
+def create_app(start_background: bool = True):
+    """
+    Create and configure the Flask application.
+    The pipeline starts on a background thread, so the server can bind and answer /health
+    while the model and index load; /ready reports progress and the API answers 503 until then.
+    Pass start_background=False when the app is built before forking (gunicorn preload):
+    startup then runs to completion before this returns and starts no threads.
+    """
     app = Flask(__name__)
     
     # Configure CORS based on environment
@@ -26,44 +138,47 @@ def create_app():
         # Enable CORS for all origins in development
         CORS(app, resources={r"/api/*": {"origins": "*"}})
         
+    startup = StartupService(
+        lambda startup: build_services(start_background=start_background, startup=startup),
+        retry_after=int(os.environ.get('STARTUP_RETRY_AFTER', '5'))
+    )
+    
     # Add a root-level health check endpoint for Railway
     @app.route('/health')
     def root_health_check():
         """
-        Health check endpoint at the root level for Railway healthchecks
+        Liveness check at the root level for Railway healthchecks. Answers as soon as the
+        server is up; only fails if the pipeline could not start at all.
         """
+        if startup.failed:
+            return jsonify({"status": "failed", "error": startup.error}), 503
         return jsonify({"status": "healthy"})
+    
+    @app.route('/ready')
+    def readiness_check():
+        """
+        Readiness check: 200 once the pipeline can answer queries, 503 with the current
+        startup stage until then.
+        """
+        return jsonify(startup.status()), 200 if startup.ready else 503
+    
+    @app.route('/metrics')
+    def metrics():
+        """
+        Prometheus scrape endpoint: stage and request latency histograms, outcome counters,
+        cache, index and startup metrics of this worker.
+        """
+        return Response(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
 
     # Initialize components
     try:
-        # Load and process documents
-        logger.info("Loading and processing documents...")
-        document_loader = DocumentLoader("data")
-        documents = document_loader.load_documents()
-        
-        # Split documents into chunks
-        text_splitter = TextSplitter()
-        chunked_documents = text_splitter.split_documents(documents)
-        if not chunked_documents:
-            logger.error("No chunks generated from documents. Please check the input data and chunking logic.")
-            raise ValueError("No chunks generated from documents. Please check the input data and chunking logic.")
-        # Generate embeddings
-        embedding_generator = EmbeddingGenerator()
-        documents_with_embeddings = embedding_generator.generate_embeddings(chunked_documents)
-        if not documents_with_embeddings or documents_with_embeddings[0].get("embedding") is None or len(documents_with_embeddings[0].get("embedding", [])) == 0:
-            logger.error("No embeddings generated for chunks. Please check the embedding model and input data.")
-            raise ValueError("No embeddings generated for chunks. Please check the embedding model and input data.")
-        # Initialize vector store
-        vector_store = VectorStore()
-        vector_store.add_documents(documents_with_embeddings)
-        
-        # Initialize services
-        retrieval_service = RetrievalService(vector_store, embedding_generator)
-        translation_service = TranslationService()
-        chat_service = ChatService(retrieval_service, translation_service)
+        if start_background:
+            startup.start()
+        else:
+            startup.run()
         
         # Initialize API routes
-        init_api(chat_service)
+        init_api(startup)
         app.register_blueprint(api, url_prefix='/api')
         
         # Serve React frontend in production
@@ -1,14 +1,58 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.metrics import begin_request_timings, current_request_timings
 from app.services.chat_service import ChatService
+from app.services.reload_service import ReloadService
+from app.services.startup_service import StartupService
+import hmac
+import json
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 api = Blueprint('api', __name__)
 
-def init_api(chat_service: ChatService):
-    """Initialize the API with required services."""
+# Search-time knobs a request may override, and a cap so one request can't force an exhaustive scan
+SEARCH_PARAMS = {"nprobe", "ef_search"}
+MAX_SEARCH_PARAM = 4096
+
+# Upper bound on queries per /chat/batch request
+MAX_BATCH_QUERIES = 1000
+
+# Keep proxies (nginx, Railway) from buffering or caching the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def init_api(startup: StartupService):
+    """
+    Initialize the API with the services built by `startup`. Until startup has finished,
+    every endpoint answers 503 with a Retry-After header. Responses carry a Server-Timing
+    header with the pipeline stages the request went through.
+    """
+    
+    @api.before_request
+    def start_timings():
+        begin_request_timings()
+        return None
+    
+    @api.after_request
+    def add_server_timing(response):
+        # Streamed responses send their headers before any stage has run
+        timings = current_request_timings()
+        if timings is not None and not response.is_streamed:
+            response.headers["Server-Timing"] = timings.server_timing()
+        return response
+    
+    @api.before_request
+    def require_ready():
+        if request.method == 'OPTIONS':
+            return None
+        unavailable = not_ready(startup)
+        if unavailable is not None:
+            payload, status = unavailable
+            return jsonify(payload), status, {"Retry-After": str(startup.retry_after)}
+        return None
     
     @api.route('/chat', methods=['POST'])
     def chat():
@@ -18,20 +62,200 @@ def init_api(chat_service: ChatService):
         try:
             import json
             from flask import Response
-            data = request.get_json()
-            query = data.get('query')
-            language = data.get('language', 'en')
-            if not query:
-                return Response(json.dumps({"error": "Query is required"}, ensure_ascii=False), mimetype='application/json'), 400
-            response = chat_service.process_query(query, language)
+            try:
+                query, language, search_params = parse_chat_request(request.get_json(silent=True))
+            except ValueError as e:
+                return Response(json.dumps({"error": str(e)}, ensure_ascii=False), mimetype='application/json'), 400
+            response = startup.chat_service.process_query(query, language, search_params)
             return Response(json.dumps(response, ensure_ascii=False), mimetype='application/json')
         except Exception as e:
             logger.error(f"Error in chat endpoint: {str(e)}")
             return Response(json.dumps({"error": "Internal server error"}, ensure_ascii=False), mimetype='application/json'), 500
             
+    @api.route('/chat/stream', methods=['POST'])
+    def chat_stream():
+        """
+        /chat as server-sent events: the English answer as soon as retrieval returns, then each
+        translated field as it completes (see ChatService.stream_query and sse_event).
+        """
+        try:
+            query, language, search_params = parse_chat_request(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        chat_service = startup.chat_service
+        
+        def events():
+            try:
+                for event, payload in chat_service.stream_query(query, language, search_params):
+                    yield sse_event(event, payload)
+            except Exception as e:
+                logger.error(f"Error in chat stream endpoint: {str(e)}")
+                yield sse_event("error", {"error": "Internal server error"})
+        return Response(stream_with_context(events()), mimetype='text/event-stream', headers=SSE_HEADERS)
+            
+    @api.route('/chat/batch', methods=['POST'])
+    def chat_batch():
+        """
+        Handle many chat queries in one request. Takes {"queries": [...], "language": ..., "search": ...}
+        where each query is a string or a {"query", "language"} object. Results come back in
+        order; a failed query gets an "error" entry instead of failing the batch.
+        """
+        try:
+            import json
+            from flask import Response
+            try:
+                items, search_params = parse_batch_request(request.get_json(silent=True))
+            except ValueError as e:
+                return Response(json.dumps({"error": str(e)}, ensure_ascii=False), mimetype='application/json'), 400
+            results = startup.chat_service.process_batch(items, search_params)
+            return Response(json.dumps({"results": results}, ensure_ascii=False), mimetype='application/json')
+        except Exception as e:
+            logger.error(f"Error in chat batch endpoint: {str(e)}")
+            return Response(json.dumps({"error": "Internal server error"}, ensure_ascii=False), mimetype='application/json'), 500
+            
     @api.route('/health', methods=['GET'])
     def health_check():
         """
-        Health check endpoint.
+        Health check endpoint. Reports the live index version so rollouts can confirm
+        that every worker has converged on the same knowledge base.
+        """
+        return jsonify(health_status(startup.chat_service, startup.reload_service))
+        
+    @api.route('/stats', methods=['GET'])
+    def stats():
+        """
+        Cache and query batching statistics for this worker.
+        """
+        return jsonify(service_stats(startup.chat_service))
+        
+    @api.route('/admin/reload', methods=['POST'])
+    def admin_reload():
         """
-        return jsonify({"status": "healthy"})
+        Trigger a background reload of the knowledge base. Requires the ADMIN_TOKEN
+        environment variable to be set and passed in the X-Admin-Token header.
+        """
+        reload_service = startup.reload_service
+        denied = admin_denial(reload_service, request.headers.get('X-Admin-Token', ''))
+        if denied is not None:
+            return jsonify(denied[0]), denied[1]
+        reload_service.reload_async()
+        return jsonify({"status": "reloading", **reload_service.status()}), 202
+
+# Request parsing and payloads
+
+def parse_chat_request(data) -> Tuple[str, str, Dict[str, int]]:
+    """
+    Validate a /chat body into (query, language, search params). Raises ValueError with
+    a message for the client if it is invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Query is required")
+    query, language = _parse_query(data.get('query'), data.get('language', 'en'))
+    search_params = _parse_search_params(data.get('search'))
+    if search_params is None:
+        raise ValueError("search must map nprobe/ef_search to positive integers")
+    return query, language, search_params
+
+def parse_batch_request(data) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """
+    Validate a /chat/batch body into ({"query", "language"} items, search params).
+    Raises ValueError with a message for the client if it is invalid.
+    """
+    queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("queries must be a non-empty list")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"At most {MAX_BATCH_QUERIES} queries per batch")
+    search_params = _parse_search_params(data.get('search'))
+    if search_params is None:
+        raise ValueError("search must map nprobe/ef_search to positive integers")
+    language = data.get('language', 'en')
+    if not isinstance(language, str):
+        raise ValueError("language must be a string")
+    items = []
+    for position, item in enumerate(queries):
+        if isinstance(item, dict):
+            query, item_language = item.get("query"), item.get("language", language)
+        else:
+            query, item_language = item, language
+        try:
+            query, item_language = _parse_query(query, item_language)
+        except ValueError as e:
+            raise ValueError(f"queries[{position}]: {e}")
+        items.append({"query": query, "language": item_language})
+    return items, search_params
+
+def not_ready(startup: StartupService) -> Optional[Tuple[Dict[str, Any], int]]:
+    """The 503 payload and status while the pipeline is still starting (or failed to), else None."""
+    if startup.ready:
+        return None
+    status = startup.status()
+    return {
+        "error": "Service is starting up" if not startup.failed else "Service failed to start",
+        "stage": status["stage"],
+        "stages_completed": status["stages_completed"],
+        "stages_total": status["stages_total"]
+    }, 503
+
+def sse_event(event: str, payload: Dict[str, Any]) -> str:
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+def admin_denial(reload_service: Optional[ReloadService], token: str) -> Optional[Tuple[Dict[str, str], int]]:
+    """The error payload and status for an admin request, or None if it is allowed."""
+    admin_token = os.environ.get('ADMIN_TOKEN')
+    if reload_service is None or not admin_token:
+        return {"error": "Reload endpoint is disabled"}, 404
+    if not hmac.compare_digest(token, admin_token):
+        return {"error": "Forbidden"}, 403
+    return None
+
+def health_status(chat_service: ChatService, reload_service: Optional[ReloadService] = None) -> Dict[str, Any]:
+    """
+    Health payload with the live index version, so rollouts can check convergence: a worker
+    has caught up once its index_version equals the published_version.
+    """
+    retrieval_service = chat_service.retrieval_service
+    return {
+        "status": "healthy",
+        "index_version": retrieval_service.index_version,
+        "published_version": reload_service.status()["published_version"] if reload_service is not None else None,
+        "generation": retrieval_service.generation
+    }
+
+def service_stats(chat_service: ChatService) -> Dict[str, Any]:
+    """Cache and query batching statistics for this worker."""
+    response_cache = chat_service.response_cache
+    batcher = chat_service.retrieval_service.batcher
+    return {
+        "query_embedding_cache": chat_service.retrieval_service.query_cache.stats(),
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "translation": chat_service.translation_service.stats(),
+        "query_batching": batcher.stats() if batcher is not None else None
+    }
+
+def _parse_query(query, language) -> Tuple[str, str]:
+    """
+    Validate a query and its language. Raises ValueError with a message for the client,
+    so a malformed body gets a 400 instead of failing later in the pipeline.
+    """
+    if not isinstance(query, str) or not query.strip():
+        raise ValueError("Query is required")
+    if not isinstance(language, str):
+        raise ValueError("language must be a string")
+    return query, language
+
+def _parse_search_params(search) -> Optional[Dict[str, int]]:
+    """
+    Validate the optional per-request search knobs. Returns None if they are invalid.
+    """
+    if search is None:
+        return {}
+    if not isinstance(search, dict) or set(search) - SEARCH_PARAMS:
+        return None
+    params = {}
+    for key, value in search.items():
+        if isinstance(value, bool) or not isinstance(value, int) or not 0 < value <= MAX_SEARCH_PARAM:
+            return None
+        params[key] = value
+    return params
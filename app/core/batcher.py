@@ -0,0 +1,110 @@
+from typing import Any, Callable, Dict, List, Optional
+import queue
+import threading
+import time
+import logging
+from app.core.forksafe import reinit_after_fork
+from app.core.metrics import registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+QUEUE_WAIT_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+class _Request:
+    __slots__ = ("item", "enqueued_at", "done", "result", "error")
+
+    def __init__(self, item: Any):
+        self.item = item
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls into batches. Callers block in submit(); a worker thread
+    takes the first waiting item, collects whatever else arrives within `max_wait_ms`
+    (up to `max_batch_size` items), runs `process_batch` once on all of them and hands
+    each caller its own result.
+
+    `process_batch` receives a list of items and returns one result per item, in order.
+    A result that is an exception is raised in that caller only.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 2.0, name: str = "batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.batch_sizes = registry.histogram(f"{name}_batch_size", "Items per coalesced batch", BATCH_SIZE_BUCKETS)
+        self.queue_wait = registry.histogram(f"{name}_queue_wait_seconds", "Time items wait before their batch runs", QUEUE_WAIT_BUCKETS)
+        self._reset()
+        reinit_after_fork(self._reset)
+
+    def _reset(self):
+        # Also runs in forked children: the parent's queue, lock and worker thread don't carry over
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result."""
+        request = _Request(item)
+        self._ensure_worker()
+        self._queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _ensure_worker(self):
+        # Started on first use, so a pre-forked parent never owns the thread
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[_Request]):
+        started = time.perf_counter()
+        self.batch_sizes.observe(len(batch))
+        for request in batch:
+            self.queue_wait.observe(started - request.enqueued_at)
+        try:
+            results = self.process_batch([request.item for request in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        except BaseException as e:
+            logger.error(f"Error processing {self.name} batch: {str(e)}")
+            results = [e] * len(batch)
+        for request, result in zip(batch, results):
+            if isinstance(result, BaseException):
+                request.error = result
+            else:
+                request.result = result
+            request.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "queued": self._queue.qsize(),
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_seconds": self.queue_wait.snapshot()
+        }
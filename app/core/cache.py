@@ -0,0 +1,241 @@
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+from app.core.forksafe import reinit_after_fork
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a query for use as a cache key: Unicode NFKC, case-folded, whitespace collapsed.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache with hit/miss counters."""
+    
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+    def get(self, key: Hashable, is_valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """
+        Return the cached value and mark it as recently used, or None on a miss.
+        An entry that fails `is_valid` (e.g. has expired) is dropped and counted as a miss.
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            if is_valid is not None and not is_valid(value):
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+        
+    def put(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entries beyond maxsize."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+                
+    def remove_where(self, predicate) -> int:
+        """Drop every entry whose key matches predicate."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+            
+    def clear(self):
+        """Drop all entries; counters are kept."""
+        with self._lock:
+            self._data.clear()
+            
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+class ResponseCache:
+    """
+    In-process response cache with a TTL and a size bound.
+    Keys are tuples whose last element is the index version, so entries of an older
+    knowledge base are never served and can be dropped in bulk with invalidate().
+    """
+    
+    backend = "memory"
+    
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600):
+        self.ttl = ttl
+        self._cache = LRUCache(maxsize)
+        
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        entry = self._cache.get(key, is_valid=lambda entry: entry[0] >= now)
+        if entry is None:
+            return None
+        return json.loads(entry[1])
+    
+    def put(self, key: Tuple, value: Dict[str, Any]):
+        # Stored serialized so callers can't mutate a cached response
+        self._cache.put(key, (time.time() + self.ttl, json.dumps(value, ensure_ascii=False)))
+        
+    def invalidate(self, keep_version: Optional[str] = None):
+        """Drop every entry that doesn't belong to keep_version."""
+        self._cache.remove_where(lambda key: key[-1] != keep_version)
+                
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.backend, "ttl": self.ttl, **self._cache.stats()}
+
+class SQLiteResponseCache:
+    """
+    Response cache in a local SQLite file, shared by all gunicorn workers on the host.
+    Eviction is oldest-first once the table grows past maxsize.
+    """
+    
+    backend = "sqlite"
+    
+    def __init__(self, path: str, maxsize: int = 2048, ttl: float = 3600, trim_every: int = 64):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.trim_every = trim_every
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        # Counters are shared by the request threads; the connections are per thread
+        self._counter_lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, version TEXT, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created_at)")
+        # sqlite connections must not be used across a fork; children open their own
+        reinit_after_fork(self._reset_connections)
+        
+    def _reset_connections(self):
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM responses WHERE key = ? AND expires_at >= ?",
+                (json.dumps(list(key), ensure_ascii=False), time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache read failed: {str(e)}")
+            row = None
+        with self._counter_lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return json.loads(row[0]) if row is not None else None
+    
+    def put(self, key: Tuple, value: Dict[str, Any]):
+        now = time.time()
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, version, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (json.dumps(list(key), ensure_ascii=False), key[-1], json.dumps(value, ensure_ascii=False), now, now + self.ttl)
+            )
+            with self._counter_lock:
+                self._puts += 1
+                trim = self._puts % self.trim_every == 0
+            if trim:
+                self._trim(conn, now)
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache write failed: {str(e)}")
+            
+    def _trim(self, conn: sqlite3.Connection, now: float):
+        conn.execute("DELETE FROM responses WHERE expires_at < ?", (now,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,)
+        )
+        
+    def invalidate(self, keep_version: Optional[str] = None):
+        """Drop every entry that doesn't belong to keep_version."""
+        try:
+            self._connection().execute("DELETE FROM responses WHERE version IS NOT ?", (keep_version,))
+        except sqlite3.Error as e:
+            logger.warning(f"Response cache invalidation failed: {str(e)}")
+            
+    def stats(self) -> Dict[str, Any]:
+        try:
+            size = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        except sqlite3.Error:
+            size = None
+        with self._counter_lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "backend": self.backend,
+            "ttl": self.ttl,
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+def create_response_cache(backend: str, maxsize: int = 2048, ttl: float = 3600, path: str = "index/response_cache.sqlite3"):
+    """
+    Build the response cache selected by configuration: "memory", "sqlite" or "none".
+    """
+    if backend == "none" or maxsize <= 0:
+        return None
+    if backend == "sqlite":
+        return SQLiteResponseCache(path, maxsize=maxsize, ttl=ttl)
+    if backend == "memory":
+        return ResponseCache(maxsize=maxsize, ttl=ttl)
+    raise ValueError(f"Unknown response cache backend: {backend}")
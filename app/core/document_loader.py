@@ -1,68 +1,135 @@
 import pandas as pd
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import json
+import multiprocessing
 import os
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = ('.xlsx', '.csv', '.json')
+PLACEHOLDER_SOURCE = "<placeholder>"
+
+# Source columns for each document field, in order of preference
+DEFAULT_COLUMN_ALIASES = {
+    "law_category": ["Law Category", "Law Type", "Category"],
+    "law_name": ["Law Name / Code", "Law Name/Section", "Law Name", "Section"],
+    "summary": ["Law Summary", "Law Details", "summary", "details"],
+    "details": ["Law Details", "details"],
+    "when_applicable": ["Applicability", "When Applicable", "when_applicable"],
+    "whom_to_approach": ["Whom to Approach", "Contact Person"],
+    "historical_context": ["Historical Context", "Context"],
+    "example_cases": ["Real-life Example", "Example Use Cases", "Examples"]
+}
+
+FIELD_DEFAULTS = {
+    "summary": "Information not available.",
+    "when_applicable": "Information not available."
+}
+
+COMBINED_TEXT_LABELS = [
+    ("law_category", "Category"),
+    ("law_name", "Law"),
+    ("details", "Details"),
+    ("summary", "Summary"),
+    ("when_applicable", "When Applicable"),
+    ("whom_to_approach", "Whom to Approach"),
+    ("historical_context", "Historical Context"),
+    ("example_cases", "Examples")
+]
+
 class DocumentLoader:
     """Handles loading and preprocessing of police legal document data from all files in the data folder."""
     
-    def __init__(self, data_folder: str):
+    def __init__(self, data_folder: str, column_aliases: Optional[Dict[str, List[str]]] = None,
+                 cache_dir: Optional[str] = None, max_workers: Optional[int] = None,
+                 parallel_min_bytes: int = 1 << 20, stream_min_bytes: int = 16 << 20):
         self.data_folder = data_folder
+        self.column_aliases = {**DEFAULT_COLUMN_ALIASES, **(column_aliases or {})}
+        # Parsed files are cached here so unchanged spreadsheets skip openpyxl
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.parallel_min_bytes = parallel_min_bytes
+        self.stream_min_bytes = stream_min_bytes
         
-    def load_documents(self) -> List[Dict[str, Any]]:
+    def list_files(self) -> List[str]:
+        """
+        List the data files the loader understands, creating a placeholder file if the folder is empty.
+        """
+        # Make sure data folder exists
+        if not os.path.exists(self.data_folder):
+            logger.warning(f"Data folder {self.data_folder} does not exist. Creating it.")
+            os.makedirs(self.data_folder, exist_ok=True)
+        
+        # Check if there are any files
+        files = sorted(os.listdir(self.data_folder))
+        if not files:
+            logger.warning("No files found in data folder. Creating a placeholder file.")
+            placeholder_data = {
+                "columns": ["Law Type", "Law Name/Section", "Law Details", "When Applicable", "Legal Reference"],
+                "data": [["Example", "Section 1", "This is an example law", "When relevant", "Legal Code 1"]]
+            }
+            placeholder_path = os.path.join(self.data_folder, "placeholder_data.json")
+            with open(placeholder_path, 'w') as f:
+                json.dump(placeholder_data, f)
+            files = ["placeholder_data.json"]
+        return [fname for fname in files if fname.endswith(SUPPORTED_EXTENSIONS)]
+        
+    def load_documents(self, files: Optional[List[str]] = None) -> List[Dict[str, Any]]:
         """
         Load documents from all Excel and CSV files in the data folder and convert them to a format suitable for processing.
+        Pass `files` to load only a subset of the data folder.
+        """
+        documents = []
+        for batch in self.iter_documents(files):
+            documents.extend(batch)
+        return documents
+        
+    def iter_documents(self, files: Optional[List[str]] = None, chunksize: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Yield documents in batches, one batch per file, or per `chunksize` rows when given.
+        Files are parsed whole, concurrently on a process pool, except CSVs of at least
+        `stream_min_bytes` when `chunksize` is given: those are streamed with
+        `pd.read_csv(chunksize=...)`, so a rebuild never holds more than one batch of their rows.
         """
         try:
             logger.info(f"Loading documents from all files in {self.data_folder}")
-            all_dfs = []
+            restrict_to_subset = files is not None
+            if files is None:
+                files = self.list_files()
             
-            # Make sure data folder exists
-            if not os.path.exists(self.data_folder):
-                logger.warning(f"Data folder {self.data_folder} does not exist. Creating it.")
-                os.makedirs(self.data_folder, exist_ok=True)
+            streamed = [fname for fname in files if chunksize and self._should_stream(fname)]
+            parsed = [fname for fname in files if fname not in streamed]
             
-            # Check if there are any files
-            files = os.listdir(self.data_folder)
-            if not files:
-                logger.warning("No files found in data folder. Creating a placeholder file.")
-                import json
-                placeholder_data = {
-                    "columns": ["Law Type", "Law Name/Section", "Law Details", "When Applicable", "Legal Reference"],
-                    "data": [["Example", "Section 1", "This is an example law", "When relevant", "Legal Code 1"]]
-                }
-                placeholder_path = os.path.join(self.data_folder, "placeholder_data.json")
-                with open(placeholder_path, 'w') as f:
-                    json.dump(placeholder_data, f)
-                files = ["placeholder_data.json"]
+            total = 0
+            for documents in self._parse_files(parsed):
+                total += len(documents)
+                step = chunksize or len(documents) or 1
+                for start in range(0, len(documents), step):
+                    yield documents[start:start + step]
             
-            for fname in files:
-                fpath = os.path.join(self.data_folder, fname)
+            for fname in streamed:
+                # Occurrence counts of identical rows carry over between batches of a file
+                seen: Dict[str, int] = {}
+                started = time.perf_counter()
+                rows = 0
                 try:
-                    if fname.endswith('.xlsx'):
-                        df = pd.read_excel(fpath)
-                        all_dfs.append(df)
-                    elif fname.endswith('.csv'):
-                        try:
-                            df = pd.read_csv(fpath, on_bad_lines='warn')  # pandas >=1.3
-                            all_dfs.append(df)
-                        except TypeError:
-                            # For older pandas
-                            df = pd.read_csv(fpath, error_bad_lines=False)
-                            all_dfs.append(df)
-                    elif fname.endswith('.json'):
-                        import json
-                        with open(fpath, 'r') as f:
-                            json_data = json.load(f)
-                            df = pd.DataFrame(data=json_data.get('data', []), columns=json_data.get('columns', []))
-                            all_dfs.append(df)
+                    for df in self.iter_file(fname, chunksize):
+                        documents = self.to_documents(df, fname, seen)
+                        rows += len(documents)
+                        if documents:
+                            yield documents
                 except Exception as e:
                     logger.error(f"Error loading file {fname}: {str(e)}")
+                total += rows
+                logger.info(f"Streamed {fname}: {rows} rows in {(time.perf_counter() - started) * 1000:.0f}ms")
             
-            if not all_dfs:
+            if not total and not restrict_to_subset:
                 # Create a minimal placeholder DataFrame if no data was loaded
                 logger.warning("No data could be loaded. Creating a placeholder DataFrame.")
                 df = pd.DataFrame({
@@ -72,84 +139,219 @@ class DocumentLoader:
                     "When Applicable": ["This is not a real law entry."],
                     "Legal Reference": ["N/A"]
                 })
-                all_dfs.append(df)
-            df = pd.concat(all_dfs, ignore_index=True)
-            # Normalize column names for downstream code
-            df.columns = [c.strip() for c in df.columns]
-            # Convert DataFrame to list of dictionaries
-            documents = []
-            for _, row in df.iterrows():
-                summary = str(
-                    row.get("Law Summary")
-                    or row.get("Law Details")
-                    or row.get("summary")
-                    or row.get("details")
-                    or "Information not available."
-                )
-                when_applicable = str(
-                    row.get("Applicability")
-                    or row.get("When Applicable")
-                    or row.get("when_applicable")
-                    or "Information not available."
-                )
-                law_category = (
-                    row.get("Law Category")
-                    or row.get("Law Type")
-                    or row.get("Category")
-                    or ""
-                )
-                law_name = (
-                    row.get("Law Name / Code")
-                    or row.get("Law Name/Section")
-                    or row.get("Law Name")
-                    or row.get("Section")
-                    or ""
-                )
-                details = (
-                    row.get("Law Details")
-                    or row.get("details")
-                    or ""
-                )
-                whom_to_approach = (
-                    row.get("Whom to Approach")
-                    or row.get("Contact Person")
-                    or ""
-                )
-                historical_context = (
-                    row.get("Historical Context")
-                    or row.get("Context")
-                    or ""
-                )
-                example_cases = (
-                    row.get("Real-life Example")
-                    or row.get("Example Use Cases")
-                    or row.get("Examples")
-                    or ""
-                )
-                doc = {
-                    "law_category": str(law_category),
-                    "law_name": str(law_name),
-                    "summary": summary,
-                    "details": str(details),
-                    "when_applicable": when_applicable,
-                    "whom_to_approach": str(whom_to_approach),
-                    "historical_context": str(historical_context),
-                    "example_cases": str(example_cases)
-                }
-                # Create a combined text field for embedding
-                doc["combined_text"] = f"""
-                Category: {doc['law_category']}
-                Law: {doc['law_name']}
-                Details: {doc['details']}
-                Summary: {doc['summary']}
-                When Applicable: {doc['when_applicable']}
-                Whom to Approach: {doc['whom_to_approach']}
-                Historical Context: {doc['historical_context']}
-                Examples: {doc['example_cases']}
-                """.strip()
-                documents.append(doc)
-            logger.info(f"Successfully loaded {len(documents)} documents from all files.")
-            return documents
+                documents = self.to_documents(df, PLACEHOLDER_SOURCE)
+                total += len(documents)
+                yield documents
+            logger.info(f"Successfully loaded {total} documents from {len(files)} files.")
         except Exception as e:
             logger.error(f"Error loading documents: {str(e)}")
             raise
+            
+    def _should_stream(self, fname: str) -> bool:
+        if not fname.endswith('.csv'):
+            return False
+        try:
+            return os.path.getsize(os.path.join(self.data_folder, fname)) >= self.stream_min_bytes
+        except OSError:
+            return False
+            
+    def _parse_files(self, files: List[str]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Parse whole files into documents, in file order. Uses a process pool when there is
+        enough data to outweigh the cost of starting the workers.
+        """
+        total_bytes = 0
+        for fname in files:
+            try:
+                total_bytes += os.path.getsize(os.path.join(self.data_folder, fname))
+            except OSError:
+                pass
+        workers = min(self.max_workers, len(files))
+        if workers > 1 and total_bytes >= self.parallel_min_bytes:
+            # spawn, not fork: the parent may already hold model threads
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [
+                    pool.submit(_load_source, self.data_folder, fname, self.column_aliases, self.cache_dir)
+                    for fname in files
+                ]
+                for done, future in enumerate(futures):
+                    try:
+                        documents = future.result()
+                    except BrokenProcessPool as e:
+                        # e.g. workers that cannot re-import an unguarded __main__; finish in-process
+                        logger.warning(f"Process pool failed, loading the remaining files sequentially: {str(e)}")
+                        files = files[done:]
+                        break
+                    yield documents
+                else:
+                    return
+        for fname in files:
+            yield self.load_source(fname)
+                
+    def load_source(self, fname: str) -> List[Dict[str, Any]]:
+        """
+        Parse one whole file into documents, going through the parsed-source cache if enabled.
+        Logs how long the file took so slow sources stand out.
+        """
+        started = time.perf_counter()
+        try:
+            df, cache_status = self._read_cached(fname)
+            documents = self.to_documents(df, fname) if df is not None else []
+        except Exception as e:
+            logger.error(f"Error loading file {fname}: {str(e)}")
+            return []
+        logger.info(f"Loaded {fname}: {len(documents)} rows in {(time.perf_counter() - started) * 1000:.0f}ms (cache {cache_status})")
+        return documents
+        
+    def _read_cached(self, fname: str) -> Tuple[Optional[pd.DataFrame], str]:
+        """
+        Read a file through the parsed-source cache. An entry is reused while the file's
+        mtime and size are unchanged; otherwise the file is hashed, and only re-parsed if
+        its content actually changed.
+        """
+        if not self.cache_dir:
+            return self.load_file(fname), "off"
+        fpath = os.path.join(self.data_folder, fname)
+        stat = os.stat(fpath)
+        meta_path = os.path.join(self.cache_dir, f"{fname}.meta.json")
+        meta = {}
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        
+        cached_path = os.path.join(self.cache_dir, f"{fname}.{meta.get('sha256')}.pkl")
+        if meta and (meta.get("mtime_ns"), meta.get("size")) == (stat.st_mtime_ns, stat.st_size) and os.path.exists(cached_path):
+            return pd.read_pickle(cached_path), "hit"
+        
+        digest = _hash_file(fpath)
+        cached_path = os.path.join(self.cache_dir, f"{fname}.{digest}.pkl")
+        if os.path.exists(cached_path):
+            df, status = pd.read_pickle(cached_path), "hit"
+        else:
+            df, status = self.load_file(fname), "miss"
+            if df is None:
+                return None, status
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{cached_path}.tmp-{os.getpid()}"
+            df.to_pickle(tmp_path)
+            os.replace(tmp_path, cached_path)
+            # Drop entries of earlier versions of this file
+            for name in os.listdir(self.cache_dir):
+                if name.startswith(f"{fname}.") and name.endswith(".pkl") and name != os.path.basename(cached_path):
+                    os.remove(os.path.join(self.cache_dir, name))
+        tmp_meta = f"{meta_path}.tmp-{os.getpid()}"
+        with open(tmp_meta, "w") as f:
+            json.dump({"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest}, f)
+        os.replace(tmp_meta, meta_path)
+        return df, status
+            
+    def load_file(self, fname: str) -> Optional[pd.DataFrame]:
+        """
+        Read a single data file into a DataFrame. Returns None for unsupported file types.
+        """
+        frames = list(self.iter_file(fname))
+        if not frames:
+            return None
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        
+    def iter_file(self, fname: str, chunksize: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Read a data file as one DataFrame, or as DataFrames of `chunksize` rows.
+        Only CSV is read incrementally; Excel and JSON are parsed whole and then sliced.
+        """
+        fpath = os.path.join(self.data_folder, fname)
+        if fname.endswith('.csv'):
+            # The C parser misses malformed lines that start a new chunk, so chunked reads use
+            # the python engine to skip exactly the same lines as a whole-file read
+            options = {"chunksize": chunksize, "engine": "python"} if chunksize else {}
+            try:
+                reader = pd.read_csv(fpath, on_bad_lines='warn', **options)  # pandas >=1.3
+            except TypeError:
+                # For older pandas
+                reader = pd.read_csv(fpath, error_bad_lines=False, **options)
+            if chunksize is None:
+                yield reader
+            else:
+                with reader:
+                    yield from reader
+            return
+        if fname.endswith('.xlsx'):
+            df = pd.read_excel(fpath)
+        elif fname.endswith('.json'):
+            with open(fpath, 'r') as f:
+                json_data = json.load(f)
+                df = pd.DataFrame(data=json_data.get('data', []), columns=json_data.get('columns', []))
+        else:
+            return
+        if chunksize is None:
+            yield df
+        else:
+            for start in range(0, len(df), chunksize):
+                yield df.iloc[start:start + chunksize]
+            
+    def to_documents(self, df: pd.DataFrame, source: str, seen: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Convert the rows of one data file into documents.
+        Every field is coalesced column-wise from its aliases (first non-empty value wins).
+        Every document gets a `doc_id` derived from its source file and content, so that
+        an unchanged row keeps the same id across loads. Pass the same `seen` dict for
+        consecutive batches of one file.
+        """
+        # Normalize column names for downstream code
+        df = df.rename(columns=lambda c: str(c).strip())
+        if df.empty:
+            return []
+        
+        fields = pd.DataFrame(index=df.index)
+        for field, aliases in self.column_aliases.items():
+            fields[field] = self._coalesce(df, aliases, FIELD_DEFAULTS.get(field, ""))
+        
+        # Create a combined text field for embedding
+        combined = None
+        for field, label in COMBINED_TEXT_LABELS:
+            part = label + ": " + fields[field]
+            combined = part if combined is None else combined + "\n" + part
+        fields["combined_text"] = combined
+        
+        row_hashes = fields["combined_text"].map(lambda text: hashlib.sha1(text.encode("utf-8")).hexdigest()[:16])
+        # Identical rows in one file are kept apart by their occurrence number
+        seen = {} if seen is None else seen
+        occurrence = row_hashes.groupby(row_hashes).cumcount() + row_hashes.map(lambda h: seen.get(h, 0))
+        for row_hash, count in row_hashes.value_counts().items():
+            seen[row_hash] = seen.get(row_hash, 0) + int(count)
+        
+        fields["source"] = source
+        fields["row_hash"] = row_hashes
+        base_ids = source + ":" + row_hashes
+        fields["doc_id"] = base_ids.where(occurrence == 0, base_ids + ":" + occurrence.astype(str))
+        return fields.to_dict("records")
+    
+    @staticmethod
+    def _coalesce(df: pd.DataFrame, aliases: List[str], default: str) -> pd.Series:
+        """First non-empty value across the alias columns, as strings."""
+        result = pd.Series(None, index=df.index, dtype=object)
+        for column in aliases:
+            if column not in df.columns:
+                continue
+            values = df[column]
+            # Duplicate column names come back as a DataFrame; use the first one
+            if isinstance(values, pd.DataFrame):
+                values = values.iloc[:, 0]
+            # NaN/None stay missing instead of becoming "nan"; blank cells fall through to the next alias
+            text = values.map(str, na_action="ignore").astype(object)
+            fill = result.isna() & text.notna() & (text.str.strip() != "")
+            result = result.where(~fill, text)
+        return result.fillna(default).astype(str)
+
+def _hash_file(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _load_source(data_folder: str, fname: str, column_aliases: Dict[str, List[str]], cache_dir: Optional[str]) -> List[Dict[str, Any]]:
+    """Process pool entry point: parse one file in a worker process."""
+    return DocumentLoader(data_folder, column_aliases, cache_dir=cache_dir, max_workers=1).load_source(fname)
@@ -1,36 +1,71 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import time
 import numpy as np
 from sentence_transformers import SentenceTransformer
+from app.core.metrics import registry
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Inference backends: "torch" (fp32 PyTorch), "int8" (PyTorch with the Linear layers
+# dynamically quantized to int8) and "onnx" (an exported ONNX graph run by onnxruntime,
+# e.g. the int8 one written by export_model.py --quantize)
+EMBEDDING_BACKENDS = ("torch", "int8", "onnx")
+
 class EmbeddingGenerator:
     """Handles the generation of embeddings for document chunks."""
-    
-    def __init__(self, model_name: str = 'all-MiniLM-L6-v2'):
-        self.model = SentenceTransformer(model_name)
-        
-    def generate_embeddings(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    def __init__(self, model_name: str = 'all-MiniLM-L6-v2', backend: str = "torch",
+                 model_dir: Optional[str] = None, onnx_file: Optional[str] = None):
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {', '.join(EMBEDDING_BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self.model_dir = model_dir
+        started = time.time()
+        # A local model directory (see export_model.py) is used as is, without contacting the model hub
+        source = model_dir or model_name
+        options = {"local_files_only": True} if model_dir else {}
+        if backend == "onnx":
+            self.model = SentenceTransformer(
+                source, device="cpu", backend="onnx",
+                model_kwargs={"file_name": onnx_file} if onnx_file else None, **options
+            )
+        else:
+            self.model = SentenceTransformer(source, **options)
+            if backend == "int8":
+                self.model = self._quantize_int8(self.model)
+        self.load_seconds = time.time() - started
+        registry.gauge("embedding_model_load_seconds", "Time taken to load the embedding model",
+                       {"backend": backend}).set(self.load_seconds)
+        logger.info(f"Loaded embedding model {source} ({backend}) in {self.load_seconds * 1000:.0f}ms")
+
+    @staticmethod
+    def _quantize_int8(model: SentenceTransformer) -> SentenceTransformer:
+        """Swap the model's Linear layers for int8 ones with dynamically quantized activations (CPU only)."""
+        import torch
+        from torch.ao.quantization import quantize_dynamic
+        model.to("cpu")
+        return quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    def generate_embeddings(self, chunks: List[Dict[str, Any]]) -> np.ndarray:
         """
         Generate embeddings for each document chunk.
+        Returns one contiguous float32 matrix with a row per chunk, in chunk order.
         """
         try:
             logger.info("Generating embeddings for documents")
-            
+
             # Extract texts for embedding
-            texts = [doc["chunk_text"] for doc in documents]
-            
+            texts = [chunk["chunk_text"] for chunk in chunks]
+
             # Generate embeddings
             embeddings = self.model.encode(texts, show_progress_bar=True)
-            
-            # Add embeddings to documents
-            for doc, embedding in zip(documents, embeddings):
-                doc["embedding"] = embedding
-                
-            logger.info(f"Generated embeddings for {len(documents)} documents")
-            return documents
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+            logger.info(f"Generated embeddings for {len(chunks)} chunks")
+            return embeddings
         except Exception as e:
             logger.error(f"Error generating embeddings: {str(e)}")
             raise
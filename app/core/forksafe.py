@@ -0,0 +1,44 @@
+"""
+Objects built before gunicorn forks its workers (preload mode) are inherited by every
+worker. Threads, thread pools, locks held at fork time, sqlite connections and HTTP
+sessions don't survive a fork, so components register a method here that recreates them
+in the child. Everything else (model weights, index, documents) stays shared copy-on-write.
+"""
+from typing import Callable, List
+import os
+import threading
+import weakref
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_callbacks: List[weakref.WeakMethod] = []
+_callbacks_lock = threading.Lock()
+
+def reinit_after_fork(method: Callable[[], None]):
+    """
+    Call the bound `method` in every child process forked after this point.
+    Held weakly, so registering doesn't keep the object alive.
+    """
+    with _callbacks_lock:
+        _callbacks.append(weakref.WeakMethod(method))
+
+def _after_fork_in_child():
+    global _callbacks_lock
+    # The lock may have been held by another thread of the parent at fork time
+    _callbacks_lock = threading.Lock()
+    alive = []
+    for ref in _callbacks:
+        method = ref()
+        if method is None:
+            continue
+        alive.append(ref)
+        try:
+            method()
+        except Exception as e:
+            logger.error(f"Error reinitializing {method.__qualname__} after fork: {str(e)}")
+    _callbacks[:] = alive
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
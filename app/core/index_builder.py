@@ -0,0 +1,422 @@
+from typing import Dict, Any, Optional, Callable, Iterable, List
+import hashlib
+import json
+import os
+import shutil
+import time
+import logging
+from contextlib import contextmanager
+from app.core.document_loader import DocumentLoader, SUPPORTED_EXTENSIONS, PLACEHOLDER_SOURCE
+from app.core.text_splitter import TextSplitter
+from app.core.embeddings import EmbeddingGenerator
+from app.core.vector_store import VectorStore, INDEX_BUILD_PARAMS
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Bump whenever the on-disk layout of a snapshot changes.
+SNAPSHOT_FORMAT_VERSION = 4
+
+MANIFEST_FILE = "manifest.json"
+TRANSLATIONS_FILE = "translations.json"
+CURRENT_FILE = "CURRENT"
+SOURCE_CACHE_DIR = "source_cache"
+
+
+class IndexBuilder:
+    """Builds, persists and reloads versioned snapshots of the vector store."""
+
+    def __init__(self, data_folder: str, index_dir: str, model_name: str = 'all-MiniLM-L6-v2',
+                 chunk_size: int = 500, chunk_overlap: int = 50, keep_snapshots: int = 2,
+                 load_chunksize: Optional[int] = 5000, load_workers: Optional[int] = None,
+                 index_type: str = "flat_ip", index_params: Optional[Dict[str, int]] = None,
+                 mmap: bool = False, translation_service=None,
+                 texts_for_document: Optional[Callable[[Dict[str, Any]], List[str]]] = None):
+        self.data_folder = data_folder
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.keep_snapshots = keep_snapshots
+        # Rows are streamed through split/embed in batches of this size to bound peak memory
+        self.load_chunksize = load_chunksize
+        self.load_workers = load_workers
+        # Build-time index settings (nlist, hnsw_m, ef_construction); changing them forces a rebuild
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        # Serve snapshots from a memory-mapped index file, shared between worker processes
+        self.mmap = mmap
+        # Keep a carried-over phrasebook complete: with a translation service the strings of new
+        # documents are translated as they are ingested, otherwise the missing ones are only counted
+        self.translation_service = translation_service
+        self.texts_for_document = texts_for_document
+
+    def compute_manifest(self) -> Dict[str, Any]:
+        """
+        Describe the inputs a snapshot is built from: data file hashes, model, splitter and index settings.
+        """
+        files = {}
+        if os.path.exists(self.data_folder):
+            for fname in sorted(os.listdir(self.data_folder)):
+                if fname.endswith(SUPPORTED_EXTENSIONS):
+                    files[fname] = self._hash_file(os.path.join(self.data_folder, fname))
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "model_name": self.model_name,
+            # Older app-built snapshots may hold int8/ONNX document vectors; this forces them to rebuild
+            "document_embeddings": "fp32",
+            "splitter": {
+                "chunk_size": self.chunk_size,
+                "chunk_overlap": self.chunk_overlap
+            },
+            "index": {
+                "type": self.index_type,
+                # Only the settings that shape this index type, so unrelated knobs don't force rebuilds
+                **{key: value for key, value in self.index_params.items() if key in INDEX_BUILD_PARAMS.get(self.index_type, ())}
+            },
+            "files": files
+        }
+        manifest["version"] = self._fingerprint(manifest)
+        return manifest
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the manifest of the current snapshot, or None if there is no usable snapshot.
+        """
+        snapshot_dir = self.current_snapshot_dir()
+        if snapshot_dir is None:
+            return None
+        try:
+            with open(os.path.join(snapshot_dir, MANIFEST_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read snapshot manifest in {snapshot_dir}: {str(e)}")
+            return None
+
+    def current_snapshot_dir(self) -> Optional[str]:
+        """Return the directory of the snapshot CURRENT points to, if any."""
+        try:
+            with open(os.path.join(self.index_dir, CURRENT_FILE), "r") as f:
+                version = f.read().strip()
+        except OSError:
+            return None
+        snapshot_dir = os.path.join(self.index_dir, "snapshots", version)
+        return snapshot_dir if os.path.isdir(snapshot_dir) else None
+
+    def is_current(self, manifest: Optional[Dict[str, Any]] = None) -> bool:
+        """Check whether the stored snapshot was built from the current inputs."""
+        stored = self.read_manifest()
+        if stored is None:
+            return False
+        manifest = manifest or self.compute_manifest()
+        return stored.get("version") == manifest["version"]
+
+    def build(self, embedding_generator: Optional[EmbeddingGenerator] = None) -> VectorStore:
+        """
+        Run the full load/split/embed pipeline and write a new snapshot.
+        """
+        try:
+            started = time.time()
+            logger.info("Building vector store snapshot...")
+            document_loader = self._document_loader()
+            embedding_generator = self._document_generator(embedding_generator)
+            vector_store = self._new_vector_store()
+            num_chunks = 0
+            for documents in document_loader.iter_documents(chunksize=self.load_chunksize):
+                num_chunks += self._embed_into(vector_store, documents, embedding_generator)
+            vector_store.finalize()
+            if not num_chunks:
+                logger.error("No chunks generated from documents. Please check the input data and chunking logic.")
+                raise ValueError("No chunks generated from documents. Please check the input data and chunking logic.")
+
+            # The loader may have created a placeholder file, so hash the folder afterwards
+            manifest = self.compute_manifest()
+            self._write_snapshot(vector_store, manifest, len(vector_store.documents), num_chunks)
+            logger.info(f"Snapshot {manifest['version']} built in {time.time() - started:.1f}s")
+            return self._serving(vector_store)
+        except Exception as e:
+            logger.error(f"Error building index snapshot: {str(e)}")
+            raise
+
+    def ingest(self, embedding_generator: Optional[EmbeddingGenerator] = None) -> VectorStore:
+        """
+        Bring the stored snapshot up to date by embedding only new or changed rows.
+        Rows of changed files are matched by their content fingerprint, so unchanged rows keep
+        their vectors; rows that disappeared are removed from the index. Falls back to a full
+        build when there is no snapshot or the model/splitter settings changed.
+        """
+        try:
+            stored = self.read_manifest()
+            manifest = self.compute_manifest()
+            if stored is None or not self._same_settings(stored, manifest):
+                logger.info("No compatible snapshot to update, running a full build")
+                return self.build(embedding_generator)
+            if stored.get("version") == manifest["version"]:
+                return self.load()
+            # The delta is applied in memory; a mapped index can't be modified
+            vector_store = self.load(mmap=False)
+
+            started = time.time()
+            stored_files = stored.get("files", {})
+            changed = [f for f, digest in manifest["files"].items() if stored_files.get(f) != digest]
+            removed = [f for f in stored_files if f not in manifest["files"]]
+            if manifest["files"] and PLACEHOLDER_SOURCE in vector_store.sources():
+                removed.append(PLACEHOLDER_SOURCE)
+            logger.info(f"Ingesting delta: {len(changed)} changed/new files, {len(removed)} removed files")
+
+            for fname in removed:
+                vector_store.remove_documents(vector_store.doc_ids_for_source(fname))
+
+            document_loader = self._document_loader()
+            num_new = 0
+            num_chunks = 0
+            existing = set()
+            for fname in changed:
+                existing.update(vector_store.doc_ids_for_source(fname))
+            current_ids = set()
+            # Changed files are parsed together so they can load concurrently
+            for documents in document_loader.iter_documents(changed, chunksize=self.load_chunksize):
+                current_ids.update(doc["doc_id"] for doc in documents)
+                new_documents = [doc for doc in documents if doc["doc_id"] not in existing]
+                if new_documents:
+                    embedding_generator = self._document_generator(embedding_generator)
+                    num_chunks += self._embed_into(vector_store, new_documents, embedding_generator)
+                    num_new += len(new_documents)
+            stale_documents = list(existing - current_ids)
+            stale_chunks = vector_store.remove_documents(stale_documents)
+            logger.info(f"Delta: {num_new} new/changed rows ({num_chunks} chunks embedded), {len(stale_documents)} stale rows ({stale_chunks} chunks) removed")
+
+            self._write_snapshot(vector_store, manifest, len(vector_store.documents), vector_store.num_chunks)
+            logger.info(f"Snapshot {manifest['version']} ingested in {time.time() - started:.1f}s")
+            return self._serving(vector_store)
+        except Exception as e:
+            logger.error(f"Error ingesting index delta: {str(e)}")
+            raise
+
+    def load_translations(self, version: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+        """
+        Load the precomputed translations stored with a snapshot (the current one by default).
+        """
+        snapshot_dir = os.path.join(self.index_dir, "snapshots", version) if version else self.current_snapshot_dir()
+        if snapshot_dir is None:
+            return {}
+        return self._read_translations(snapshot_dir)
+
+    def _read_translations(self, snapshot_dir: str) -> Dict[str, Dict[str, str]]:
+        try:
+            with open(os.path.join(snapshot_dir, TRANSLATIONS_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read precomputed translations in {snapshot_dir}: {str(e)}")
+            return {}
+
+    def build_translations(self, vector_store: VectorStore, translation_service,
+                           texts_for_document: Callable[[Dict[str, Any]], List[str]],
+                           languages: Iterable[str] = ('ta',)) -> Dict[str, Dict[str, str]]:
+        """
+        Translate the static strings of every document and store them with the snapshot.
+        Strings translated for an earlier snapshot are reused, so only new text hits the translator.
+        """
+        try:
+            texts = self._translatable_texts(vector_store, texts_for_document)
+            existing = self.load_translations(vector_store.version)
+            translations = {
+                language: translation_service.build_phrasebook(texts, dest=language, existing=existing.get(language))
+                for language in languages
+            }
+            self._write_translations(os.path.join(self.index_dir, "snapshots", vector_store.version), translations)
+            return translations
+        except Exception as e:
+            logger.error(f"Error building precomputed translations: {str(e)}")
+            raise
+
+    def _embed_into(self, vector_store: VectorStore, documents: list, embedding_generator: EmbeddingGenerator) -> int:
+        """Split and embed documents and add the chunks to the vector store."""
+        text_splitter = TextSplitter(chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap)
+        chunks = text_splitter.split_documents(documents)
+        if not chunks:
+            logger.error("No chunks generated from documents. Please check the input data and chunking logic.")
+            raise ValueError("No chunks generated from documents. Please check the input data and chunking logic.")
+
+        embeddings = embedding_generator.generate_embeddings(chunks)
+        if embeddings is None or len(embeddings) != len(chunks) or embeddings.shape[1] == 0:
+            logger.error("No embeddings generated for chunks. Please check the embedding model and input data.")
+            raise ValueError("No embeddings generated for chunks. Please check the embedding model and input data.")
+
+        vector_store.add_documents(documents, chunks, embeddings)
+        return len(chunks)
+
+    def load(self, mmap: Optional[bool] = None) -> VectorStore:
+        """Load the current snapshot from disk, memory-mapped if `mmap` (default: the builder's setting)."""
+        snapshot_dir = self.current_snapshot_dir()
+        if snapshot_dir is None:
+            raise FileNotFoundError(f"No index snapshot found in {self.index_dir}")
+        started = time.time()
+        vector_store = self._new_vector_store()
+        vector_store.load(snapshot_dir, mmap=self.mmap if mmap is None else mmap)
+        # Snapshot directories are named after their manifest version
+        vector_store.version = os.path.basename(snapshot_dir)
+        logger.info(f"Loaded snapshot from {snapshot_dir} in {(time.time() - started) * 1000:.0f}ms"
+                    f"{' (memory-mapped)' if vector_store.read_only else ''}")
+        return vector_store
+
+    def load_or_build(self, embedding_generator: Optional[EmbeddingGenerator] = None) -> VectorStore:
+        """
+        Load the stored snapshot if it matches the current inputs, otherwise rebuild it.
+        """
+        if self.is_current():
+            try:
+                return self.load()
+            except Exception as e:
+                logger.warning(f"Stored snapshot could not be loaded, rebuilding: {str(e)}")
+        # Several workers may boot at once; only one of them should pay for the rebuild
+        with self._build_lock():
+            if self.is_current():
+                return self.load()
+            logger.info("Index snapshot missing or out of date, updating it")
+            return self.ingest(embedding_generator)
+
+    def _write_snapshot(self, vector_store: VectorStore, manifest: Dict[str, Any], num_documents: int, num_chunks: int):
+        """Write the snapshot into its own directory and then flip CURRENT to it."""
+        manifest = dict(manifest)
+        manifest["num_documents"] = num_documents
+        manifest["num_chunks"] = num_chunks
+        manifest["created_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        snapshots_dir = os.path.join(self.index_dir, "snapshots")
+        snapshot_dir = os.path.join(snapshots_dir, manifest["version"])
+        tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        vector_store.save(tmp_dir)
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f, indent=2)
+        # Carry precomputed translations over and fill in the strings of new documents
+        previous_dir = self.current_snapshot_dir()
+        if previous_dir is not None and os.path.exists(os.path.join(previous_dir, TRANSLATIONS_FILE)):
+            shutil.copyfile(os.path.join(previous_dir, TRANSLATIONS_FILE), os.path.join(tmp_dir, TRANSLATIONS_FILE))
+            self._extend_translations(vector_store, tmp_dir, manifest["version"])
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        os.replace(tmp_dir, snapshot_dir)
+
+        current_tmp = os.path.join(self.index_dir, f"{CURRENT_FILE}.tmp-{os.getpid()}")
+        with open(current_tmp, "w") as f:
+            f.write(manifest["version"])
+        os.replace(current_tmp, os.path.join(self.index_dir, CURRENT_FILE))
+        vector_store.version = manifest["version"]
+        self._prune_snapshots(snapshots_dir, manifest["version"])
+
+    def _extend_translations(self, vector_store: VectorStore, snapshot_dir: str, version: str):
+        """
+        Bring the phrasebook carried into a new snapshot up to date with its documents.
+        Only strings missing from it are translated; without a translation service the
+        missing strings are logged and left to live translation.
+        """
+        existing = self._read_translations(snapshot_dir)
+        if not existing or self.texts_for_document is None:
+            return
+        texts = self._translatable_texts(vector_store, self.texts_for_document)
+        if self.translation_service is None:
+            for language, phrasebook in existing.items():
+                missing = len(texts - phrasebook.keys())
+                if missing:
+                    logger.warning(f"{missing} strings of snapshot {version} are missing from the "
+                                   f"'{language}' phrasebook and will be translated live; run build_index.py --translate {language}")
+            return
+        try:
+            translations = {
+                language: self.translation_service.build_phrasebook(texts, dest=language, existing=phrasebook)
+                for language, phrasebook in existing.items()
+            }
+            self._write_translations(snapshot_dir, translations)
+        except Exception as e:
+            # The snapshot is still usable with the carried-over phrasebook
+            logger.warning(f"Could not extend precomputed translations: {str(e)}")
+
+    @staticmethod
+    def _translatable_texts(vector_store: VectorStore, texts_for_document: Callable[[Dict[str, Any]], List[str]]) -> set:
+        texts = set()
+        for doc in vector_store.documents:
+            texts.update(text for text in texts_for_document(doc) if text and text.strip())
+        return texts
+
+    @staticmethod
+    def _write_translations(snapshot_dir: str, translations: Dict[str, Dict[str, str]]):
+        tmp_path = os.path.join(snapshot_dir, f"{TRANSLATIONS_FILE}.tmp-{os.getpid()}")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(translations, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(snapshot_dir, TRANSLATIONS_FILE))
+
+    def _serving(self, vector_store: VectorStore) -> VectorStore:
+        """The store to serve after a build: the freshly written snapshot, mapped, when mmap is on."""
+        if not self.mmap:
+            return vector_store
+        return self.load()
+
+    def _new_vector_store(self) -> VectorStore:
+        return VectorStore(index_type=self.index_type, **self.index_params)
+
+    def _document_generator(self, embedding_generator: Optional[EmbeddingGenerator]) -> EmbeddingGenerator:
+        """
+        The generator documents are embedded with. Document vectors are always fp32, so
+        snapshots built by the app and by build_index.py are interchangeable and an int8 or
+        ONNX backend only changes how queries are encoded.
+        """
+        if embedding_generator is None:
+            return EmbeddingGenerator(self.model_name)
+        if embedding_generator.backend == "torch":
+            return embedding_generator
+        logger.info(f"Embedding documents with the fp32 model; the {embedding_generator.backend} backend only encodes queries")
+        return EmbeddingGenerator(embedding_generator.model_name, model_dir=embedding_generator.model_dir)
+
+    def _document_loader(self) -> DocumentLoader:
+        # Parsed data files are cached next to the snapshots, outside any one version
+        return DocumentLoader(self.data_folder, cache_dir=os.path.join(self.index_dir, SOURCE_CACHE_DIR),
+                              max_workers=self.load_workers)
+
+    def _prune_snapshots(self, snapshots_dir: str, current_version: str):
+        """Remove all but the newest few snapshots."""
+        entries = [
+            os.path.join(snapshots_dir, name) for name in os.listdir(snapshots_dir)
+            if name != current_version and ".tmp-" not in name
+        ]
+        entries.sort(key=os.path.getmtime, reverse=True)
+        for path in entries[max(self.keep_snapshots - 1, 0):]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @contextmanager
+    def _build_lock(self):
+        """Serialize snapshot builds across processes sharing the same index directory."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.index_dir, ".build.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _same_settings(stored: Dict[str, Any], manifest: Dict[str, Any]) -> bool:
+        """Whether two manifests only differ in their data files."""
+        return all(stored.get(key) == manifest[key] for key in ("format_version", "model_name", "document_embeddings", "splitter", "index"))
+
+    @staticmethod
+    def _hash_file(path: str) -> str:
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def _fingerprint(manifest: Dict[str, Any]) -> str:
+        payload = json.dumps(manifest, sort_keys=True).encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()[:16]
@@ -0,0 +1,120 @@
+from typing import List, Dict, Any, Tuple, Iterable, Optional
+from collections import Counter, defaultdict
+import heapq
+import math
+import pickle
+import re
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Letters and digits only, so "Section 66C" -> ["section", "66c"] and "139(1)" -> ["139", "1"]
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def tokenize(text: str) -> List[str]:
+    """Split text into casefolded word tokens."""
+    return TOKEN_PATTERN.findall(text.casefold())
+
+class LexicalIndex:
+    """
+    In-memory inverted index over document text, scored with Okapi BM25.
+
+    Postings are keyed by doc_id, so the index can be updated document by document
+    alongside the vector store and exact tokens like section numbers or "FIR" are
+    matched literally instead of through their embeddings.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        # doc_id -> its terms, so removals only touch the removed documents' postings.
+        # Built on the first removal (see _term_index); serving workers never need it.
+        self._doc_terms: Optional[Dict[str, List[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]], field: str = "combined_text"):
+        """Index documents by their `field`. Documents that are already present are replaced."""
+        # A doc_id listed twice keeps its last version
+        documents = list({doc["doc_id"]: doc for doc in documents}.values())
+        self.remove_documents([doc["doc_id"] for doc in documents if doc["doc_id"] in self.doc_lengths])
+        for doc in documents:
+            doc_id = doc["doc_id"]
+            tokens = tokenize(doc.get(field) or "")
+            counts = Counter(tokens)
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            if self._doc_terms is not None:
+                self._doc_terms[doc_id] = list(counts)
+            self.doc_lengths[doc_id] = len(tokens)
+            self.total_length += len(tokens)
+
+    def remove_documents(self, doc_ids: Iterable[str]):
+        """Remove documents from the index, in time proportional to their number of terms."""
+        removed = {doc_id for doc_id in doc_ids if doc_id in self.doc_lengths}
+        if not removed:
+            return
+        doc_terms = self._term_index()
+        for doc_id in removed:
+            self.total_length -= self.doc_lengths.pop(doc_id)
+            for term in doc_terms.pop(doc_id, ()):
+                postings = self.postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self.postings[term]
+
+    def _term_index(self) -> Dict[str, List[str]]:
+        """The doc_id -> terms map, inverted from the postings once per loaded index."""
+        if self._doc_terms is None:
+            doc_terms: Dict[str, List[str]] = defaultdict(list)
+            for term, postings in self.postings.items():
+                for doc_id in postings:
+                    doc_terms[doc_id].append(term)
+            self._doc_terms = dict(doc_terms)
+        return self._doc_terms
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Return the k best (doc_id, BM25 score) pairs for the query, best first.
+        """
+        num_docs = len(self.doc_lengths)
+        if not num_docs:
+            return []
+        avg_length = self.total_length / num_docs or 1.0
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def save(self, path: str):
+        """Save the index to disk."""
+        with open(path, "wb") as f:
+            pickle.dump({
+                "k1": self.k1,
+                "b": self.b,
+                "postings": self.postings,
+                "doc_lengths": self.doc_lengths
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def load(self, path: str):
+        """Load the index from disk."""
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        self.k1 = state["k1"]
+        self.b = state["b"]
+        self.postings = state["postings"]
+        self.doc_lengths = state["doc_lengths"]
+        self.total_length = sum(self.doc_lengths.values())
+        self._doc_terms = None
@@ -0,0 +1,243 @@
+from typing import Dict, Any, Callable, Iterator, List, Optional, Sequence, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) for pipeline stage and request latencies
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Content type of the Prometheus text exposition format served at /metrics
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed, cumulative buckets (Prometheus style: each bucket
+    counts the observations less than or equal to its upper bound).
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, buckets: Sequence[float], labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[position] += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Count, sum and cumulative bucket counts keyed by upper bound ("+Inf" last)."""
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = {}
+        running = 0
+        for bound, count in zip(self.buckets + ["+Inf"], counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"count": running, "sum": total, "buckets": cumulative}
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        snapshot = self.snapshot()
+        samples = [(f"{self.name}_bucket", {**self.labels, "le": bound}, count) for bound, count in snapshot["buckets"].items()]
+        samples.append((f"{self.name}_sum", self.labels, snapshot["sum"]))
+        samples.append((f"{self.name}_count", self.labels, snapshot["count"]))
+        return samples
+
+class Counter:
+    """
+    Monotonic counter. With `function` the value is read from it at scrape time instead,
+    for totals another component already keeps (cache hits, for instance).
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels: Optional[Dict[str, str]] = None,
+                 function: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.function = function
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self.function() if self.function is not None else self._value
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        return [(self.name, self.labels, self.value)]
+
+class Gauge(Counter):
+    """A value that can go up and down; set() it, or read it from `function` at scrape time."""
+
+    type = "gauge"
+
+    def set(self, value: float):
+        with self._lock:
+            self._value = value
+
+class MetricsRegistry:
+    """Process-wide collection of named metrics, so any component can publish one."""
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Tuple], Any] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, description: str, buckets: Sequence[float],
+                  labels: Optional[Dict[str, str]] = None) -> Histogram:
+        """Return the histogram called `name` with these labels, creating it on first use."""
+        return self._get_or_create(Histogram, name, labels, lambda: Histogram(name, description, buckets, labels))
+
+    def counter(self, name: str, description: str, labels: Optional[Dict[str, str]] = None,
+                function: Optional[Callable[[], float]] = None) -> Counter:
+        """Return the counter called `name` with these labels; a new `function` replaces the old one."""
+        return self._with_function(self._get_or_create(Counter, name, labels, lambda: Counter(name, description, labels)), function)
+
+    def gauge(self, name: str, description: str, labels: Optional[Dict[str, str]] = None,
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        """Return the gauge called `name` with these labels; a new `function` replaces the old one."""
+        return self._with_function(self._get_or_create(Gauge, name, labels, lambda: Gauge(name, description, labels)), function)
+
+    def _get_or_create(self, kind, name: str, labels: Optional[Dict[str, str]], create):
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = create()
+            elif type(metric) is not kind:
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    @staticmethod
+    def _with_function(metric, function):
+        if function is not None:
+            metric.function = function
+        return metric
+
+    def get(self, name: str, labels: Optional[Dict[str, str]] = None) -> Optional[Any]:
+        return self._metrics.get((name, tuple(sorted((labels or {}).items()))))
+
+    def metrics(self) -> List[Any]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        families: Dict[str, List[Any]] = {}
+        for metric in self.metrics():
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, members in families.items():
+            lines.append(f"# HELP {name} {_escape(members[0].description, quotes=False)}")
+            lines.append(f"# TYPE {name} {members[0].type}")
+            for metric in members:
+                try:
+                    samples = metric.samples()
+                except Exception as e:
+                    # A component that has gone away shouldn't break the whole scrape
+                    logger.warning(f"Error collecting metric {name}: {str(e)}")
+                    continue
+                for sample_name, labels, value in samples:
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+def _escape(text: str, quotes: bool = True) -> str:
+    text = str(text).replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quotes else text
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value is None or value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+registry = MetricsRegistry()
+
+# Per-request stage timings
+
+class RequestTimings:
+    """Stages timed during one request, reported back to the client as a Server-Timing header."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, seconds: float):
+        self.stages.append((stage, seconds))
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: each stage, then the total, in milliseconds."""
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages]
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(entries)
+
+# The timings of the request being handled; None outside a request (worker threads, scripts)
+_request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def begin_request_timings() -> RequestTimings:
+    """Start collecting stage timings for the request handled in the current context."""
+    timings = RequestTimings()
+    _request_timings.set(timings)
+    return timings
+
+def current_request_timings() -> Optional[RequestTimings]:
+    return _request_timings.get()
+
+def observe_stage(stage: str, seconds: float, outcome: str = "ok"):
+    """Record one execution of a pipeline stage in the stage histogram and outcome counter."""
+    registry.histogram("chat_stage_duration_seconds", "Time spent in each chat pipeline stage",
+                       LATENCY_BUCKETS, labels={"stage": stage}).observe(seconds)
+    registry.counter("chat_stage_total", "Chat pipeline stage executions by outcome",
+                     labels={"stage": stage, "outcome": outcome}).inc()
+
+def record_stage(stage: str, seconds: float, outcome: str = "ok"):
+    """observe_stage, and add the stage to the current request's Server-Timing."""
+    observe_stage(stage, seconds, outcome)
+    add_request_timings({stage: seconds})
+
+def add_request_timings(timings: Dict[str, float]):
+    """Add stages timed elsewhere (e.g. on the query batcher's thread) to the current request."""
+    request_timings = _request_timings.get()
+    if request_timings is not None:
+        for stage, seconds in timings.items():
+            request_timings.add(stage, seconds)
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Time the enclosed block as a pipeline stage; an exception counts as outcome "error"."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        record_stage(stage, time.perf_counter() - started, "error")
+        raise
+    record_stage(stage, time.perf_counter() - started)
+
+def observe_request(seconds: float, outcome: str):
+    """Record one chat request's end-to-end latency and outcome (ok, cache_hit or error)."""
+    registry.histogram("chat_request_duration_seconds", "End-to-end chat request latency", LATENCY_BUCKETS).observe(seconds)
+    registry.counter("chat_requests_total", "Chat requests by outcome", labels={"outcome": outcome}).inc()
@@ -0,0 +1,133 @@
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Set
+import re
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Canonical act keys and the ways they are written in law names and queries (casefolded, no dots)
+ACT_ALIASES = {
+    "ipc": ["ipc", "indian penal code"],
+    "bns": ["bns", "bharatiya nyaya sanhita"],
+    "crpc": ["crpc", "cr pc", "code of criminal procedure"],
+    "it": ["it act", "information technology act"],
+    "income tax": ["income tax act", "income tax"],
+    "dpdp": ["dpdp act", "dpdp", "digital personal data protection act"]
+}
+
+# Act of a row whose law name doesn't spell it out, by its law_category
+CATEGORY_ACTS = {
+    "ipc": "ipc",
+    "bns": "bns",
+    "crpc": "crpc",
+    "it act": "it",
+    "cyber law": "it",
+    "cybercrime": "it",
+    "cybersecurity": "it",
+    "digital signature": "it",
+    "digital contract": "it",
+    "data protection": "dpdp",
+    "taxation": "income tax"
+}
+
+_ALIAS_ACTS = {alias: act for act, aliases in ACT_ALIASES.items() for alias in aliases}
+_ACT_PATTERN = "|".join(
+    re.escape(alias).replace(r"\ ", r"\s+") for alias in sorted(_ALIAS_ACTS, key=len, reverse=True)
+)
+_SECTION_WORD = r"(?:section|sec|s|u/s)"
+_SECTION_NUMBER = r"\d+[a-z]*"
+
+# "Section 234A/B/C - ..." -> 234a, 234b, 234c
+_NAME_SECTION = re.compile(rf"\bsection\s+({_SECTION_NUMBER})((?:/[a-z])*)")
+_NAME_ACT = re.compile(rf"\b({_ACT_PATTERN})\b")
+
+# A query that is nothing but a statute reference: "IPC 302", "BNS section 101", "u/s 41 CrPC", "Section 302"
+_QUERY = re.compile(
+    r"^(?:(?:what is|whats|explain|show me|show|tell me about|details of|about)\s+)?(?:the\s+)?(?:"
+    rf"(?P<act1>{_ACT_PATTERN})\s+(?:{_SECTION_WORD}\s+)?(?P<sec1>{_SECTION_NUMBER})"
+    rf"|{_SECTION_WORD}\s+(?P<sec2>{_SECTION_NUMBER})(?:\s+(?:(?:of|under|in)\s+(?:the\s+)?)?(?P<act2>{_ACT_PATTERN}))?"
+    rf"|(?P<sec3>{_SECTION_NUMBER})\s+(?P<act3>{_ACT_PATTERN})"
+    r")$"
+)
+
+def _normalize(text: str) -> str:
+    text = text.casefold().replace(".", "")
+    return " ".join(re.sub(r"[?!,;:]+", " ", text).split())
+
+def parse_statute_reference(query: str) -> Optional[Tuple[Optional[str], str]]:
+    """
+    Parse a query that only names a statute section into (act, section), e.g.
+    "IPC 302" -> ("ipc", "302"). The act is None when the query gives only a section.
+    Returns None for anything else.
+    """
+    match = _QUERY.match(_normalize(query))
+    if match is None:
+        return None
+    section = match.group("sec1") or match.group("sec2") or match.group("sec3")
+    alias = match.group("act1") or match.group("act2") or match.group("act3")
+    act = _ALIAS_ACTS[" ".join(alias.split())] if alias else None
+    return act, section
+
+class SectionIndex:
+    """
+    Exact-match index from (act, section number) to documents, built from each row's
+    law_category and the section number in its law_name.
+    """
+
+    def __init__(self):
+        self._by_key: Dict[Tuple[str, str], Set[str]] = {}
+        self._by_section: Dict[str, Set[str]] = {}
+        self._doc_keys: Dict[str, List[Tuple[str, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    @staticmethod
+    def keys_for(doc: Dict[str, Any]) -> List[Tuple[str, str]]:
+        """The (act, section) pairs a document answers to."""
+        name = _normalize(doc.get("law_name") or "")
+        match = _NAME_SECTION.search(name)
+        if match is None:
+            return []
+        # An act named in the law name wins over the category, e.g. "Section 420 IPC" filed under Cybercrime
+        act_match = _NAME_ACT.search(name)
+        if act_match is not None:
+            act = _ALIAS_ACTS[" ".join(act_match.group(1).split())]
+        else:
+            act = CATEGORY_ACTS.get(_normalize(doc.get("law_category") or ""))
+        if act is None:
+            return []
+        number = match.group(1)
+        sections = [number]
+        stem = re.match(r"\d+", number).group(0)
+        sections.extend(stem + suffix for suffix in match.group(2).split("/") if suffix)
+        return [(act, section) for section in sections]
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]]):
+        """Index documents by statute reference. Documents that are already present are replaced."""
+        documents = list(documents)
+        self.remove_documents([doc["doc_id"] for doc in documents if doc["doc_id"] in self._doc_keys])
+        for doc in documents:
+            keys = self.keys_for(doc)
+            if not keys:
+                continue
+            self._doc_keys[doc["doc_id"]] = keys
+            for act, section in keys:
+                self._by_key.setdefault((act, section), set()).add(doc["doc_id"])
+                self._by_section.setdefault(section, set()).add(doc["doc_id"])
+
+    def remove_documents(self, doc_ids: Iterable[str]):
+        """Remove documents from the index."""
+        for doc_id in doc_ids:
+            for act, section in self._doc_keys.pop(doc_id, []):
+                for table, key in ((self._by_key, (act, section)), (self._by_section, section)):
+                    entries = table.get(key)
+                    if entries is not None:
+                        entries.discard(doc_id)
+                        if not entries:
+                            del table[key]
+
+    def lookup(self, act: Optional[str], section: str) -> List[str]:
+        """Ids of the documents for a section, in any act when `act` is None."""
+        entries = self._by_key.get((act, section)) if act else self._by_section.get(section)
+        return sorted(entries) if entries else []
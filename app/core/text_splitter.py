@@ -1,10 +1,19 @@
 from typing import List, Dict, Any
+import hashlib
 import logging
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def make_chunk_id(doc_id: str, chunk_index: int) -> int:
+    """
+    Derive a stable, non-negative int64 id for a chunk from its parent document id.
+    FAISS uses it as the vector id, so the same chunk keeps the same id across ingests.
+    """
+    digest = hashlib.sha1(f"{doc_id}#{chunk_index}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & 0x7FFFFFFFFFFFFFFF
+
 class TextSplitter:
     """Handles the chunking of documents into smaller pieces for embedding."""
     
@@ -20,24 +29,41 @@ class TextSplitter:
     
     def split_documents(self, documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Split documents into chunks while preserving metadata.
+        Split documents into chunks.
+        Chunks don't copy the document's fields: each one records its parent `doc_id` and the
+        (offset, length) of its text within the document's `combined_text`. `chunk_text` is
+        included for the embedding step and is not kept by the vector store.
         """
         try:
             logger.info("Splitting documents into chunks")
-            chunked_documents = []
+            chunks = []
             
             for doc in documents:
                 # Split the combined text into chunks
-                text_chunks = self.text_splitter.split_text(doc["combined_text"])
+                text = doc["combined_text"]
+                text_chunks = self.text_splitter.split_text(text)
                 
-                # Create new documents for each chunk with preserved metadata
-                for chunk in text_chunks:
-                    chunked_doc = dict(doc)  # Copy all fields from the original doc
-                    chunked_doc["chunk_text"] = chunk  # Overwrite with the chunk text
-                    chunked_documents.append(chunked_doc)
+                search_from = 0
+                for chunk_index, chunk in enumerate(text_chunks):
+                    # Chunks are substrings of the text, in order; overlap means each one
+                    # starts after the previous start but not necessarily after its end
+                    offset = text.find(chunk, search_from)
+                    if offset == -1:
+                        offset = text.find(chunk)
+                    if offset == -1:
+                        logger.warning(f"Chunk {chunk_index} of {doc['doc_id']} is not a substring of its document, indexing the whole text")
+                        offset, chunk = 0, text
+                    search_from = offset + 1
+                    chunks.append({
+                        "doc_id": doc["doc_id"],
+                        "chunk_id": make_chunk_id(doc["doc_id"], chunk_index),
+                        "offset": offset,
+                        "length": len(chunk),
+                        "chunk_text": chunk
+                    })
             
-            logger.info(f"Created {len(chunked_documents)} chunks")
-            return chunked_documents
+            logger.info(f"Created {len(chunks)} chunks")
+            return chunks
         except Exception as e:
             logger.error(f"Error splitting documents: {str(e)}")
             raise
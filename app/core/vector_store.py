@@ -1,75 +1,322 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Optional
 import numpy as np
 import faiss
 import pickle
 import os
 import logging
+from app.core.lexical_index import LexicalIndex
+from app.core.section_index import SectionIndex
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# flat_l2 is the original brute-force index scored by L2 distance (lower is better). The other
+# types index L2-normalized vectors by inner product, so scores are cosine similarities
+# (higher is better) that can be compared across queries.
+INDEX_TYPES = ("flat_l2", "flat_ip", "ivf", "hnsw")
+
+# Constructor settings that change how each index type is built
+INDEX_BUILD_PARAMS = {
+    "ivf": ("nlist",),
+    "hnsw": ("hnsw_m", "ef_construction")
+}
+
+# k-means wants at least this many training points per IVF list
+IVF_MIN_POINTS_PER_LIST = 39
+
 class VectorStore:
-    """Handles storage and retrieval of document embeddings using FAISS."""
+    """
+    Handles storage and retrieval of document embeddings using FAISS.
+    
+    Storage is columnar: the FAISS index holds the embeddings as one contiguous float32 matrix,
+    `documents` holds each parent document once, and chunks are rows of parallel numpy arrays
+    (chunk id, document row, offset, length) pointing into the document's `combined_text`.
+    Chunk arrays are kept sorted by chunk id so FAISS ids map to rows with a binary search.
+    Batches added during a build are only merged into the sorted columns once, on finalize(),
+    save() or the first lookup that needs them.
+    
+    `index_type` selects the FAISS index (see INDEX_TYPES). IVF is trained on the first batch
+    of embeddings added; `nprobe` and `ef_search` are the default search-time knobs and can
+    be overridden per search.
+    """
     
-    def __init__(self, dimension: int = 384):
+    def __init__(self, dimension: int = 384, index_type: str = "flat_ip", nlist: int = 1024,
+                 nprobe: int = 16, hnsw_m: int = 32, ef_construction: int = 200, ef_search: int = 64):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
         self.dimension = dimension
-        self.index = faiss.IndexFlatL2(dimension)
-        self.documents = []
-        
-    def add_documents(self, documents: List[Dict[str, Any]]):
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        # Vectors are addressed by their stable chunk ids so they can be removed individually
+        self.index = self._new_index()
+        self.documents: List[Dict[str, Any]] = []
+        self._doc_rows: Dict[str, int] = {}
+        self.chunk_ids = np.empty(0, dtype=np.int64)
+        self.chunk_doc = np.empty(0, dtype=np.int32)
+        self.chunk_offset = np.empty(0, dtype=np.int32)
+        self.chunk_length = np.empty(0, dtype=np.int32)
+        # Row of each document's first chunk (lowest offset), -1 if it has none; see _index_first_chunks()
+        self.doc_first_chunk = np.empty(0, dtype=np.int64)
+        # BM25 index over the same documents, kept in step with the vectors
+        self.lexical = LexicalIndex()
+        # Exact (act, section) lookup; cheap to derive, so rebuilt on load rather than saved
+        self.sections = SectionIndex()
+        # Chunk columns of batches added since the last merge, see _merge_chunks()
+        self._pending_chunks: List[Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = []
+        # Vectors waiting for IVF training, see finalize()
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._pending_count = 0
+        # Snapshot version this store was loaded from or saved as, set by IndexBuilder
+        self.version = None
+        # Set when the index file is memory-mapped; FAISS can't grow or shrink a mapped index
+        self.read_only = False
+    
+    @property
+    def num_chunks(self) -> int:
+        return len(self.chunk_ids) + sum(len(ids) for ids, _, _, _ in self._pending_chunks)
+    
+    @property
+    def normalized(self) -> bool:
+        """Whether vectors are L2-normalized and scored by cosine similarity."""
+        return self.index_type != "flat_l2"
+    
+    def add_documents(self, documents: List[Dict[str, Any]], chunks: List[Dict[str, Any]], embeddings: np.ndarray):
         """
-        Add documents and their embeddings to the vector store.
+        Add documents, their chunks and the chunk embeddings (one row per chunk) to the vector store.
+        Documents that are already present are replaced.
         """
         try:
             logger.info("Adding documents to vector store")
+            self._check_writable()
             
-            # Extract embeddings
-            embeddings = np.array([doc["embedding"] for doc in documents])
-            if embeddings.size == 0 or len(embeddings.shape) != 2:
+            embeddings = np.array(embeddings, dtype=np.float32, order="C")
+            if embeddings.size == 0 or len(embeddings.shape) != 2 or len(embeddings) != len(chunks):
                 logger.error("No valid embeddings to add to FAISS. Check chunking and embedding steps.")
                 raise ValueError("No valid embeddings to add to FAISS. Check chunking and embedding steps.")
+            if self.normalized:
+                faiss.normalize_L2(embeddings)
+            
+            # Replace documents that are already present instead of indexing them twice
+            existing = [doc["doc_id"] for doc in documents if doc["doc_id"] in self._doc_rows]
+            if existing:
+                self.remove_documents(existing)
+            
+            # Store each parent document once, without chunk-level copies
+            first_row = len(self.documents)
+            for doc in documents:
+                self._doc_rows[doc["doc_id"]] = len(self.documents)
+                self.documents.append(doc)
+            self.lexical.add_documents(documents)
+            self.sections.add_documents(documents)
             
-            # Add to FAISS index
-            self.index.add(embeddings)
+            ids = np.array([chunk["chunk_id"] for chunk in chunks], dtype=np.int64)
+            chunk_doc = np.array([self._doc_rows[chunk["doc_id"]] for chunk in chunks], dtype=np.int32)
+            if len(chunk_doc) and chunk_doc.min() < first_row:
+                raise ValueError("Chunks must belong to the documents being added")
+            offsets = np.array([chunk["offset"] for chunk in chunks], dtype=np.int32)
+            lengths = np.array([chunk["length"] for chunk in chunks], dtype=np.int32)
             
-            # Store documents
-            self.documents.extend(documents)
+            # Add to FAISS index; an untrained IVF index buffers vectors until it has enough to train on
+            if self.index.is_trained:
+                self.index.add_with_ids(embeddings, ids)
+            else:
+                self._pending.append((embeddings, ids))
+                self._pending_count += len(ids)
+                if self._pending_count >= self.nlist * IVF_MIN_POINTS_PER_LIST:
+                    self.finalize()
             
-            logger.info(f"Added {len(documents)} documents to vector store")
+            # Merged into the sorted chunk columns later, so a streamed build sorts once
+            self._pending_chunks.append((ids, chunk_doc, offsets, lengths))
+            
+            logger.info(f"Added {len(documents)} documents ({len(chunks)} chunks) to vector store")
         except Exception as e:
             logger.error(f"Error adding documents to vector store: {str(e)}")
             raise
     
-    def search(self, query_embedding: np.ndarray, k: int = 5) -> List[Dict[str, Any]]:
+    def remove_documents(self, doc_ids: List[str]) -> int:
+        """
+        Remove documents and all of their chunks. Returns the number of chunks removed.
+        """
+        try:
+            rows = [self._doc_rows[doc_id] for doc_id in doc_ids if doc_id in self._doc_rows]
+            if not rows:
+                return 0
+            self._check_writable()
+            self.finalize()
+            removed_rows = np.zeros(len(self.documents), dtype=bool)
+            removed_rows[rows] = True
+            
+            chunk_mask = removed_rows[self.chunk_doc]
+            if self.index_type == "hnsw":
+                # HNSW graphs can't delete nodes; rebuild from the surviving vectors instead
+                removed = self._rebuild_without(self.chunk_ids[chunk_mask])
+            else:
+                removed = self.index.remove_ids(self.chunk_ids[chunk_mask])
+            
+            # Compact the document table and renumber the chunks' document rows
+            new_rows = np.cumsum(~removed_rows) - 1
+            keep = ~chunk_mask
+            self.chunk_ids = self.chunk_ids[keep]
+            self.chunk_doc = new_rows[self.chunk_doc[keep]].astype(np.int32)
+            self.chunk_offset = self.chunk_offset[keep]
+            self.chunk_length = self.chunk_length[keep]
+            self.documents = [doc for doc, gone in zip(self.documents, removed_rows) if not gone]
+            self._doc_rows = {doc["doc_id"]: row for row, doc in enumerate(self.documents)}
+            self._index_first_chunks()
+            self.lexical.remove_documents(doc_ids)
+            self.sections.remove_documents(doc_ids)
+            
+            logger.info(f"Removed {len(rows)} documents ({removed} chunks) from vector store")
+            return removed
+        except Exception as e:
+            logger.error(f"Error removing documents from vector store: {str(e)}")
+            raise
+    
+    def doc_ids_for_source(self, source: str) -> List[str]:
+        """List the ids of the documents loaded from one source file."""
+        return [doc["doc_id"] for doc in self.documents if doc.get("source") == source]
+    
+    def sources(self) -> List[str]:
+        """List the source files that currently have documents in the store."""
+        return sorted({doc.get("source") for doc in self.documents if doc.get("source")})
+    
+    def chunk_text(self, row: int) -> str:
+        """Materialize the text of a chunk from its parent document."""
+        self._merge_chunks()
+        doc = self.documents[self.chunk_doc[row]]
+        offset = int(self.chunk_offset[row])
+        return doc["combined_text"][offset:offset + int(self.chunk_length[row])]
+    
+    def search(self, query_embedding: np.ndarray, k: int = 5, params: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
         """
         Search for similar documents using the query embedding.
+        `params` overrides the search-time knobs for this call: `nprobe` (IVF) and `ef_search` (HNSW).
+        """
+        return self.search_batch(np.asarray(query_embedding).reshape(1, -1), k=k, params=params)[0]
+    
+    def search_batch(self, query_embeddings: np.ndarray, k: int = 5, params: Optional[Dict[str, int]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search for several queries at once, one row of `query_embeddings` per query.
+        FAISS scans the index once for the whole matrix. Returns one hit list per query.
         """
         try:
-            # Reshape query embedding
-            query_embedding = query_embedding.reshape(1, -1)
+            query_embeddings = np.array(query_embeddings, dtype=np.float32, order="C").reshape(-1, self.dimension)
+            if self.normalized:
+                faiss.normalize_L2(query_embeddings)
+            self._merge_chunks()
             
             # Search FAISS index
-            distances, indices = self.index.search(query_embedding, k)
+            distances, indices = self.index.search(query_embeddings, k, params=self._search_parameters(params))
             
             # Get matching documents
+            batch = []
+            for query_ids, query_distances in zip(indices, distances):
+                results = []
+                for chunk_id, distance in zip(query_ids, query_distances):
+                    if chunk_id != -1:  # Valid index
+                        row = int(np.searchsorted(self.chunk_ids, chunk_id))
+                        result = {
+                            "document": self.documents[self.chunk_doc[row]],
+                            "chunk_text": self.chunk_text(row),
+                            "score": float(distance)
+                        }
+                        results.append(result)
+                batch.append(results)
+            
+            return batch
+        except Exception as e:
+            logger.error(f"Error searching vector store: {str(e)}")
+            raise
+    
+    def search_documents(self, query_embedding: np.ndarray, k: int = 5, fetch_factor: int = 4,
+                         params: Optional[Dict[str, int]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Search for the k most similar distinct documents.
+        Over-fetches k * fetch_factor chunks and collapses them by parent document, keeping each
+        document's best-scoring chunk (FAISS returns hits best first). The fetch is widened until
+        k distinct documents are found or the index is exhausted.
+        Returns the results and the raw vs collapsed hit counts.
+        """
+        return self.search_documents_batch(np.asarray(query_embedding).reshape(1, -1), k=k, fetch_factor=fetch_factor, params=params)[0]
+    
+    def search_documents_batch(self, query_embeddings: np.ndarray, k: int = 5, fetch_factor: int = 4,
+                               params: Optional[Dict[str, int]] = None) -> List[Tuple[List[Dict[str, Any]], Dict[str, int]]]:
+        """
+        search_documents for several queries. The first fetch is one batched FAISS search; only
+        queries whose hits collapse to fewer than k documents are widened one by one.
+        """
+        try:
+            query_embeddings = np.asarray(query_embeddings).reshape(-1, self.dimension)
+            total = self.index.ntotal
+            fetch = min(max(k * fetch_factor, k), total)
+            first = self.search_batch(query_embeddings, k=fetch, params=params) if fetch else [[] for _ in query_embeddings]
+            batch = []
+            for query_embedding, hits in zip(query_embeddings, first):
+                query_fetch = fetch
+                while True:
+                    results = self._collapse(hits)
+                    if len(results) >= k or query_fetch >= total:
+                        break
+                    query_fetch = min(query_fetch * 2, total)
+                    hits = self.search(query_embedding, k=query_fetch, params=params)
+                stats = {"raw_hits": len(hits), "collapsed_hits": len(results)}
+                batch.append((results[:k], stats))
+            return batch
+        except Exception as e:
+            logger.error(f"Error searching vector store by document: {str(e)}")
+            raise
+    
+    @staticmethod
+    def _collapse(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Group chunk hits by parent document, best first, counting the chunks per document."""
+        results = []
+        positions = {}
+        for hit in hits:
+            doc_id = hit["document"]["doc_id"]
+            if doc_id in positions:
+                results[positions[doc_id]]["chunk_hits"] += 1
+                continue
+            positions[doc_id] = len(results)
+            results.append({**hit, "chunk_hits": 1})
+        return results
+    
+    def search_lexical(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search documents by BM25 over their text. Each result carries the document's first chunk.
+        """
+        try:
             results = []
-            for idx, distance in zip(indices[0], distances[0]):
-                if idx != -1:  # Valid index
-                    doc = self.documents[idx]
-                    result = {
-                        "document": doc,
-                        "score": float(distance)
-                    }
-                    results.append(result)
-                    
+            for doc_id, score in self.lexical.search(query, k):
+                row = self._doc_rows[doc_id]
+                results.append({"document": self.documents[row], "chunk_text": self._first_chunk_text(row), "score": score})
             return results
         except Exception as e:
-            logger.error(f"Error searching vector store: {str(e)}")
+            logger.error(f"Error searching lexical index: {str(e)}")
             raise
-            
+    
+    def lookup_section(self, act: Optional[str], section: str) -> List[Dict[str, Any]]:
+        """
+        Documents for a statute section, without touching FAISS. Results carry no score.
+        """
+        results = []
+        for doc_id in self.sections.lookup(act, section):
+            row = self._doc_rows[doc_id]
+            results.append({"document": self.documents[row], "chunk_text": self._first_chunk_text(row), "score": None})
+        return results
+    
+    def _first_chunk_text(self, row: int) -> str:
+        self._merge_chunks()
+        chunk_row = self.doc_first_chunk[row] if row < len(self.doc_first_chunk) else -1
+        return self.chunk_text(chunk_row) if chunk_row >= 0 else ""
+    
     def save(self, save_dir: str):
         """Save the vector store to disk."""
         try:
+            self.finalize()
             os.makedirs(save_dir, exist_ok=True)
             
             # Save FAISS index
@@ -78,23 +325,176 @@ class VectorStore:
             # Save documents
             with open(os.path.join(save_dir, "documents.pkl"), "wb") as f:
                 pickle.dump(self.documents, f)
-                
+            
+            # Save chunk columns
+            np.savez(
+                os.path.join(save_dir, "chunks.npz"),
+                chunk_ids=self.chunk_ids,
+                chunk_doc=self.chunk_doc,
+                chunk_offset=self.chunk_offset,
+                chunk_length=self.chunk_length
+            )
+            
+            # Save BM25 index
+            self.lexical.save(os.path.join(save_dir, "lexical.pkl"))
+            
             logger.info(f"Vector store saved to {save_dir}")
         except Exception as e:
             logger.error(f"Error saving vector store: {str(e)}")
             raise
-            
-    def load(self, save_dir: str):
-        """Load the vector store from disk."""
+    
+    def load(self, save_dir: str, mmap: bool = False):
+        """
+        Load the vector store from disk.
+        With `mmap`, the FAISS index is mapped from the file instead of read into memory, so
+        every process serving the same snapshot shares one copy through the page cache.
+        A mapped store is read-only.
+        """
         try:
-            # Load FAISS index
-            self.index = faiss.read_index(os.path.join(save_dir, "index.faiss"))
+            # Load FAISS index; its type and metric come from the file, not the constructor
+            index_path = os.path.join(save_dir, "index.faiss")
+            self.index = self._read_index(index_path, mmap)
+            self._describe_index()
             
             # Load documents
             with open(os.path.join(save_dir, "documents.pkl"), "rb") as f:
                 self.documents = pickle.load(f)
-                
+            self._doc_rows = {doc["doc_id"]: row for row, doc in enumerate(self.documents)}
+            
+            # Load chunk columns
+            with np.load(os.path.join(save_dir, "chunks.npz")) as chunks:
+                self.chunk_ids = chunks["chunk_ids"]
+                self.chunk_doc = chunks["chunk_doc"]
+                self.chunk_offset = chunks["chunk_offset"]
+                self.chunk_length = chunks["chunk_length"]
+            self._pending_chunks = []
+            self._index_first_chunks()
+            
+            # Load BM25 index, rebuilding it for snapshots written before it existed
+            self.lexical = LexicalIndex()
+            lexical_path = os.path.join(save_dir, "lexical.pkl")
+            if os.path.exists(lexical_path):
+                self.lexical.load(lexical_path)
+            else:
+                self.lexical.add_documents(self.documents)
+            self.sections = SectionIndex()
+            self.sections.add_documents(self.documents)
+            
             logger.info(f"Vector store loaded from {save_dir}")
         except Exception as e:
             logger.error(f"Error loading vector store: {str(e)}")
             raise
+    
+    def _read_index(self, path: str, mmap: bool) -> faiss.Index:
+        self.read_only = False
+        if mmap:
+            # IO_FLAG_MMAP_IFC maps the vectors themselves; plain IO_FLAG_MMAP still copies flat codes
+            flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            try:
+                index = faiss.read_index(path, flag)
+                self.read_only = True
+                return index
+            except Exception as e:
+                logger.warning(f"Could not memory-map {path}, reading it into memory: {str(e)}")
+        return faiss.read_index(path)
+    
+    def _check_writable(self):
+        # Resizing a mapped FAISS index aborts the process, so refuse before touching it
+        if self.read_only:
+            raise RuntimeError("Vector store is memory-mapped and read-only; load it with mmap=False to modify it")
+    
+    def _new_index(self, nlist: Optional[int] = None) -> faiss.Index:
+        if self.index_type == "flat_l2":
+            index = faiss.IndexFlatL2(self.dimension)
+        elif self.index_type == "flat_ip":
+            index = faiss.IndexFlatIP(self.dimension)
+        elif self.index_type == "ivf":
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            index = faiss.IndexIVFFlat(quantizer, self.dimension, nlist or self.nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWFlat(self.dimension, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = self.ef_construction
+        return faiss.IndexIDMap2(index)
+    
+    def finalize(self):
+        """
+        Merge the chunk columns of the batches added so far and train an IVF index on the
+        vectors buffered for it. IVF training runs on its own once enough vectors arrived;
+        call this after the last batch of a build.
+        """
+        self._merge_chunks()
+        if not self._pending:
+            return
+        embeddings = np.concatenate([vectors for vectors, _ in self._pending])
+        ids = np.concatenate([ids for _, ids in self._pending])
+        self._pending = []
+        self._pending_count = 0
+        nlist = max(1, min(self.nlist, len(embeddings) // IVF_MIN_POINTS_PER_LIST))
+        if nlist != self.nlist:
+            logger.warning(f"Only {len(embeddings)} vectors to train IVF on, using nlist={nlist} instead of {self.nlist}")
+            self.nlist = nlist
+            self.index = self._new_index(nlist)
+        logger.info(f"Training IVF index with nlist={nlist} on {len(embeddings)} vectors")
+        self.index.train(embeddings)
+        self.index.add_with_ids(embeddings, ids)
+    
+    def _rebuild_without(self, ids: np.ndarray) -> int:
+        """Rebuild the index from its own vectors, leaving out `ids`. Returns the number removed."""
+        vectors = self.index.index.reconstruct_n(0, self.index.ntotal)
+        labels = faiss.vector_to_array(self.index.id_map)
+        keep = ~np.isin(labels, ids)
+        self.index = self._new_index()
+        if keep.any():
+            self.index.add_with_ids(vectors[keep], labels[keep])
+        return int((~keep).sum())
+    
+    def _search_parameters(self, params: Optional[Dict[str, int]]) -> Optional[faiss.SearchParameters]:
+        params = params or {}
+        if self.index_type == "ivf":
+            return faiss.SearchParametersIVF(nprobe=int(params.get("nprobe") or self.nprobe))
+        if self.index_type == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=int(params.get("ef_search") or self.ef_search))
+        return None
+    
+    def _describe_index(self):
+        """Derive the index type and build settings of a loaded index."""
+        index = faiss.downcast_index(self.index.index)
+        if isinstance(index, faiss.IndexHNSW):
+            self.index_type = "hnsw"
+            self.hnsw_m = index.hnsw.nb_neighbors(1)
+        elif isinstance(index, faiss.IndexIVF):
+            self.index_type = "ivf"
+            self.nlist = index.nlist
+        elif index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            self.index_type = "flat_ip"
+        else:
+            self.index_type = "flat_l2"
+    
+    def _merge_chunks(self):
+        """Concatenate the pending chunk batches onto the columns and re-sort them by chunk id."""
+        if not self._pending_chunks:
+            return
+        batches = [(self.chunk_ids, self.chunk_doc, self.chunk_offset, self.chunk_length)] + self._pending_chunks
+        self._pending_chunks = []
+        self.chunk_ids, self.chunk_doc, self.chunk_offset, self.chunk_length = (
+            np.concatenate(columns) for columns in zip(*batches)
+        )
+        self._sort_chunks()
+        self._index_first_chunks()
+    
+    def _index_first_chunks(self):
+        """Map every document row to the row of its first chunk, so lexical hits don't scan the columns."""
+        first = np.full(len(self.documents), -1, dtype=np.int64)
+        if len(self.chunk_doc):
+            # Chunks grouped by document, lowest offset first; the head of each group wins
+            order = np.lexsort((self.chunk_offset, self.chunk_doc))
+            heads = order[np.r_[True, self.chunk_doc[order][1:] != self.chunk_doc[order][:-1]]]
+            first[self.chunk_doc[heads]] = heads
+        self.doc_first_chunk = first
+    
+    def _sort_chunks(self):
+        order = np.argsort(self.chunk_ids, kind="stable")
+        self.chunk_ids = self.chunk_ids[order]
+        self.chunk_doc = self.chunk_doc[order]
+        self.chunk_offset = self.chunk_offset[order]
+        self.chunk_length = self.chunk_length[order]
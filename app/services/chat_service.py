@@ -1,47 +1,341 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import logging
+import re
+import time
+from app.core.cache import normalize_query
+from app.core.metrics import add_request_timings, observe_request, record_stage, registry, timed_stage
+from app.core.vector_store import VectorStore
 from app.services.retrieval_service import RetrievalService
 from app.services.translation_service import TranslationService
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Reference fields shown in the user's language; the law name always stays in English
+TRANSLATED_REFERENCE_FIELDS = ("category", "summary", "when_applicable")
+
 class ChatService:
     """Handles chat interactions and response generation."""
     
-    def __init__(self, retrieval_service: RetrievalService, translation_service: TranslationService):
+    def __init__(self, retrieval_service: RetrievalService, translation_service: TranslationService, response_cache=None):
         self.retrieval_service = retrieval_service
         self.translation_service = translation_service
+        # The pipeline is deterministic for a given knowledge base, so whole responses can be reused
+        self.response_cache = response_cache
+        if response_cache is not None:
+            retrieval_service.add_swap_listener(self._on_index_swap)
         
-    def process_query(self, query: str, language: str = 'en') -> Dict[str, Any]:
+    def process_query(self, query: str, language: str = 'en', search_params: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
         """
         Process a user query and generate a response.
+        `search_params` tunes the vector search for this request (nprobe, ef_search).
+        Each stage is timed (app/core/metrics.py) for /metrics and the Server-Timing header.
         """
+        started = time.perf_counter()
         try:
-            # Detect query language if not specified
-            detected_lang = self.translation_service.detect_language(query)
-            
-            # Translate query to English if needed
-            if detected_lang != 'en':
-                query_en = self.translation_service.translate_to_english(query)
-            else:
-                query_en = query
+            cache_key, cached = self.check_cache(query, language, search_params)
+            if cached is not None:
+                observe_request(time.perf_counter() - started, "cache_hit")
+                return cached
             
-            # Retrieve relevant documents
-            results = self.retrieval_service.retrieve_documents(query_en)
+            # Detect query language and translate the query to English if needed
+            with timed_stage("detect"):
+                detection = self.translation_service.detect_language_with_tier(query)
+            if self.needs_translation(*detection):
+                with timed_stage("translate_in"):
+                    query = self.translation_service.translate_to_english(query)
             
-            # Format response
-            response = self._format_response(results)
+            # Retrieve relevant documents; encode and search are timed by the retrieval service
+            response = self.format_retrieval(self.retrieval_service.retrieve(query, search_params=search_params))
             
             # Translate response if needed
             if language != 'en':
-                response = self._translate_response(response, language)
+                with timed_stage("translate_out"):
+                    texts = self.response_texts(response, language)
+                    response = self.translated_response(response, self.translation_service.translate_distinct(texts, dest=language))
             
+            self.store_response(cache_key, response)
+            observe_request(time.perf_counter() - started, "ok")
             return response
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
+            observe_request(time.perf_counter() - started, "error")
+            raise
+            
+    def check_cache(self, query: str, language: str, search_params: Optional[Dict[str, int]] = None) -> Tuple[Optional[Tuple], Optional[Dict[str, Any]]]:
+        """The response cache key and the cached response, if any; (None, None) without a response cache."""
+        if self.response_cache is None:
+            return None, None
+        cache_key = self.cache_key(query, language, search_params)
+        return cache_key, self.cached_response(cache_key)
+            
+    def cached_response(self, cache_key: Tuple) -> Optional[Dict[str, Any]]:
+        """Look the response up in the cache, timed as the "cache" stage (outcome hit or miss)."""
+        started = time.perf_counter()
+        cached = self.response_cache.get(cache_key)
+        record_stage("cache", time.perf_counter() - started, "miss" if cached is None else "hit")
+        return cached
+        
+    def store_response(self, cache_key: Optional[Tuple], response: Dict[str, Any]):
+        """Cache a finished response under the key check_cache returned."""
+        if cache_key is not None:
+            self.response_cache.put(cache_key, response)
+            
+    @staticmethod
+    def needs_translation(detected_lang: str, detection_tier: str) -> bool:
+        """Whether a query detected as `detected_lang` has to be translated to English first."""
+        logger.info(f"Detected query language '{detected_lang}' via {detection_tier}")
+        return detected_lang != 'en'
+        
+    def format_retrieval(self, retrieval: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The English response for a RetrievalService.retrieve() output, with the search stats
+        under "retrieval". Formatting is timed as the "format" stage.
+        """
+        add_request_timings(retrieval["timings"])
+        with timed_stage("format"):
+            response = self._format_response(retrieval["results"])
+        response["retrieval"] = retrieval["stats"]
+        return response
+        
+    def translated_response(self, response: Dict[str, Any], translations: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The response in the target language, from the text -> translation mapping of its
+        response_texts(). Raises the first failed translation.
+        """
+        try:
+            for translated in translations.values():
+                if isinstance(translated, Exception):
+                    raise translated
+            translated_response = self.apply_translations(response, translations)
+            translated_response["retrieval"] = response["retrieval"]
+            return translated_response
+        except Exception as e:
+            logger.error(f"Error translating response: {str(e)}")
             raise
             
+    def stream_query(self, query: str, language: str = 'en', search_params: Optional[Dict[str, int]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        process_query as a sequence of (event, payload) pairs for streaming clients:
+        "answer" with the English response as soon as retrieval returns, one "translation"
+        (or "translation_error") per translated string as it completes, and "done" with the
+        final response, identical to what process_query returns.
+        """
+        started = time.perf_counter()
+        cache_key, cached = self.check_cache(query, language, search_params)
+        if cached is not None:
+            observe_request(time.perf_counter() - started, "cache_hit")
+            yield from self.cached_events(cached)
+            return
+        
+        try:
+            with timed_stage("detect"):
+                detection = self.translation_service.detect_language_with_tier(query)
+            if self.needs_translation(*detection):
+                with timed_stage("translate_in"):
+                    query = self.translation_service.translate_to_english(query)
+            response = self.format_retrieval(self.retrieval_service.retrieve(query, search_params=search_params))
+        except Exception:
+            observe_request(time.perf_counter() - started, "error")
+            raise
+        
+        texts = self.response_texts(response, language)
+        yield self.answer_event(response, texts)
+        translations = {}
+        translate_started = time.perf_counter()
+        for text, translated in self.translation_service.translate_as_completed(texts, dest=language):
+            translations[text] = translated
+            yield self.translation_event(response, text, translated)
+        final = self.streamed_response(response, language, translations, cache_key, time.perf_counter() - translate_started)
+        observe_request(time.perf_counter() - started, "ok")
+        yield "done", {"response": final}
+        
+    @staticmethod
+    def cached_events(cached: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """The whole stream for a cached response: nothing is left to translate."""
+        return [("answer", {"response": cached, "pending_translations": 0}), ("done", {"response": cached})]
+        
+    @staticmethod
+    def answer_event(response: Dict[str, Any], texts: List[str]) -> Tuple[str, Dict[str, Any]]:
+        """The first streamed event: the English response and how many translations will follow."""
+        return "answer", {"response": response, "pending_translations": len(set(texts))}
+        
+    def translation_event(self, response: Dict[str, Any], text: str, translated: Any) -> Tuple[str, Dict[str, Any]]:
+        """
+        The streamed event for one finished translation: the response fields it fills in,
+        each as a path into the response and its new value.
+        """
+        paths = []
+        law_name, explanation = self._split_main_answer(response["main_answer"])
+        if explanation == text:
+            paths.append(["main_answer"])
+        for position, ref in enumerate(response["legal_references"]):
+            paths.extend(["legal_references", position, field] for field in TRANSLATED_REFERENCE_FIELDS if ref[field] == text)
+        if isinstance(translated, Exception):
+            logger.error(f"Error translating streamed response: {str(translated)}")
+            return "translation_error", {"paths": paths, "error": "Could not translate response"}
+        updates = []
+        for path in paths:
+            if path == ["main_answer"] and law_name is not None:
+                value = f"Based on {law_name}, here's what you should know:\n\n{translated}"
+            else:
+                value = translated
+            updates.append({"path": path, "value": value})
+        return "translation", {"updates": updates}
+        
+    def streamed_response(self, response: Dict[str, Any], language: str, translations: Dict[str, Any],
+                          cache_key: Optional[Tuple], translate_seconds: float) -> Dict[str, Any]:
+        """
+        The final response after streaming, shaped like process_query's. Strings whose
+        translation failed stay in English, and such a response is not cached.
+        """
+        failed = any(isinstance(translated, Exception) for translated in translations.values())
+        if translations:
+            record_stage("translate_out", translate_seconds, "error" if failed else "ok")
+        final = response
+        if language != 'en':
+            final = self.apply_translations(response, {
+                text: text if isinstance(translated, Exception) else translated for text, translated in translations.items()
+            })
+            final["retrieval"] = response["retrieval"]
+        if not failed:
+            self.store_response(cache_key, final)
+        return final
+            
+    def process_batch(self, items: List[Dict[str, Any]], search_params: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+        """
+        Process many queries at once; `items` are {"query": ..., "language": ...} dicts.
+        Queries are translated, embedded, searched and their responses translated as whole
+        batches, with identical strings translated once across the batch. Responses come back
+        in order; a query that fails gets {"error": ...} without failing the others.
+        """
+        responses: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        pending = []
+        cache_keys = {}
+        for position, item in enumerate(items):
+            query = item.get("query")
+            if not isinstance(query, str) or not query.strip():
+                responses[position] = {"error": "Query is required"}
+                continue
+            if self.response_cache is not None:
+                cache_keys[position] = self.cache_key(query, item.get("language", "en"), search_params)
+                cached = self.response_cache.get(cache_keys[position])
+                if cached is not None:
+                    responses[position] = cached
+                    continue
+            pending.append(position)
+        
+        # Bring non-English queries to English in one deduplicated batch
+        queries_en = {}
+        to_translate = []
+        for position in pending:
+            query = items[position]["query"]
+            if self.translation_service.detect_language(query) != 'en':
+                to_translate.append(position)
+            else:
+                queries_en[position] = query
+        if to_translate:
+            translations = self.translation_service.translate_distinct([items[position]["query"] for position in to_translate], dest='en')
+            for position in to_translate:
+                translated = translations[items[position]["query"]]
+                if isinstance(translated, Exception):
+                    responses[position] = self._batch_error("Could not translate query", translated)
+                else:
+                    queries_en[position] = translated
+        
+        # One encode and one FAISS search for the whole batch
+        searched = [position for position in pending if position in queries_en]
+        retrievals = self.retrieval_service.retrieve_batch([queries_en[position] for position in searched], search_params=search_params)
+        formatted = {}
+        for position, retrieval in zip(searched, retrievals):
+            if isinstance(retrieval, Exception):
+                responses[position] = self._batch_error("Retrieval failed", retrieval)
+                continue
+            try:
+                formatted[position] = (self._format_response(retrieval["results"]), retrieval["stats"])
+            except Exception as e:
+                responses[position] = self._batch_error("Could not format response", e)
+        
+        # Translate every response's strings in one deduplicated batch per language
+        texts = {
+            position: self.response_texts(response, items[position].get("language", "en"))
+            for position, (response, _) in formatted.items()
+        }
+        translations = {}
+        for language in {items[position].get("language", "en") for position in formatted}:
+            language_texts = [text for position, position_texts in texts.items()
+                              if items[position].get("language", "en") == language for text in position_texts]
+            if language_texts:
+                translations[language] = self.translation_service.translate_distinct(language_texts, dest=language)
+        for position, (response, stats) in formatted.items():
+            language = items[position].get("language", "en")
+            if language != 'en':
+                mapping = {text: translations[language][text] for text in texts[position]}
+                failed = next((value for value in mapping.values() if isinstance(value, Exception)), None)
+                if failed is not None:
+                    responses[position] = self._batch_error("Could not translate response", failed)
+                    continue
+                response = self.apply_translations(response, mapping)
+            response["retrieval"] = stats
+            if position in cache_keys:
+                self.response_cache.put(cache_keys[position], response)
+            responses[position] = response
+        return responses
+        
+    def cache_key(self, query: str, language: str, search_params: Optional[Dict[str, int]] = None) -> Tuple:
+        """Response cache key; the index version stays last, cache invalidation keys on it."""
+        return (normalize_query(query), language, tuple(sorted((search_params or {}).items())),
+                self.retrieval_service.index_version)
+        
+    def register_metrics(self):
+        """
+        Publish the index size and the cache and language detection counters to the metrics
+        registry. They are read from the live services at scrape time, so they follow reloads.
+        """
+        retrieval_service = self.retrieval_service
+        translation_service = self.translation_service
+        registry.gauge("index_vectors", "Vectors in the live FAISS index",
+                       function=lambda: retrieval_service.vector_store.index.ntotal)
+        registry.gauge("index_documents", "Laws in the live knowledge base",
+                       function=lambda: len(retrieval_service.vector_store.documents))
+        registry.gauge("index_generation", "Knowledge base generation, bumped on every reload",
+                       function=lambda: retrieval_service.generation)
+        caches = {"query_embedding": retrieval_service.query_cache.stats}
+        if self.response_cache is not None:
+            caches["response"] = self.response_cache.stats
+        caches["phrasebook"] = lambda: {
+            "hits": translation_service.phrasebook_hits,
+            "misses": translation_service.phrasebook_misses,
+            "size": sum(len(entries) for entries in translation_service.phrasebook.values())
+        }
+        for cache, stats in caches.items():
+            labels = {"cache": cache}
+            registry.counter("cache_hits_total", "Cache lookups that found an entry", labels,
+                             function=lambda stats=stats: stats()["hits"])
+            registry.counter("cache_misses_total", "Cache lookups that found nothing", labels,
+                             function=lambda stats=stats: stats()["misses"])
+            registry.gauge("cache_hit_ratio", "Share of cache lookups that were hits since startup", labels,
+                           function=lambda stats=stats: self._hit_ratio(stats()))
+            registry.gauge("cache_entries", "Entries currently in the cache", labels,
+                           function=lambda stats=stats: stats()["size"])
+        for tier in translation_service.detection_tiers:
+            registry.counter("language_detection_total", "Query language detections by the tier that decided", {"tier": tier},
+                             function=lambda tier=tier: translation_service.detection_tiers[tier])
+        
+    @staticmethod
+    def _hit_ratio(stats: Dict[str, Any]) -> float:
+        lookups = stats["hits"] + stats["misses"]
+        return stats["hits"] / lookups if lookups else 0.0
+        
+    @staticmethod
+    def _batch_error(message: str, error: Exception) -> Dict[str, Any]:
+        logger.error(f"{message}: {str(error)}")
+        return {"error": message}
+            
+    def _on_index_swap(self, vector_store: VectorStore):
+        """Drop responses computed against the previous knowledge base."""
+        self.response_cache.invalidate(keep_version=vector_store.version)
+            
     def _format_response(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Format the retrieved results into a structured response.
@@ -78,49 +372,71 @@ class ChatService:
         Generate a natural language response from the document.
         """
         try:
-            def safe(val):
-                return val if val and str(val).strip() else 'Information not available.'
-            summary = safe(document.get('summary') or document.get('details'))
-            when_applicable = safe(document.get('when_applicable'))
-            whom_to_approach = safe(document.get('whom_to_approach'))
-            law_name = safe(document.get('law_name'))
-            return f"Based on {law_name}, here's what you should know:\n\n{summary}\n\nWhen to apply: {when_applicable}\n\nWho to contact: {whom_to_approach}"
+            law_name = self._safe(document.get('law_name'))
+            return f"Based on {law_name}, here's what you should know:\n\n{self._answer_explanation(document)}"
         except Exception as e:
             logger.error(f"Error generating main answer: {str(e)}")
             raise
-
-    def _translate_response(self, response: Dict[str, Any], target_language: str) -> Dict[str, Any]:
+            
+    @staticmethod
+    def _safe(val) -> str:
+        return val if val and str(val).strip() else 'Information not available.'
+        
+    @classmethod
+    def _answer_explanation(cls, document: Dict[str, Any]) -> str:
+        """The translatable part of the main answer, everything after the law name."""
+        summary = cls._safe(document.get('summary') or document.get('details'))
+        when_applicable = cls._safe(document.get('when_applicable'))
+        whom_to_approach = cls._safe(document.get('whom_to_approach'))
+        return f"{summary}\n\nWhen to apply: {when_applicable}\n\nWho to contact: {whom_to_approach}"
+        
+    @classmethod
+    def translatable_texts(cls, document: Dict[str, Any]) -> List[str]:
         """
-        Translate only the explanation part of the response to the target language, keep law names in English.
+        Every string of a document that response_texts() would send for translation.
+        Used at index-build time to precompute the phrasebook.
         """
-        try:
-            translated_response = {
-                "main_answer": response["main_answer"],
-                "legal_references": []
-            }
-            if target_language == 'ta':
-                # Only translate the explanation part, not law names/sections
-                import re
-                main_answer = response["main_answer"]
-                # Split at the first colon after 'Based on ...'
-                match = re.match(r"Based on (.*?), here's what you should know:(.*)", main_answer, re.DOTALL)
-                if match:
-                    law_name = match.group(1)
-                    explanation = match.group(2)
-                    explanation_ta = self.translation_service.translate_to_tamil(explanation.strip())
-                    translated_response["main_answer"] = f"Based on {law_name}, here's what you should know:\n\n{explanation_ta}"
-                else:
-                    translated_response["main_answer"] = self.translation_service.translate_to_tamil(main_answer)
-            # Translate legal references fields except law name
-            for ref in response["legal_references"]:
-                translated_ref = {
-                    "category": self.translation_service.translate_to_tamil(ref["category"]) if target_language == 'ta' else ref["category"],
-                    "name": ref["name"],
-                    "summary": self.translation_service.translate_to_tamil(ref["summary"]) if target_language == 'ta' else ref["summary"],
-                    "when_applicable": self.translation_service.translate_to_tamil(ref["when_applicable"]) if target_language == 'ta' else ref["when_applicable"]
-                }
-                translated_response["legal_references"].append(translated_ref)
+        return [
+            document.get("law_category", ""),
+            document.get("summary", ""),
+            document.get("when_applicable", ""),
+            cls._answer_explanation(document).strip()
+        ]
+
+    @staticmethod
+    def _split_main_answer(main_answer: str) -> Tuple[Optional[str], str]:
+        """Split the main answer into the law name and the explanation after it."""
+        # Split at the first colon after 'Based on ...'
+        match = re.match(r"Based on (.*?), here's what you should know:(.*)", main_answer, re.DOTALL)
+        if match is None:
+            return None, main_answer
+        return match.group(1), match.group(2).strip()
+        
+    def response_texts(self, response: Dict[str, Any], target_language: str) -> List[str]:
+        """The strings of a response that get translated into target_language, if any."""
+        if target_language != 'ta':
+            return []
+        # Only translate the explanation part, not law names/sections
+        texts = [self._split_main_answer(response["main_answer"])[1]]
+        # Translate legal references fields except law name
+        for ref in response["legal_references"]:
+            texts.extend(ref[field] for field in TRANSLATED_REFERENCE_FIELDS)
+        return texts
+        
+    def apply_translations(self, response: Dict[str, Any], translations: Dict[str, str]) -> Dict[str, Any]:
+        """Build the translated response from a text -> translation mapping."""
+        translated_response = {
+            "main_answer": response["main_answer"],
+            "legal_references": [dict(ref) for ref in response["legal_references"]]
+        }
+        if not translations:
             return translated_response
-        except Exception as e:
-            logger.error(f"Error translating response: {str(e)}")
-            raise
+        law_name, explanation = self._split_main_answer(response["main_answer"])
+        if law_name is not None:
+            translated_response["main_answer"] = f"Based on {law_name}, here's what you should know:\n\n{translations[explanation]}"
+        else:
+            translated_response["main_answer"] = translations[explanation]
+        for ref in translated_response["legal_references"]:
+            for field in TRANSLATED_REFERENCE_FIELDS:
+                ref[field] = translations[ref[field]]
+        return translated_response
@@ -0,0 +1,159 @@
+from typing import Dict, Any, Optional, Tuple
+import os
+import threading
+import time
+import logging
+from app.core.embeddings import EmbeddingGenerator
+from app.core.index_builder import IndexBuilder
+from app.services.retrieval_service import RetrievalService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class ReloadService:
+    """
+    Rebuilds the knowledge base in the background and swaps it into the retrieval service.
+    
+    Every worker process has its own ReloadService. The one that handles a reload publishes
+    the new snapshot by flipping the CURRENT pointer; the others notice within
+    `snapshot_poll_interval` seconds and load that snapshot, so all workers converge on the
+    same index_version without rebuilding it themselves.
+    """
+    
+    def __init__(self, index_builder: IndexBuilder, retrieval_service: RetrievalService,
+                 embedding_generator: EmbeddingGenerator, watch_interval: float = 0,
+                 snapshot_poll_interval: float = 2.0):
+        self.index_builder = index_builder
+        self.retrieval_service = retrieval_service
+        self.embedding_generator = embedding_generator
+        # Polls the data folder and rebuilds on changes; off by default
+        self.watch_interval = watch_interval
+        # Polls the CURRENT pointer and loads snapshots published by other processes
+        self.snapshot_poll_interval = snapshot_poll_interval
+        self.last_error: Optional[str] = None
+        self.last_reload_at: Optional[float] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._follower: Optional[threading.Thread] = None
+        
+    def reload(self) -> bool:
+        """
+        Bring the live knowledge base up to date with the data folder.
+        The new vector store is built next to the live one and only swapped in once it is complete.
+        Returns True if a new version was swapped in.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            logger.info("Knowledge base reload already in progress, skipping")
+            return False
+        try:
+            manifest = self.index_builder.compute_manifest()
+            if manifest["version"] == self.retrieval_service.index_version and self.index_builder.is_current(manifest):
+                self.last_reload_at = time.time()
+                return False
+            # Loads the snapshot another worker already built, or ingests the delta itself
+            vector_store = self.index_builder.load_or_build(self.embedding_generator)
+            self.last_reload_at = time.time()
+            self.last_error = None
+            if vector_store.version == self.retrieval_service.index_version:
+                return False
+            self.retrieval_service.swap_vector_store(vector_store)
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error reloading knowledge base: {str(e)}")
+            return False
+        finally:
+            self._reload_lock.release()
+            
+    def reload_async(self) -> threading.Thread:
+        """Run a reload on a background thread."""
+        thread = threading.Thread(target=self.reload, name="kb-reload", daemon=True)
+        thread.start()
+        return thread
+    
+    def follow_snapshot(self) -> bool:
+        """
+        Load the snapshot CURRENT points to if it differs from the live one, e.g. after another
+        worker handled a reload. Returns True if a new version was swapped in.
+        """
+        snapshot_dir = self.index_builder.current_snapshot_dir()
+        if snapshot_dir is None or os.path.basename(snapshot_dir) == self.retrieval_service.index_version:
+            return False
+        # A reload in this process is already bringing the store up to date
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+        try:
+            vector_store = self.index_builder.load()
+            if vector_store.version == self.retrieval_service.index_version:
+                return False
+            self.retrieval_service.swap_vector_store(vector_store)
+            self.last_reload_at = time.time()
+            self.last_error = None
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Error loading published snapshot: {str(e)}")
+            return False
+        finally:
+            self._reload_lock.release()
+    
+    def start(self):
+        """Start following the snapshot pointer and, if configured, polling the data folder for changes."""
+        self._stop.clear()
+        if self.snapshot_poll_interval > 0 and self._follower is None:
+            self._follower = threading.Thread(target=self._follow, name="kb-snapshot-follower", daemon=True)
+            self._follower.start()
+        if self.watch_interval > 0 and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name="kb-watcher", daemon=True)
+            self._watcher.start()
+            logger.info(f"Watching {self.index_builder.data_folder} for changes every {self.watch_interval}s")
+        
+    def stop(self):
+        """Stop the snapshot follower and the file watcher."""
+        self._stop.set()
+        if self._follower is not None:
+            self._follower.join(timeout=self.snapshot_poll_interval + 1)
+            self._follower = None
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.watch_interval + 1)
+            self._watcher = None
+            
+    def status(self) -> Dict[str, Any]:
+        """Describe the live knowledge base for health checks."""
+        snapshot_dir = self.index_builder.current_snapshot_dir()
+        return {
+            "index_version": self.retrieval_service.index_version,
+            # The version CURRENT points to; every worker converges on it
+            "published_version": os.path.basename(snapshot_dir) if snapshot_dir else None,
+            "generation": self.retrieval_service.generation,
+            "reloading": self._reload_lock.locked(),
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error
+        }
+    
+    def _follow(self):
+        while not self._stop.wait(self.snapshot_poll_interval):
+            if self.follow_snapshot():
+                logger.info(f"Loaded snapshot {self.retrieval_service.index_version} published by another process")
+    
+    def _watch(self):
+        last_signature = self._signature()
+        while not self._stop.wait(self.watch_interval):
+            signature = self._signature()
+            if signature != last_signature:
+                logger.info("Change detected in knowledge base inputs, reloading")
+                self.reload()
+                last_signature = signature
+                
+    def _signature(self) -> Tuple:
+        """Cheap change detector: file names, sizes and mtimes of the data folder."""
+        entries = []
+        data_folder = self.index_builder.data_folder
+        try:
+            for fname in sorted(os.listdir(data_folder)):
+                stat = os.stat(os.path.join(data_folder, fname))
+                entries.append((fname, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            pass
+        return tuple(entries)
@@ -1,30 +1,239 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Tuple
+import threading
+import time
 import logging
+import numpy as np
+from app.core.batcher import MicroBatcher
+from app.core.cache import LRUCache, normalize_query
 from app.core.embeddings import EmbeddingGenerator
+from app.core.metrics import observe_stage
+from app.core.section_index import parse_statute_reference
 from app.core.vector_store import VectorStore
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+RETRIEVAL_MODES = ("dense", "lexical", "hybrid")
+
 class RetrievalService:
     """Handles document retrieval based on user queries."""
     
-    def __init__(self, vector_store: VectorStore, embedding_generator: EmbeddingGenerator):
+    def __init__(self, vector_store: VectorStore, embedding_generator: EmbeddingGenerator, query_cache_size: int = 1024,
+                 collapse_documents: bool = True, fetch_factor: int = 4, search_params: Optional[Dict[str, int]] = None,
+                 mode: str = "dense", rrf_k: int = 60, batch_max_size: int = 32, batch_max_wait_ms: float = 0.0):
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
         self.vector_store = vector_store
         self.embedding_generator = embedding_generator
+        # Return k distinct laws instead of k chunks, several of which may come from the same row
+        self.collapse_documents = collapse_documents
+        self.fetch_factor = fetch_factor
+        # Default search-time knobs (nprobe for IVF, ef_search for HNSW); requests may override them
+        self.search_params = search_params or {}
+        # hybrid (opt-in) fuses the dense and BM25 rankings with reciprocal rank fusion; its
+        # score is the fused value rather than a cosine or L2 score
+        self.mode = mode
+        self.rrf_k = rrf_k
+        # Concurrent single-query requests are coalesced into one encode + one FAISS search.
+        # Off (0) by default: with one request per worker at a time there is nothing to coalesce,
+        # so the wait would only add latency
+        self.batcher = None
+        if batch_max_wait_ms > 0 and batch_max_size > 1:
+            self.batcher = MicroBatcher(self._retrieve_coalesced, max_batch_size=batch_max_size,
+                                        max_wait_ms=batch_max_wait_ms, name="query_batcher")
+        # Query embeddings only depend on the model, so they survive knowledge base swaps
+        self.query_cache = LRUCache(query_cache_size)
+        # Bumped every time a new knowledge base is swapped in
+        self.generation = 1
+        self._swap_lock = threading.Lock()
+        self._swap_listeners: List[Callable[[VectorStore], None]] = []
+        
+    @property
+    def index_version(self) -> Optional[str]:
+        """Snapshot version of the live vector store."""
+        return self.vector_store.version
         
-    def retrieve_documents(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def add_swap_listener(self, listener: Callable[[VectorStore], None]):
+        """Register a callback that runs after a new vector store has been swapped in."""
+        self._swap_listeners.append(listener)
+        
+    def swap_vector_store(self, vector_store: VectorStore):
+        """
+        Atomically replace the live vector store. Requests already searching the old
+        store finish against it; new requests see only the fully built replacement.
+        """
+        with self._swap_lock:
+            previous = self.vector_store.version
+            self.vector_store = vector_store
+            self.generation += 1
+        logger.info(f"Swapped knowledge base {previous} -> {vector_store.version} (generation {self.generation})")
+        for listener in self._swap_listeners:
+            try:
+                listener(vector_store)
+            except Exception as e:
+                logger.error(f"Error in knowledge base swap listener: {str(e)}")
+        
+    def retrieve_documents(self, query: str, k: int = 5, search_params: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
         """
         Retrieve relevant documents based on the query.
         """
+        return self.retrieve(query, k=k, search_params=search_params)["results"]
+        
+    def retrieve(self, query: str, k: int = 5, search_params: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+        """
+        Retrieve relevant documents together with statistics about the search.
+        A query that is just an unambiguous statute reference is answered from the section
+        index (stats["path"] == "section_lookup"); everything else is searched.
+        `search_params` overrides the default nprobe/ef_search for this request.
+        """
+        if self.batcher is not None and self.mode != "lexical" and parse_statute_reference(query) is None:
+            return self.batcher.submit((query, k, tuple(sorted((search_params or {}).items()))))
+        output = self.retrieve_batch([query], k=k, search_params=search_params)[0]
+        if isinstance(output, Exception):
+            raise output
+        return output
+        
+    def _retrieve_coalesced(self, items: List[Tuple[str, int, Tuple]]) -> List[Any]:
+        """Batcher callback: run queued (query, k, search params) items, grouped by k and params."""
+        groups: Dict[Tuple, List[int]] = {}
+        for position, (_, k, params) in enumerate(items):
+            groups.setdefault((k, params), []).append(position)
+        outputs: List[Any] = [None] * len(items)
+        for (k, params), positions in groups.items():
+            batch = self.retrieve_batch([items[position][0] for position in positions], k=k, search_params=dict(params))
+            for position, output in zip(positions, batch):
+                outputs[position] = output
+        return outputs
+        
+    def retrieve_batch(self, queries: List[str], k: int = 5, search_params: Optional[Dict[str, int]] = None) -> List[Any]:
+        """
+        retrieve() for several queries, in order. Queries that need the model are embedded in
+        one encode call and searched with one FAISS call. A failing query gets its exception
+        in place of its result instead of failing the batch.
+        Each result also carries "timings": the seconds its query spent in the encode and
+        search stages (shared by the queries of one batch).
+        """
+        # Take one reference so a concurrent swap can't change the store mid-request
+        vector_store = self.vector_store
+        outputs: List[Any] = [None] * len(queries)
+        searched = []
+        for position, query in enumerate(queries):
+            started = time.perf_counter()
+            try:
+                # "IPC 302" and friends: answer from the section index without embedding the query
+                reference = parse_statute_reference(query)
+                if reference is not None:
+                    results = vector_store.lookup_section(*reference)
+                    if len(results) == 1:
+                        act, section = reference
+                        stats = {"path": "section_lookup", "raw_hits": 1, "collapsed_hits": 1,
+                                 "section": f"{act} {section}" if act else section}
+                        outputs[position] = self._timed_output(results, stats, {"search": time.perf_counter() - started})
+                        continue
+                if self.mode == "lexical":
+                    results = vector_store.search_lexical(query, k=k)
+                    stats = {"path": "search", "raw_hits": len(results), "collapsed_hits": len(results), "mode": self.mode}
+                    outputs[position] = self._timed_output(results, stats, {"search": time.perf_counter() - started})
+                    continue
+                searched.append(position)
+            except Exception as e:
+                logger.error(f"Error retrieving documents: {str(e)}")
+                observe_stage("search", time.perf_counter() - started, "error")
+                outputs[position] = e
+        if not searched:
+            return outputs
+        
+        stage, started = "encode", time.perf_counter()
         try:
-            # Generate embedding for the query
-            query_embedding = self.embedding_generator.model.encode([query])[0]
+            # Generate embeddings for the queries
+            query_embeddings = self.encode_queries([queries[position] for position in searched])
+            encode_seconds = time.perf_counter() - started
             
             # Search vector store
-            results = self.vector_store.search(query_embedding, k=k)
-            
-            return results
+            stage, started = "search", time.perf_counter()
+            params = {**self.search_params, **(search_params or {})}
+            if self.mode == "hybrid":
+                candidates = k * max(self.fetch_factor, 1)
+                if self.collapse_documents:
+                    dense = vector_store.search_documents_batch(query_embeddings, k=candidates, fetch_factor=self.fetch_factor, params=params)
+                else:
+                    dense = [
+                        (results, {"raw_hits": len(results), "collapsed_hits": len(results)})
+                        for results in vector_store.search_batch(query_embeddings, k=candidates, params=params)
+                    ]
+                searches = [
+                    self._fuse(dense_results, dense_stats, vector_store.search_lexical(queries[position], k=candidates), k)
+                    for position, (dense_results, dense_stats) in zip(searched, dense)
+                ]
+            elif self.collapse_documents:
+                searches = vector_store.search_documents_batch(query_embeddings, k=k, fetch_factor=self.fetch_factor, params=params)
+            else:
+                searches = [
+                    (results, {"raw_hits": len(results), "collapsed_hits": len(results)})
+                    for results in vector_store.search_batch(query_embeddings, k=k, params=params)
+                ]
+            timings = {"encode": encode_seconds, "search": time.perf_counter() - started}
+            for position, (results, stats) in zip(searched, searches):
+                stats.update({"path": "search", "index_type": vector_store.index_type, "mode": self.mode})
+                outputs[position] = self._timed_output(results, stats, timings)
         except Exception as e:
             logger.error(f"Error retrieving documents: {str(e)}")
-            raise
+            for position in searched:
+                observe_stage(stage, time.perf_counter() - started, "error")
+                outputs[position] = e
+        return outputs
+        
+    @staticmethod
+    def _timed_output(results: List[Dict[str, Any]], stats: Dict[str, Any], timings: Dict[str, float]) -> Dict[str, Any]:
+        # Stage metrics are kept per query, whichever entry point (request, batch, batcher) ran it
+        for stage, seconds in timings.items():
+            observe_stage(stage, seconds)
+        return {"results": results, "stats": stats, "timings": dict(timings)}
+            
+    def _fuse(self, dense: List[Dict[str, Any]], dense_stats: Dict[str, int], lexical: List[Dict[str, Any]],
+              k: int) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Fuse the dense and BM25 document rankings with reciprocal rank fusion:
+        score = sum(1 / (rrf_k + rank)) over the rankings a document appears in.
+        Both sides contribute their top k * fetch_factor documents. Without collapse_documents the
+        dense side ranks chunks, and a BM25 document counts as a hit on its first chunk.
+        """
+        fused: Dict[Tuple, Dict[str, Any]] = {}
+        for field, ranking in (("dense_score", dense), ("lexical_score", lexical)):
+            for rank, hit in enumerate(ranking, start=1):
+                key = (hit["document"]["doc_id"],) if self.collapse_documents else (hit["document"]["doc_id"], hit["chunk_text"])
+                entry = fused.get(key)
+                if entry is None:
+                    # Prefer the dense hit's chunk and chunk_hits; dense results come first
+                    entry = fused[key] = {**hit, "score": 0.0, "dense_score": None, "lexical_score": None}
+                entry[field] = hit["score"]
+                entry["score"] += 1.0 / (self.rrf_k + rank)
+        results = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:k]
+        stats = {**dense_stats, "lexical_hits": len(lexical), "collapsed_hits": len(fused)}
+        return results, stats
+        
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Embed a query, reusing the cached vector for repeated (normalized) questions.
+        """
+        return self.encode_queries([query])[0]
+        
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed several queries as one matrix. Cached vectors are reused and the remaining
+        distinct (normalized) queries are encoded in a single model call.
+        """
+        keys = [normalize_query(query) for query in queries]
+        embeddings = {}
+        for key in keys:
+            if key not in embeddings:
+                embeddings[key] = self.query_cache.get(key)
+        missing = [key for key, embedding in embeddings.items() if embedding is None]
+        if missing:
+            for key, embedding in zip(missing, self.embedding_generator.model.encode(missing)):
+                # Copy so a cached row doesn't keep the whole batch matrix alive
+                embedding = np.array(embedding)
+                embedding.setflags(write=False)
+                self.query_cache.put(key, embedding)
+                embeddings[key] = embedding
+        return np.stack([embeddings[key] for key in keys])
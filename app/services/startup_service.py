@@ -0,0 +1,129 @@
+from typing import Dict, Any, Callable, Optional, Tuple
+import threading
+import time
+import logging
+from app.core.metrics import registry
+from app.services.chat_service import ChatService
+from app.services.reload_service import ReloadService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pipeline stages in the order they run
+STARTUP_STAGES = ("loading_model", "loading_index", "starting_services", "warming_up")
+
+# Sent through the retrieval pipeline once before reporting ready
+WARMUP_QUERY = "How do I file a complaint at the police station?"
+
+class StartupService:
+    """
+    Runs the pipeline startup (model, index snapshot, services, a warm-up query) in the
+    background so the HTTP server can bind and answer liveness checks right away, and
+    reports which stage it is in for the readiness probe.
+
+    `build` receives this object, calls begin() as it enters each stage and returns
+    (chat_service, reload_service).
+    """
+
+    def __init__(self, build: Callable[["StartupService"], Tuple[ChatService, ReloadService]], retry_after: int = 5):
+        self.build = build
+        # Seconds clients are told to wait (Retry-After) while starting
+        self.retry_after = retry_after
+        self.chat_service: Optional[ChatService] = None
+        self.reload_service: Optional[ReloadService] = None
+        self.stage = "pending"
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.ready_at: Optional[float] = None
+        self._durations: Dict[str, float] = {}
+        self._stage_started: Optional[float] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+
+    def begin(self, stage: str):
+        """Mark the start of a stage, closing the previous one."""
+        now = time.time()
+        with self._lock:
+            if self._stage_started is not None and self.stage in STARTUP_STAGES:
+                self._durations[self.stage] = now - self._stage_started
+                registry.gauge("startup_stage_duration_seconds", "Time taken by each pipeline startup stage",
+                               {"stage": self.stage}).set(self._durations[self.stage])
+            self.stage = stage
+            self._stage_started = now
+        if stage in STARTUP_STAGES:
+            logger.info(f"Startup stage {STARTUP_STAGES.index(stage) + 1}/{len(STARTUP_STAGES)}: {stage}")
+
+    def run(self):
+        """Run every stage in the calling thread. Raises if startup fails."""
+        self.started_at = time.time()
+        try:
+            chat_service, reload_service = self.build(self)
+            self.begin("warming_up")
+            self._warm_up(chat_service)
+            self.chat_service, self.reload_service = chat_service, reload_service
+            self.begin("ready")
+            self.ready_at = time.time()
+            registry.gauge("startup_duration_seconds", "Time from the start of pipeline startup until ready").set(self.ready_at - self.started_at)
+            self._ready.set()
+            logger.info(f"Pipeline ready in {self.ready_at - self.started_at:.1f}s")
+        except Exception as e:
+            # `stage` keeps the stage that failed
+            self.error = str(e)
+            logger.error(f"Error starting pipeline: {str(e)}")
+            raise
+
+    def start(self) -> threading.Thread:
+        """Run startup on a background thread."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_in_background, name="startup", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the pipeline is ready; returns False on timeout."""
+        return self._ready.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """Readiness payload: current stage, completed stages and their durations."""
+        with self._lock:
+            durations = dict(self._durations)
+            stage_started = self._stage_started
+        now = time.time()
+        return {
+            "status": "ready" if self.ready else "failed" if self.failed else "starting",
+            "stage": self.stage,
+            "stages_completed": len(durations),
+            "stages_total": len(STARTUP_STAGES),
+            "stage_elapsed_seconds": round(now - stage_started, 3) if stage_started and not self.ready and not self.failed else None,
+            "stage_durations_seconds": {stage: round(seconds, 3) for stage, seconds in durations.items()},
+            "elapsed_seconds": round((self.ready_at or now) - self.started_at, 3) if self.started_at else None,
+            "error": self.error
+        }
+
+    def _run_in_background(self):
+        try:
+            self.run()
+        except Exception:
+            # Already logged and recorded in status(); the liveness probe reports it
+            pass
+
+    @staticmethod
+    def _warm_up(chat_service: ChatService):
+        # One real query through encode and search, outside the micro-batcher, so the first
+        # request doesn't pay for lazy initialization in the model and the index
+        started = time.time()
+        result = chat_service.retrieval_service.retrieve_batch([WARMUP_QUERY])[0]
+        if isinstance(result, Exception):
+            logger.warning(f"Warm-up query failed: {str(result)}")
+            return
+        logger.info(f"Warm-up query took {(time.time() - started) * 1000:.0f}ms")
@@ -1,27 +1,197 @@
-from typing import Dict, Any
+from typing import Dict, Any, Container, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 import logging
 from googletrans import Translator
+from langdetect import DetectorFactory, detect_langs
+from langdetect.detector_factory import init_factory
+from app.core.forksafe import reinit_after_fork
+from app.core.lexical_index import tokenize
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Make langdetect deterministic for the same input
+DetectorFactory.seed = 0
+
+TAMIL_BLOCK = ('\u0B80', '\u0BFF')
+
+# Function words that mark Latin text as English even when the knowledge base vocabulary is empty
+ENGLISH_FUNCTION_WORDS = frozenset(
+    "a an the of to in on at for from by with and or not no is are was were be been am i me my we our "
+    "you your he she his her it its they them their this that what which who whom how when where why "
+    "can could should would will do does did have has had if after before about under against".split()
+)
+
 class TranslationService:
     """Handles translation between Tamil and English."""
     
-    def __init__(self):
+    def __init__(self, max_workers: int = 8, min_confidence: float = 0.9, english_word_share: float = 0.5):
         self.translator = Translator()
+        # Live translations are network-bound, so batches fan out over a small thread pool
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        # Precomputed translations of the static corpus strings: {language: {english: translated}}
+        self.phrasebook: Dict[str, Dict[str, str]] = {}
+        self.phrasebook_hits = 0
+        self.phrasebook_misses = 0
+        self.detection_tiers = {"script": 0, "vocabulary": 0, "langdetect": 0, "remote": 0}
+        # Latin-only text is English if more than this share of its words are known English words
+        self.english_word_share = english_word_share
+        # langdetect answers on Latin-only text below this probability go to the remote tier
+        self.min_confidence = min_confidence
+        # Words of the knowledge base (the BM25 vocabulary), see set_vocabulary()
+        self.vocabulary: Container[str] = frozenset()
+        self._counter_lock = threading.Lock()
+        # Load langdetect's language profiles now rather than on the first request
+        init_factory()
+        reinit_after_fork(self._after_fork)
+        
+    def _after_fork(self):
+        # A forked worker can't use the parent's thread pool or HTTP sessions
+        self.translator = Translator()
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        
+    def set_phrasebook(self, phrasebook: Dict[str, Dict[str, str]]):
+        """Replace the precomputed translations, e.g. after a knowledge base reload."""
+        self.phrasebook = phrasebook or {}
+        
+    def set_vocabulary(self, vocabulary: Container[str]):
+        """
+        Replace the known English words (casefolded tokens, e.g. the BM25 index terms)
+        used to recognise English queries without langdetect.
+        """
+        self.vocabulary = vocabulary
+        
+    def build_phrasebook(self, texts: Iterable[str], dest: str = 'ta', existing: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Translate every distinct text once for storage in the index snapshot.
+        Texts already present in `existing` are reused instead of translated again.
+        """
+        existing = existing or {}
+        phrasebook = {}
+        missing = []
+        for text in sorted(set(t for t in texts if t and t.strip())):
+            if text in existing:
+                phrasebook[text] = existing[text]
+            else:
+                missing.append(text)
+        failed = 0
+        for text, translated in self._translate_live(missing, dest).items():
+            if isinstance(translated, Exception):
+                failed += 1
+                logger.warning(f"Could not precompute translation, leaving it to live translation: {str(translated)}")
+            else:
+                phrasebook[text] = translated
+        logger.info(f"Phrasebook for '{dest}': {len(phrasebook)} entries, {len(phrasebook) - len(existing.keys() & phrasebook.keys())} newly translated, {failed} failed")
+        return phrasebook
+        
+    def lookup(self, text: str, dest: str) -> Optional[str]:
+        """Return the precomputed translation of text, if there is one."""
+        translated = self.phrasebook.get(dest, {}).get(text)
+        with self._counter_lock:
+            if translated is None:
+                self.phrasebook_misses += 1
+            else:
+                self.phrasebook_hits += 1
+        return translated
         
     def translate_to_tamil(self, text: str) -> str:
         """
         Translate text from English to Tamil.
+        Static corpus strings come from the precomputed phrasebook; anything else is translated live.
         """
         try:
+            precomputed = self.lookup(text, 'ta')
+            if precomputed is not None:
+                return precomputed
             translation = self.translator.translate(text, dest='ta')
             return translation.text
         except Exception as e:
             logger.error(f"Error translating to Tamil: {str(e)}")
             raise
             
+    def translate_batch(self, texts: List[str], dest: str = 'ta') -> List[str]:
+        """
+        Translate a list of strings, returning translations in the same order.
+        Identical strings are translated once, phrasebook entries are looked up, and the
+        remaining strings are translated concurrently, so latency tracks the slowest call.
+        """
+        try:
+            translations = self.translate_distinct(texts, dest)
+            for translated in translations.values():
+                if isinstance(translated, Exception):
+                    raise translated
+            return [translations[text] for text in texts]
+        except Exception as e:
+            logger.error(f"Error translating batch to '{dest}': {str(e)}")
+            raise
+            
+    def translate_distinct(self, texts: List[str], dest: str = 'ta') -> Dict[str, Any]:
+        """
+        Translate the distinct strings of `texts`, mapping each to its translation, or to the
+        exception it failed with so one bad string doesn't sink the others.
+        """
+        translations, missing = self._precomputed(texts, dest)
+        translations.update(self._translate_live(missing, dest))
+        return translations
+            
+    def translate_as_completed(self, texts: List[str], dest: str = 'ta') -> Iterator[Tuple[str, Any]]:
+        """
+        translate_distinct, yielding (text, translation or exception) pairs as each one is
+        ready: phrasebook hits first, then live translations in the order they finish.
+        """
+        translations, missing = self._precomputed(texts, dest)
+        yield from translations.items()
+        futures = {self._get_executor().submit(self._translate_one, text, dest): text for text in missing}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+            
+    def _precomputed(self, texts: List[str], dest: str) -> Tuple[Dict[str, Any], List[str]]:
+        """Split distinct texts into phrasebook hits (and blanks) and the ones left to translate."""
+        translations: Dict[str, Any] = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            precomputed = self.lookup(text, dest) if text and text.strip() else text
+            if precomputed is None:
+                missing.append(text)
+            else:
+                translations[text] = precomputed
+        return translations, missing
+        
+    def _translate_live(self, texts: List[str], dest: str) -> Dict[str, Any]:
+        """
+        Translate distinct texts over the thread pool. Failures are returned as exceptions
+        in place of the translation so callers can decide how to handle them.
+        """
+        if len(texts) <= 1:
+            return {text: self._translate_one(text, dest) for text in texts}
+        return dict(zip(texts, self._get_executor().map(lambda text: self._translate_one(text, dest), texts)))
+        
+    def _translate_one(self, text: str, dest: str) -> Any:
+        try:
+            return self._thread_translator().translate(text, dest=dest).text
+        except Exception as e:
+            return e
+        
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="translate")
+            return self._executor
+            
+    def _thread_translator(self) -> Translator:
+        """googletrans clients hold an HTTP session, so each pool thread keeps its own."""
+        translator = getattr(self._local, "translator", None)
+        if translator is None:
+            translator = self._local.translator = Translator()
+        return translator
+        
     def translate_to_english(self, text: str) -> str:
         """
         Translate text from Tamil to English.
@@ -37,9 +207,115 @@ class TranslationService:
         """
         Detect the language of the input text.
         """
+        return self.detect_language_with_tier(text)[0]
+        
+    def detect_language_with_tier(self, text: str) -> Tuple[str, str]:
+        """
+        Detect the language of the input text and report which tier decided it:
+        "script" (Unicode block counts, free), "vocabulary" (Latin text made of known English
+        words, free), "langdetect" (offline model, for mixed, other-script or unfamiliar Latin
+        input) or "remote" (googletrans, for what langdetect isn't sure about, such as
+        romanized Tamil).
+        """
         try:
-            detection = self.translator.detect(text)
-            return detection.lang
+            lang, tier = self._detect_locally(text)
+            if lang is None:
+                lang, tier = self.translator.detect(text).lang, "remote"
+            self._count_tier(tier)
+            return lang, tier
         except Exception as e:
             logger.error(f"Error detecting language: {str(e)}")
             raise
+            
+    def _detect_locally(self, text: str) -> Tuple[Optional[str], str]:
+        lang = self._detect_by_script(text)
+        if lang is not None:
+            return lang, "script"
+        latin_only = self._latin_only(text)
+        if latin_only and self._looks_english(text):
+            return 'en', "vocabulary"
+        return self._detect_offline(text, latin_only), "langdetect"
+        
+    def _count_tier(self, tier: str):
+        with self._counter_lock:
+            self.detection_tiers[tier] += 1
+            
+    @staticmethod
+    def _script_counts(text: str) -> Tuple[int, int, int]:
+        """Tamil, ASCII Latin and other letters in the text."""
+        tamil = latin = other = 0
+        for char in text:
+            if TAMIL_BLOCK[0] <= char <= TAMIL_BLOCK[1]:
+                tamil += 1
+            elif char.isalpha():
+                if char.isascii():
+                    latin += 1
+                else:
+                    other += 1
+        return tamil, latin, other
+        
+    @classmethod
+    def _detect_by_script(cls, text: str) -> Optional[str]:
+        """
+        Decide Tamil from the scripts of the letters alone. Text without any letters
+        ("302") is English. Returns None for Latin, mixed or other-script text, which
+        another tier has to decide: Latin letters may be English or romanized Tamil.
+        """
+        tamil, latin, other = cls._script_counts(text)
+        if other:
+            return None
+        if tamil >= latin and tamil:
+            return 'ta'
+        if not tamil and not latin:
+            return 'en'
+        return None
+        
+    @classmethod
+    def _latin_only(cls, text: str) -> bool:
+        tamil, latin, other = cls._script_counts(text)
+        return latin > 0 and not tamil and not other
+        
+    def _looks_english(self, text: str) -> bool:
+        """
+        Whether most words of Latin text are known English words. langdetect is unreliable
+        on short English queries ("cyber fraud complaint" comes back as French), while the
+        knowledge base vocabulary covers most of them. Romanized Tamil ("enakku complaint
+        kodukkanum") mostly isn't in it.
+        """
+        words = [token for token in tokenize(text) if not token.isdigit()]
+        if not words:
+            return True
+        known = sum(word in ENGLISH_FUNCTION_WORDS or word in self.vocabulary for word in words)
+        return known / len(words) > self.english_word_share
+        
+    def _detect_offline(self, text: str, latin_only: bool = False) -> Optional[str]:
+        """
+        Use langdetect for mixed-script, other-script and unfamiliar Latin input. Text that
+        contains Tamil letters is only ever classified as Tamil or English. For Latin-only
+        text an answer below min_confidence returns None, so the remote tier decides:
+        langdetect has no profile for romanized Tamil and spreads it over unrelated languages.
+        """
+        try:
+            candidates = detect_langs(text)
+        except Exception:
+            # langdetect raises on input without usable features
+            return None
+        if not candidates:
+            return None
+        if any(TAMIL_BLOCK[0] <= char <= TAMIL_BLOCK[1] for char in text):
+            for candidate in candidates:
+                if candidate.lang in ('ta', 'en'):
+                    return candidate.lang
+            return 'ta'
+        if latin_only and candidates[0].prob < self.min_confidence:
+            return None
+        return candidates[0].lang
+            
+    def stats(self) -> Dict[str, Any]:
+        """Phrasebook size and hit/miss counters."""
+        return {
+            "phrasebook_entries": {lang: len(entries) for lang, entries in self.phrasebook.items()},
+            "phrasebook_hits": self.phrasebook_hits,
+            "phrasebook_misses": self.phrasebook_misses,
+            "detection_tiers": dict(self.detection_tiers)
+        }
@@ -4,15 +4,23 @@ import os
 import sys
 import importlib.util
 
-def load_app_factory():
-    """Load the create_app function from app.py"""
+def load_app_module():
+    """Load the app.py module"""
     spec = importlib.util.spec_from_file_location(
         "app_module", 
         os.path.join(os.path.dirname(__file__), "app.py")
     )
     app_module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(app_module)
-    return app_module.create_app
+    return app_module
+
+# app.py is executed once; a second copy would have its own blueprint and module globals
+_app_module = load_app_module()
+
+def load_app_factory():
+    """Return the create_app function from app.py"""
+    return _app_module.create_app
 
-# Export the create_app function
-create_app = load_app_factory()
+# Export the create_app function and start_background_services for gunicorn's post_fork hook
+create_app = _app_module.create_app
+start_background_services = _app_module.start_background_services
@@ -0,0 +1,22 @@
+"""ASGI entry point: serves the Flask app under an ASGI server.
+
+Usage:
+    uvicorn asgi:app --host 0.0.0.0 --port $PORT
+
+The Flask app from app.py is wrapped by a WSGI-to-ASGI adapter, so routes, CORS,
+startup gating, server-sent events and Server-Timing are the same as under gunicorn.
+Each request runs on the adapter's thread pool (ASGI_THREADS, default 32) and live
+translation blocks its thread exactly as in a threaded gunicorn worker.
+
+The model and index load in the background once the app is created; /health answers
+right away and /ready reports progress.
+"""
+import os
+from a2wsgi import WSGIMiddleware
+
+# Requests arrive concurrently on the thread pool, so let the retrieval micro-batcher coalesce them
+os.environ.setdefault('QUERY_BATCH_MAX_WAIT_MS', '2')
+
+from app_loader import create_app
+
+app = WSGIMiddleware(create_app(), workers=int(os.environ.get('ASGI_THREADS', '32')))
@@ -0,0 +1,19 @@
+"""Benchmarks for the RAG pipeline: how build time, startup, memory and query latency scale with data/.
+
+Run from the repository root:
+    python -m benchmarks.run [--sizes 1000,10000,100000,1000000] [--output results.json]
+
+    python -m benchmarks.corpus --rows 10000 --output-dir benchmarks/work/corpus-10000
+    python -m benchmarks.build --data-dir benchmarks/work/corpus-10000/data
+    python -m benchmarks.load --rows 10000 --concurrency 1,4,16
+    python -m benchmarks.compare before.json after.json
+
+corpus.py generates synthetic law corpora in the CSV schema of data/. build.py times the
+DocumentLoader, TextSplitter, EmbeddingGenerator and VectorStore stages (plus snapshot save
+and load) and samples their peak RSS. load.py drives the Flask app in-process at increasing
+concurrency with translation served by a local stub. Every command prints JSON, and
+compare.py flags regressions between two result files.
+
+The embedding model is configured like the app: EMBEDDING_MODEL, EMBEDDING_BACKEND,
+EMBEDDING_MODEL_DIR and EMBEDDING_ONNX_FILE.
+"""
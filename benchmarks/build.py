@@ -0,0 +1,182 @@
+"""Time each stage of an index build over a corpus and sample its peak memory.
+
+Usage:
+    python -m benchmarks.build --data-dir benchmarks/work/corpus-100000/data [--embed-sample 10000]
+
+Stages, in order: load_documents (DocumentLoader, streamed in --load-chunksize batches like
+IndexBuilder), split (TextSplitter), load_model and embed (EmbeddingGenerator), build_index
+(VectorStore.add_documents per batch plus finalize), then save_snapshot, load_snapshot and
+load_snapshot_mmap (what app startup pays). Each stage reports seconds, the peak RSS while it
+ran and how far RSS grew over it.
+
+Encoding a large corpus on CPU takes hours, so only the first --embed-sample chunks go
+through the model: the embed stage reports that throughput and the projected time for
+every chunk, and the remaining chunks are indexed with random vectors (generating them is
+not counted). Pass --embed-sample 0 to embed nothing, or a negative value to embed all.
+Run one corpus per process (benchmarks.run does) so earlier stages don't skew the memory.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import resource
+import shutil
+import sys
+import time
+from typing import Any, Dict, Optional
+import numpy as np
+from app.core.document_loader import DocumentLoader
+from app.core.embeddings import EmbeddingGenerator
+from app.core.text_splitter import TextSplitter
+from app.core.vector_store import VectorStore, INDEX_TYPES
+from benchmarks.common import MB, PeakRSS, Stage, run_info
+from benchmarks.corpus import CORPUS_FILE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def benchmark_build(data_dir: str, work_dir: str, embed_sample: int = 10000, index_type: str = "flat_ip",
+                    index_params: Optional[Dict[str, int]] = None, chunk_size: int = 500, chunk_overlap: int = 50,
+                    load_chunksize: int = 5000, load_workers: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """Run the build stages over the corpus in data_dir; the snapshot is written under work_dir."""
+    index_params = index_params or {}
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    with Stage() as stage:
+        document_loader = DocumentLoader(data_dir, max_workers=load_workers)
+        batches = list(document_loader.iter_documents(chunksize=load_chunksize))
+    num_documents = sum(len(batch) for batch in batches)
+    stages["load_documents"] = {**stage.report, "documents": num_documents,
+                                "documents_per_second": round(num_documents / max(stage.seconds, 1e-9), 1)}
+
+    with Stage() as stage:
+        text_splitter = TextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        chunk_batches = [text_splitter.split_documents(batch) for batch in batches]
+    num_chunks = sum(len(chunks) for chunks in chunk_batches)
+    stages["split"] = {**stage.report, "chunks": num_chunks,
+                       "chunks_per_second": round(num_chunks / max(stage.seconds, 1e-9), 1)}
+
+    with Stage() as stage:
+        embedding_generator = EmbeddingGenerator(
+            os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+            backend=os.environ.get('EMBEDDING_BACKEND', 'torch'),
+            model_dir=os.environ.get('EMBEDDING_MODEL_DIR') or None,
+            onnx_file=os.environ.get('EMBEDDING_ONNX_FILE') or None
+        )
+    stages["load_model"] = stage.report
+    dimension = embedding_generator.model.get_sentence_embedding_dimension()
+
+    sample = [chunk for chunks in chunk_batches for chunk in chunks]
+    if embed_sample >= 0:
+        sample = sample[:embed_sample]
+    with Stage() as stage:
+        embedded = embedding_generator.generate_embeddings(sample) if sample else np.empty((0, dimension), dtype=np.float32)
+    del sample
+    chunks_per_second = len(embedded) / max(stage.seconds, 1e-9)
+    stages["embed"] = {
+        **stage.report,
+        "chunks": len(embedded),
+        "chunks_per_second": round(chunks_per_second, 1),
+        "projected_seconds": round(num_chunks / chunks_per_second, 1) if len(embedded) else None
+    }
+
+    # Batches are added the way IndexBuilder adds them; vectors past the sample are random
+    rng = np.random.default_rng(seed)
+    vector_store = VectorStore(dimension=dimension, index_type=index_type, **index_params)
+    add_seconds = 0.0
+    position = 0
+    with PeakRSS() as memory:
+        for documents, chunks in zip(batches, chunk_batches):
+            embeddings = embedded[position:position + len(chunks)]
+            if len(embeddings) < len(chunks):
+                filler = rng.standard_normal((len(chunks) - len(embeddings), dimension), dtype=np.float32)
+                embeddings = np.concatenate([embeddings, filler])
+            position += len(chunks)
+            started = time.perf_counter()
+            vector_store.add_documents(documents, chunks, embeddings)
+            add_seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        vector_store.finalize()
+        add_seconds += time.perf_counter() - started
+    stages["build_index"] = {"seconds": round(add_seconds, 3), **memory.report(), "vectors": int(vector_store.index.ntotal),
+                             "random_vectors": int(max(num_chunks - len(embedded), 0))}
+    del batches, chunk_batches, embedded
+    gc.collect()
+
+    snapshot_dir = os.path.join(work_dir, "snapshot")
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    with Stage() as stage:
+        vector_store.save(snapshot_dir)
+    stages["save_snapshot"] = {**stage.report, "snapshot_mb": round(_directory_bytes(snapshot_dir) / MB, 1)}
+    del vector_store
+    gc.collect()
+
+    for name, mmap in (("load_snapshot", False), ("load_snapshot_mmap", True)):
+        with Stage() as stage:
+            loaded = VectorStore(dimension=dimension, index_type=index_type, **index_params)
+            loaded.load(snapshot_dir, mmap=mmap)
+        stages[name] = stage.report
+        del loaded
+        gc.collect()
+
+    corpus = None
+    try:
+        # Written next to the data folder by benchmarks.corpus
+        with open(os.path.join(os.path.dirname(os.path.abspath(data_dir)), CORPUS_FILE), "r") as f:
+            corpus = json.load(f)
+    except (OSError, ValueError):
+        pass
+    return {
+        "data_dir": data_dir,
+        "corpus": corpus,
+        "settings": {"index_type": index_type, "index_params": index_params, "chunk_size": chunk_size,
+                     "chunk_overlap": chunk_overlap, "load_chunksize": load_chunksize, "embed_sample": embed_sample},
+        "documents": num_documents,
+        "chunks": num_chunks,
+        "stages": stages,
+        # ru_maxrss is in kilobytes on Linux
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the index build stages over a corpus.")
+    parser.add_argument("--data-dir", required=True, help="Folder with the corpus CSV files")
+    parser.add_argument("--work-dir", help="Folder for the snapshot (default: bench/ next to the data folder)")
+    parser.add_argument("--embed-sample", type=int, default=10000, help="Chunks encoded by the model (negative: all)")
+    parser.add_argument("--index-type", default=os.environ.get('INDEX_TYPE', 'flat_ip'), choices=INDEX_TYPES)
+    parser.add_argument("--nlist", type=int, default=int(os.environ.get('IVF_NLIST', '1024')), help="IVF lists")
+    parser.add_argument("--hnsw-m", type=int, default=int(os.environ.get('HNSW_M', '32')), help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=int(os.environ.get('HNSW_EF_CONSTRUCTION', '200')))
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--load-chunksize", type=int, default=int(os.environ.get('LOAD_CHUNKSIZE', '5000')))
+    parser.add_argument("--load-workers", type=int, default=int(os.environ.get('LOAD_WORKERS', '0')) or None)
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    result = {
+        "run": run_info(),
+        "build": benchmark_build(
+            args.data_dir, args.work_dir or os.path.join(os.path.dirname(os.path.abspath(args.data_dir)), "bench"), embed_sample=args.embed_sample,
+            index_type=args.index_type,
+            index_params={"nlist": args.nlist, "hnsw_m": args.hnsw_m, "ef_construction": args.ef_construction},
+            chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap,
+            load_chunksize=args.load_chunksize, load_workers=args.load_workers
+        )
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
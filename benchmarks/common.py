@@ -0,0 +1,98 @@
+"""Helpers shared by the benchmarks: memory sampling and a description of the run."""
+import os
+import platform
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Optional
+
+MB = 1 << 20
+
+
+def rss_bytes() -> int:
+    """Resident memory of this process (Linux); 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+class PeakRSS:
+    """
+    Samples this process's RSS on a background thread while the block runs, so each stage
+    gets its own peak (ru_maxrss only knows the peak of the whole process).
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "PeakRSS":
+        self.start = self.peak = rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name="rss-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes())
+
+    def report(self) -> Dict[str, float]:
+        return {
+            "peak_rss_mb": round(self.peak / MB, 1),
+            "rss_growth_mb": round((self.peak - self.start) / MB, 1)
+        }
+
+
+class Stage:
+    """Times a block and samples its peak RSS; `report` holds seconds plus the memory figures."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.report: Dict[str, Any] = {}
+        self._memory = PeakRSS()
+        self._started = 0.0
+
+    def __enter__(self) -> "Stage":
+        self._memory.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._started
+        self._memory.__exit__(*exc_info)
+        self.report = {"seconds": round(self.seconds, 3), **self._memory.report()}
+
+
+def run_info() -> Dict[str, Any]:
+    """Commit, host and embedding settings, so result files can be compared knowingly."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "embedding": {
+            "model": os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'),
+            "backend": os.environ.get('EMBEDDING_BACKEND', 'torch'),
+            "model_dir": os.environ.get('EMBEDDING_MODEL_DIR') or None,
+            "onnx_file": os.environ.get('EMBEDDING_ONNX_FILE') or None
+        }
+    }
@@ -0,0 +1,106 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/<before>.json benchmarks/results/<after>.json [--threshold 0.1]
+
+Every numeric metric present in both files is compared. Times, latencies and memory are
+better lower; throughput (qps, *_per_second) is better higher. Changes beyond --threshold
+(relative) are listed, and the exit status is 1 if any of them is a regression.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional
+
+# Leaves that describe the run rather than measure it
+IGNORED_KEYS = {"run", "settings", "corpus", "data_dir", "documents", "chunks", "vectors", "random_vectors",
+                "requests", "concurrency", "projected_seconds"}
+# Metrics where differences below this are noise whatever the relative change
+ABSOLUTE_FLOOR = {"seconds": 0.05, "ms": 1.0, "mb": 5.0}
+
+
+def flatten(result: Any, prefix: str = "") -> Dict[str, float]:
+    """{"build.10000.stages.embed.seconds": 12.3, "load.levels[c=4].qps": 210.0, ...}"""
+    metrics = {}
+    if isinstance(result, dict):
+        for key, value in result.items():
+            if key not in IGNORED_KEYS:
+                metrics.update(flatten(value, f"{prefix}.{key}" if prefix else key))
+    elif isinstance(result, list):
+        for position, value in enumerate(result):
+            label = f"c={value['concurrency']}" if isinstance(value, dict) and "concurrency" in value else str(position)
+            metrics.update(flatten(value, f"{prefix}[{label}]"))
+    elif isinstance(result, (int, float)) and not isinstance(result, bool):
+        metrics[prefix] = float(result)
+    return metrics
+
+
+def higher_is_better(metric: str) -> bool:
+    name = metric.rsplit(".", 1)[-1]
+    return name == "qps" or name.endswith("_per_second")
+
+
+def _floor(metric: str) -> float:
+    name = metric.rsplit(".", 1)[-1]
+    if name.endswith("_mb"):
+        return ABSOLUTE_FLOOR["mb"]
+    if "_ms" in metric:
+        return ABSOLUTE_FLOOR["ms"]
+    if name.endswith("seconds"):
+        return ABSOLUTE_FLOOR["seconds"]
+    return 0.0
+
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float = 0.1) -> Dict[str, Any]:
+    """Changes beyond `threshold` between two results, split into regressions and improvements."""
+    old, new = flatten(before), flatten(after)
+    regressions, improvements = [], []
+    for metric in sorted(old.keys() & new.keys()):
+        a, b = old[metric], new[metric]
+        if abs(b - a) <= _floor(metric):
+            continue
+        change: Optional[float] = (b - a) / abs(a) if a else None
+        if change is not None and abs(change) <= threshold:
+            continue
+        worse = (b < a) if higher_is_better(metric) else (b > a)
+        entry = {"metric": metric, "before": a, "after": b, "change": round(change, 4) if change is not None else None}
+        (regressions if worse else improvements).append(entry)
+    return {
+        "before": before.get("run", {}).get("commit"),
+        "after": after.get("run", {}).get("commit"),
+        "threshold": threshold,
+        "regressions": regressions,
+        "improvements": improvements,
+        "only_before": sorted(old.keys() - new.keys()),
+        "only_after": sorted(new.keys() - old.keys())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change that counts (default 10%%)")
+    parser.add_argument("--json", action="store_true", help="Print the comparison as JSON")
+    args = parser.parse_args()
+
+    with open(args.before, "r") as f:
+        before = json.load(f)
+    with open(args.after, "r") as f:
+        after = json.load(f)
+    report = compare(before, after, args.threshold)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['before']} -> {report['after']} (threshold {args.threshold:.0%})")
+        for title in ("regressions", "improvements"):
+            print(f"{title.capitalize()}: {len(report[title])}")
+            for entry in report[title]:
+                change = f"{entry['change']:+.1%}" if entry["change"] is not None else "new"
+                print(f"  {entry['metric']}: {entry['before']:g} -> {entry['after']:g} ({change})")
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
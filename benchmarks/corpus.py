@@ -0,0 +1,147 @@
+"""Generate a synthetic law corpus in the CSV schema of data/.
+
+Usage:
+    python -m benchmarks.corpus --rows 100000 --output-dir benchmarks/work/corpus-100000
+
+The CSV files go to <output-dir>/data and a description of the corpus to
+<output-dir>/corpus.json. Rows are recombined from the bundled corpus: each one takes the
+law type and title of a real row, a new section number, and sentences of real rows of the
+same law type for every text field, so text lengths and vocabulary follow the real data. Rows are spread
+over one CSV per law type, like data/. The output only depends on --rows and --seed, and
+an existing corpus with the same parameters is reused.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COLUMNS = ["Law Type", "Law Name/Section", "Law Details", "Law Summary", "Applicability",
+           "Whom to Approach", "Historical Context", "Real-life Example"]
+TEXT_COLUMNS = COLUMNS[2:]
+CORPUS_FILE = "corpus.json"
+# Bump when generated rows change, so corpora cached by an older generator are rebuilt
+GENERATOR_VERSION = 1
+
+# "Income Tax Act Section 139 - Filing of Return" -> prefix, number, title
+SECTION_PATTERN = re.compile(r"^(.*?Section\s+)(\d+[A-Z]*)\s*-\s*(.*)$")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+
+def load_templates(data_dir: str) -> List[Dict[str, str]]:
+    """The rows of the bundled CSV files, restricted to the schema columns."""
+    rows = []
+    for fname in sorted(os.listdir(data_dir)):
+        if not fname.endswith(".csv"):
+            continue
+        with open(os.path.join(data_dir, fname), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("Law Type") and row.get("Law Name/Section"):
+                    rows.append({column: (row.get(column) or "").strip() for column in COLUMNS})
+    if not rows:
+        raise ValueError(f"No CSV rows to use as templates in {data_dir}")
+    return rows
+
+
+def _sentences(text: str) -> List[str]:
+    return [sentence for sentence in SENTENCE_PATTERN.split(text) if sentence]
+
+
+def synthesize_row(rng: random.Random, templates: List[Dict[str, str]], sentences: Dict[tuple, List[str]]) -> Dict[str, str]:
+    """
+    One synthetic row: a real row's type and title under a new section number, with text
+    remixed from the sentences of rows of the same law type (`sentences[(law type, column)]`).
+    """
+    base = rng.choice(templates)
+    match = SECTION_PATTERN.match(base["Law Name/Section"])
+    prefix, title = (match.group(1), match.group(3)) if match else ("Section ", base["Law Name/Section"])
+    number = f"{rng.randint(1, 999)}{rng.choice(['', '', '', 'A', 'B', 'C'])}"
+    row = {"Law Type": base["Law Type"], "Law Name/Section": f"{prefix}{number} - {title}"}
+    for column in TEXT_COLUMNS:
+        # As many sentences as the base row has
+        count = max(1, len(_sentences(base[column])))
+        pool = sentences.get((base["Law Type"], column)) or ["Information not available."]
+        row[column] = " ".join(rng.choice(pool) for _ in range(count))
+    return row
+
+
+def generate_corpus(rows: int, output_dir: str, data_dir: str = "data", seed: int = 0) -> Dict[str, Any]:
+    """Write `rows` synthetic rows into output_dir/data (one CSV per law type) and describe them."""
+    metadata_path = os.path.join(output_dir, CORPUS_FILE)
+    corpus_dir = os.path.join(output_dir, "data")
+    try:
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+        if (metadata.get("rows"), metadata.get("seed"), metadata.get("generator")) == (rows, seed, GENERATOR_VERSION) \
+                and os.path.isdir(corpus_dir):
+            logger.info(f"Reusing corpus of {rows} rows in {output_dir}")
+            return metadata
+    except (OSError, ValueError):
+        pass
+
+    started = time.perf_counter()
+    templates = load_templates(data_dir)
+    sentences: Dict[tuple, List[str]] = {}
+    for row in templates:
+        for column in TEXT_COLUMNS:
+            sentences.setdefault((row["Law Type"], column), []).extend(_sentences(row[column]))
+    law_types = sorted({row["Law Type"] for row in templates})
+    os.makedirs(corpus_dir, exist_ok=True)
+    for fname in os.listdir(corpus_dir):
+        os.remove(os.path.join(corpus_dir, fname))
+
+    rng = random.Random(seed)
+    files = {}
+    writers = {}
+    counts = {law_type: 0 for law_type in law_types}
+    try:
+        for law_type in law_types:
+            fname = f"synthetic_{re.sub(r'[^a-z0-9]+', '_', law_type.lower()).strip('_')}.csv"
+            files[law_type] = open(os.path.join(corpus_dir, fname), "w", newline="", encoding="utf-8")
+            writers[law_type] = csv.DictWriter(files[law_type], fieldnames=COLUMNS)
+            writers[law_type].writeheader()
+        for _ in range(rows):
+            row = synthesize_row(rng, templates, sentences)
+            writers[row["Law Type"]].writerow(row)
+            counts[row["Law Type"]] += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    metadata = {
+        "rows": rows,
+        "seed": seed,
+        "generator": GENERATOR_VERSION,
+        "data_dir": corpus_dir,
+        "files": {os.path.basename(f.name): counts[law_type] for law_type, f in files.items()},
+        "bytes": sum(os.path.getsize(f.name) for f in files.values()),
+        "generate_seconds": round(time.perf_counter() - started, 3)
+    }
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f, indent=2)
+    logger.info(f"Generated {rows} rows ({metadata['bytes'] / (1 << 20):.1f}MB) in {corpus_dir} in {metadata['generate_seconds']:.1f}s")
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic law corpus for benchmarks.")
+    parser.add_argument("--rows", type=int, required=True, help="Rows to generate")
+    parser.add_argument("--output-dir", required=True, help="Folder the corpus is written to (CSV files in its data/)")
+    parser.add_argument("--data-dir", default=os.environ.get('DATA_DIR', 'data'), help="Folder with the real CSV files used as templates")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(json.dumps(generate_corpus(args.rows, args.output_dir, args.data_dir, args.seed), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
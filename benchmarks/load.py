@@ -0,0 +1,210 @@
+"""Drive the Flask app in-process at increasing concurrency and report QPS and latency percentiles.
+
+Usage:
+    python -m benchmarks.load --rows 10000 [--concurrency 1,2,4,8,16,32] [--duration 10]
+
+The app is created with create_app() over a synthetic corpus (benchmarks.corpus), building
+its snapshot on the first run. googletrans is replaced by StubTranslator, which answers
+locally after --translate-latency-ms, so results don't depend on the network. Requests go
+through Flask's test client from one thread per concurrent client: they cover routing, the
+pipeline and JSON encoding, but not sockets or a WSGI server. The response and query
+embedding caches are off unless --caches is given, and INFO logging is silenced while the
+load runs.
+
+Queries are the Applicability and Real-life Example texts of the corpus plus statute
+references ("IPC 302"); --tamil-share of the requests ask for a Tamil response. Besides
+client-side latency, each level reports the mean server time per pipeline stage, read
+from the responses' Server-Timing headers.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.services import translation_service
+from benchmarks.common import MB, rss_bytes, run_info
+from benchmarks.corpus import SECTION_PATTERN, generate_corpus
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUERY_COLUMNS = ("Applicability", "Real-life Example")
+
+
+class StubTranslator:
+    """Stands in for googletrans.Translator: answers locally after a fixed delay."""
+
+    latency = 0.0
+
+    def translate(self, text, dest='en', src='auto'):
+        time.sleep(self.latency)
+        return SimpleNamespace(text=text if dest == 'en' else f"[{dest}] {text}", src=src, dest=dest)
+
+    def detect(self, text):
+        time.sleep(self.latency)
+        return SimpleNamespace(lang='en', confidence=1.0)
+
+
+def load_queries(data_dir: str, limit: int = 2000, seed: int = 0) -> List[str]:
+    """Query texts drawn from the corpus: applicability and example texts, and statute references."""
+    queries = []
+    for fname in sorted(os.listdir(data_dir)):
+        if not fname.endswith(".csv"):
+            continue
+        with open(os.path.join(data_dir, fname), newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                queries.extend(row[column] for column in QUERY_COLUMNS if row.get(column))
+                match = SECTION_PATTERN.match(row.get("Law Name/Section") or "")
+                if match:
+                    queries.append(f"{row['Law Type']} {match.group(2)}")
+    rng = random.Random(seed)
+    rng.shuffle(queries)
+    return queries[:limit]
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """{"stage": milliseconds} from a Server-Timing header."""
+    timings = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                timings[name] = timings.get(name, 0.0) + float(value)
+    return timings
+
+
+def run_level(app, queries: List[str], concurrency: int, duration: float, tamil_share: float, seed: int = 0) -> Dict[str, Any]:
+    """Keep `concurrency` clients busy for `duration` seconds; returns throughput and latency figures."""
+    samples: List[List[Tuple[float, int, Dict[str, float]]]] = [[] for _ in range(concurrency)]
+    start = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def client_loop(position: int):
+        client = app.test_client()
+        rng = random.Random(seed * 1000 + position)
+        start.wait()
+        while time.perf_counter() < deadline[0]:
+            body = {"query": rng.choice(queries), "language": "ta" if rng.random() < tamil_share else "en"}
+            started = time.perf_counter()
+            response = client.post("/api/chat", json=body)
+            response.get_data()
+            samples[position].append((time.perf_counter() - started, response.status_code,
+                                      parse_server_timing(response.headers.get("Server-Timing"))))
+
+    threads = [threading.Thread(target=client_loop, args=(position,), name=f"client-{position}") for position in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    deadline[0] = time.perf_counter() + duration
+    started = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    results = [sample for thread_samples in samples for sample in thread_samples]
+    ok = [latency for latency, status, _ in results if status == 200]
+    stages: Dict[str, List[float]] = {}
+    for _, status, timings in results:
+        if status == 200:
+            for stage, milliseconds in timings.items():
+                stages.setdefault(stage, []).append(milliseconds)
+    latency_ms = np.array(ok) * 1000 if ok else np.zeros(1)
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "seconds": round(wall, 3),
+        "qps": round(len(ok) / wall, 2),
+        "latency_ms": {
+            "mean": round(float(latency_ms.mean()), 3),
+            "p50": round(float(np.percentile(latency_ms, 50)), 3),
+            "p95": round(float(np.percentile(latency_ms, 95)), 3),
+            "p99": round(float(np.percentile(latency_ms, 99)), 3),
+            "max": round(float(latency_ms.max()), 3)
+        },
+        # Mean over the requests that went through each stage
+        "server_stages_ms": {stage: round(float(np.mean(values)), 3) for stage, values in stages.items()},
+        "rss_mb": round(rss_bytes() / MB, 1)
+    }
+
+
+def benchmark_load(data_dir: str, index_dir: str, levels: List[int], duration: float = 10.0, tamil_share: float = 0.2,
+                   translate_latency_ms: float = 0.0, caches: bool = False, max_queries: int = 2000, seed: int = 0) -> Dict[str, Any]:
+    """Start the app over data_dir and run one load level per concurrency in `levels`."""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ['INDEX_DIR'] = index_dir
+    os.environ['KB_WATCH_INTERVAL'] = '0'
+    if not caches:
+        os.environ['RESPONSE_CACHE_BACKEND'] = 'none'
+        os.environ['QUERY_CACHE_SIZE'] = '0'
+    StubTranslator.latency = translate_latency_ms / 1000.0
+    translation_service.Translator = StubTranslator
+
+    import app_loader
+    started = time.perf_counter()
+    app = app_loader.create_app(start_background=False)
+    startup_seconds = time.perf_counter() - started
+    queries = load_queries(data_dir, max_queries, seed)
+    if not queries:
+        raise ValueError(f"No queries found in {data_dir}")
+
+    results = []
+    logging.disable(logging.INFO)
+    try:
+        client = app.test_client()
+        for query in queries[:20]:
+            client.post("/api/chat", json={"query": query})
+        for concurrency in levels:
+            results.append(run_level(app, queries, concurrency, duration, tamil_share, seed))
+            logger.warning(f"concurrency {concurrency}: {results[-1]['qps']} req/s, "
+                           f"p50 {results[-1]['latency_ms']['p50']}ms, p99 {results[-1]['latency_ms']['p99']}ms")
+    finally:
+        logging.disable(logging.NOTSET)
+    return {
+        "data_dir": data_dir,
+        "settings": {"duration": duration, "tamil_share": tamil_share, "translate_latency_ms": translate_latency_ms,
+                     "caches": caches, "queries": len(queries)},
+        "startup_seconds": round(startup_seconds, 3),
+        "levels": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Flask app in-process.")
+    parser.add_argument("--rows", type=int, default=10000, help="Size of the synthetic corpus to serve")
+    parser.add_argument("--work-dir", default=os.path.join("benchmarks", "work"), help="Folder for corpora and snapshots")
+    parser.add_argument("--data-dir", help="Serve this folder instead of a synthetic corpus")
+    parser.add_argument("--index-dir", help="Snapshot folder (default: index/ next to the data folder)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per concurrency level")
+    parser.add_argument("--tamil-share", type=float, default=0.2, help="Share of requests asking for Tamil")
+    parser.add_argument("--translate-latency-ms", type=float, default=0.0, help="Delay of each stub translation call")
+    parser.add_argument("--caches", action="store_true", help="Keep the response and query embedding caches on")
+    parser.add_argument("--output", help="Also write the JSON result to this file")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or generate_corpus(args.rows, os.path.join(args.work_dir, f"corpus-{args.rows}"))["data_dir"]
+    index_dir = args.index_dir or os.path.join(os.path.dirname(os.path.abspath(data_dir)), "index")
+    result = {
+        "run": run_info(),
+        "load": benchmark_load(data_dir, index_dir, [int(level) for level in args.concurrency.split(",")],
+                               duration=args.duration, tamil_share=args.tamil_share,
+                               translate_latency_ms=args.translate_latency_ms, caches=args.caches)
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""Run the whole benchmark suite and write one JSON result file.
+
+Usage:
+    python -m benchmarks.run [--sizes 1000,10000,100000,1000000] [--load-rows 10000]
+                             [--output benchmarks/results/<commit>.json]
+
+For every size a corpus is generated (or reused) and the build stages are measured in a
+fresh process, so each size starts from the same memory baseline. The load test then runs
+against the --load-rows corpus (--load-rows 0 skips it). Compare two result files with
+python -m benchmarks.compare.
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+from benchmarks.common import run_info
+from benchmarks.corpus import generate_corpus
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = "1000,10000,100000,1000000"
+
+
+def _run_module(module: str, arguments: List[str]) -> Dict[str, Any]:
+    """Run a benchmark module in its own interpreter and return the JSON it wrote."""
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        output = f.name
+    try:
+        subprocess.run([sys.executable, "-m", module, *arguments, "--output", output], check=True, stdout=subprocess.DEVNULL)
+        with open(output, "r") as f:
+            return json.load(f)
+    finally:
+        os.remove(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the build and load benchmarks.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated corpus sizes (rows) for the build benchmark")
+    parser.add_argument("--work-dir", default=os.path.join("benchmarks", "work"), help="Folder for corpora and snapshots")
+    parser.add_argument("--embed-sample", type=int, default=10000, help="Chunks encoded by the model per size (negative: all)")
+    parser.add_argument("--load-rows", type=int, default=10000, help="Corpus size served by the load test (0 skips it)")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32", help="Comma-separated client counts for the load test")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per load level")
+    parser.add_argument("--translate-latency-ms", type=float, default=0.0, help="Delay of each stub translation call")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args()
+
+    info = run_info()
+    result = {"run": info, "build": {}, "load": None}
+    for rows in [int(size) for size in args.sizes.split(",") if size]:
+        corpus = generate_corpus(rows, os.path.join(args.work_dir, f"corpus-{rows}"))
+        logger.info(f"Measuring the build of {rows} rows")
+        result["build"][str(rows)] = _run_module("benchmarks.build", [
+            "--data-dir", corpus["data_dir"], "--embed-sample", str(args.embed_sample)
+        ])["build"]
+
+    if args.load_rows:
+        generate_corpus(args.load_rows, os.path.join(args.work_dir, f"corpus-{args.load_rows}"))
+        logger.info(f"Load-testing the app over {args.load_rows} rows")
+        result["load"] = _run_module("benchmarks.load", [
+            "--rows", str(args.load_rows), "--work-dir", args.work_dir, "--concurrency", args.concurrency,
+            "--duration", str(args.duration), "--translate-latency-ms", str(args.translate_latency_ms)
+        ])["load"]
+
+    output = args.output or os.path.join("benchmarks", "results", f"{(info['commit'] or 'unknown')[:12]}{'-dirty' if info['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    logger.info(f"Wrote {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Build the vector store snapshot ahead of time so app startup only has to load it.
+
+Usage:
+    python build_index.py [--data-dir data] [--index-dir index] [--force]
+
+By default only new or changed rows are embedded; --force re-embeds the whole corpus.
+Pass --translate ta to precompute Tamil translations of every document into the snapshot.
+"""
+import argparse
+import logging
+import os
+import sys
+from app.core.index_builder import IndexBuilder
+from app.core.vector_store import INDEX_TYPES
+from app.services.chat_service import ChatService
+from app.services.translation_service import TranslationService
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the FAISS index snapshot for the police chatbot.")
+    parser.add_argument("--data-dir", default=os.environ.get('DATA_DIR', 'data'), help="Folder with the legal CSV/XLSX files")
+    parser.add_argument("--index-dir", default=os.environ.get('INDEX_DIR', 'index'), help="Folder the snapshot is written to")
+    parser.add_argument("--model", default=os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'), help="Sentence-transformers model name")
+    # Defaults match what the app reads at startup, so it accepts the snapshot as current
+    parser.add_argument("--chunk-size", type=int, default=int(os.environ.get('CHUNK_SIZE', '500')),
+                        help="Characters per chunk")
+    parser.add_argument("--chunk-overlap", type=int, default=int(os.environ.get('CHUNK_OVERLAP', '50')),
+                        help="Characters shared by neighbouring chunks")
+    parser.add_argument("--load-chunksize", type=int, default=int(os.environ.get('LOAD_CHUNKSIZE', '5000')),
+                        help="Rows streamed through split/embed per batch; bounds peak memory on large CSVs")
+    parser.add_argument("--load-workers", type=int, default=int(os.environ.get('LOAD_WORKERS', '0')) or None,
+                        help="Processes used to parse data files concurrently (default: CPU count)")
+    parser.add_argument("--index-type", default=os.environ.get('INDEX_TYPE', 'flat_ip'), choices=INDEX_TYPES,
+                        help="FAISS index: flat_l2 (legacy L2 scores), flat_ip (exact cosine), ivf or hnsw")
+    parser.add_argument("--nlist", type=int, default=int(os.environ.get('IVF_NLIST', '1024')), help="IVF lists")
+    parser.add_argument("--hnsw-m", type=int, default=int(os.environ.get('HNSW_M', '32')), help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=int(os.environ.get('HNSW_EF_CONSTRUCTION', '200')),
+                        help="HNSW build-time search depth")
+    parser.add_argument("--force", action="store_true", help="Run a full rebuild instead of an incremental ingest")
+    parser.add_argument("--translate", action="append", default=[], metavar="LANG",
+                        help="Precompute translations of the corpus into LANG (repeatable, e.g. --translate ta)")
+    args = parser.parse_args()
+
+    index_builder = IndexBuilder(
+        args.data_dir,
+        args.index_dir,
+        model_name=args.model,
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        load_chunksize=args.load_chunksize,
+        load_workers=args.load_workers,
+        index_type=args.index_type,
+        index_params={"nlist": args.nlist, "hnsw_m": args.hnsw_m, "ef_construction": args.ef_construction},
+        # Without --translate, report the strings the carried-over phrasebook is missing
+        texts_for_document=None if args.translate else ChatService.translatable_texts
+    )
+    if args.force:
+        vector_store = index_builder.build()
+    elif index_builder.is_current():
+        logger.info(f"Snapshot {index_builder.read_manifest()['version']} is up to date")
+        vector_store = index_builder.load() if args.translate else None
+    else:
+        vector_store = index_builder.ingest()
+
+    if args.translate:
+        index_builder.build_translations(vector_store, TranslationService(), ChatService.translatable_texts, args.translate)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""Check that a quantized embedding backend retrieves the same laws as the fp32 model.
+
+Usage:
+    python check_embedding_parity.py --backend int8 [--model-dir models/all-MiniLM-L6-v2]
+    python check_embedding_parity.py --backend onnx --model-dir models/all-MiniLM-L6-v2 \\
+        --onnx-file onnx/model_qint8_avx512_vnni.onnx
+
+Queries are the "Applicability" and "Example Cases" texts of the bundled corpus. Each
+one is embedded by the fp32 PyTorch model and by the candidate backend and searched in
+the same index snapshot (built with the fp32 model if missing). The script reports how
+often the top-k laws are identical, the single-query and batch encode latency of both
+models, and their memory. It exits with status 1 if the mean top-k overlap falls below
+--min-overlap.
+"""
+import argparse
+import gc
+import io
+import json
+import logging
+import os
+import sys
+import time
+import numpy as np
+from app.core.embeddings import EmbeddingGenerator, EMBEDDING_BACKENDS
+from app.core.index_builder import IndexBuilder
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUERY_FIELDS = ("when_applicable", "example_cases")
+
+
+def _rss_bytes() -> int:
+    """Resident memory of this process (Linux); 0 where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def _model_bytes(embedding_generator: EmbeddingGenerator, model_dir, onnx_file) -> int:
+    """Size of the weights: the ONNX file, or the serialized PyTorch state dict (int8 weights stay packed)."""
+    if embedding_generator.backend == "onnx":
+        path = os.path.join(model_dir or "", onnx_file or os.path.join("onnx", "model.onnx"))
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    import torch
+    buffer = io.BytesIO()
+    torch.save(embedding_generator.model.state_dict(), buffer)
+    return buffer.tell()
+
+
+def _load(model_name, backend, model_dir, onnx_file):
+    gc.collect()
+    before = _rss_bytes()
+    started = time.perf_counter()
+    embedding_generator = EmbeddingGenerator(model_name, backend=backend, model_dir=model_dir, onnx_file=onnx_file)
+    load_seconds = time.perf_counter() - started
+    return embedding_generator, {
+        "backend": backend,
+        "load_seconds": round(load_seconds, 3),
+        "rss_delta_mb": round((_rss_bytes() - before) / (1 << 20), 1),
+        "weights_mb": round(_model_bytes(embedding_generator, model_dir, onnx_file) / (1 << 20), 1)
+    }
+
+
+def _time_encode(embedding_generator: EmbeddingGenerator, queries, single_queries: int, batch_size: int):
+    """Encode every query in batches, then time single-query encodes (the live request path)."""
+    model = embedding_generator.model
+    model.encode(queries[:batch_size], show_progress_bar=False)  # warm-up
+    started = time.perf_counter()
+    embeddings = model.encode(queries, batch_size=batch_size, show_progress_bar=False)
+    batch_seconds = time.perf_counter() - started
+    latencies = []
+    for query in queries[:single_queries]:
+        started = time.perf_counter()
+        model.encode([query], show_progress_bar=False)
+        latencies.append(time.perf_counter() - started)
+    return np.ascontiguousarray(embeddings, dtype=np.float32), {
+        "batch_ms_per_query": round(batch_seconds * 1000 / len(queries), 3),
+        "single_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieval with a quantized embedding backend against fp32.")
+    parser.add_argument("--backend", required=True, choices=EMBEDDING_BACKENDS, help="Backend to check against fp32 torch")
+    parser.add_argument("--model", default=os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'), help="Sentence-transformers model name")
+    parser.add_argument("--model-dir", default=os.environ.get('EMBEDDING_MODEL_DIR'), help="Local model directory (see export_model.py)")
+    parser.add_argument("--onnx-file", default=os.environ.get('EMBEDDING_ONNX_FILE'), help="ONNX graph inside the model directory")
+    parser.add_argument("--data-dir", default=os.environ.get('DATA_DIR', 'data'), help="Folder with the legal CSV/XLSX files")
+    parser.add_argument("--index-dir", default=os.environ.get('INDEX_DIR', 'index'), help="Folder with the index snapshot")
+    parser.add_argument("--k", type=int, default=5, help="Laws retrieved per query")
+    parser.add_argument("--max-queries", type=int, default=500)
+    parser.add_argument("--single-queries", type=int, default=100, help="Queries timed one at a time")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-overlap", type=float, default=0.95, help="Fail below this mean top-k overlap")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    baseline, baseline_memory = _load(args.model, "torch", args.model_dir, None)
+    candidate, candidate_memory = _load(args.model, args.backend, args.model_dir, args.onnx_file)
+
+    index_builder = IndexBuilder(args.data_dir, args.index_dir, model_name=args.model)
+    vector_store = index_builder.load_or_build(baseline)
+    queries = []
+    for doc in vector_store.documents:
+        for field in QUERY_FIELDS:
+            text = (doc.get(field) or "").strip()
+            if text and text not in queries:
+                queries.append(text)
+    queries = queries[:args.max_queries]
+    if not queries:
+        logger.error("No query texts found in the corpus")
+        return 1
+
+    baseline_embeddings, baseline_latency = _time_encode(baseline, queries, args.single_queries, args.batch_size)
+    candidate_embeddings, candidate_latency = _time_encode(candidate, queries, args.single_queries, args.batch_size)
+
+    def top_k(embeddings):
+        return [
+            [hit["document"]["doc_id"] for hit in hits]
+            for hits, _ in vector_store.search_documents_batch(embeddings, k=args.k)
+        ]
+    expected, actual = top_k(baseline_embeddings), top_k(candidate_embeddings)
+    overlaps = [len(set(e) & set(a)) / max(len(e), 1) for e, a in zip(expected, actual)]
+    norms = np.linalg.norm(baseline_embeddings, axis=1) * np.linalg.norm(candidate_embeddings, axis=1)
+    cosine = (baseline_embeddings * candidate_embeddings).sum(axis=1) / np.maximum(norms, 1e-12)
+
+    report = {
+        "backend": args.backend,
+        "queries": len(queries),
+        "k": args.k,
+        "index_version": vector_store.version,
+        "retrieval": {
+            "topk_identical": round(sum(e == a for e, a in zip(expected, actual)) / len(queries), 4),
+            "topk_same_set": round(sum(set(e) == set(a) for e, a in zip(expected, actual)) / len(queries), 4),
+            "top1_identical": round(sum(e[:1] == a[:1] for e, a in zip(expected, actual)) / len(queries), 4),
+            "mean_topk_overlap": round(float(np.mean(overlaps)), 4)
+        },
+        "embedding_cosine": {"mean": round(float(cosine.mean()), 5), "min": round(float(cosine.min()), 5)},
+        "latency": {"torch": baseline_latency, args.backend: candidate_latency},
+        "speedup": {
+            "single_p50": round(baseline_latency["single_p50_ms"] / max(candidate_latency["single_p50_ms"], 1e-9), 2),
+            "batch": round(baseline_latency["batch_ms_per_query"] / max(candidate_latency["batch_ms_per_query"], 1e-9), 2)
+        },
+        "memory": {"torch": baseline_memory, args.backend: candidate_memory}
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if report["retrieval"]["mean_topk_overlap"] < args.min_overlap:
+        logger.error(f"Top-{args.k} overlap {report['retrieval']['mean_topk_overlap']} is below {args.min_overlap}")
+        return 1
+    logger.info(f"{args.backend}: top-{args.k} identical for {report['retrieval']['topk_identical']:.1%} of queries, "
+                f"single-query encode {report['speedup']['single_p50']}x, weights "
+                f"{baseline_memory['weights_mb']}MB -> {candidate_memory['weights_mb']}MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
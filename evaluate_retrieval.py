@@ -0,0 +1,243 @@
+"""Measure retrieval accuracy against latency across chunk sizes, index types, k and retrieval modes.
+
+Usage:
+    python evaluate_retrieval.py [--chunk-sizes 250,500,1000] [--index-types flat_ip,ivf,hnsw]
+                                 [--k 1,3,5,10] [--modes dense,hybrid] [--json eval.json]
+
+The golden set comes from the bundled corpus. Each "Applicability" and "Real-life Example"
+text is a query, and its answer is the law of its row ("Law Name/Section"). A retrieved
+document counts as correct if it is about that law, so duplicate rows of one law are all
+hits. By default both fields are left out of the indexed text, so a query can't match its
+own wording. --keep-query-fields indexes the rows the way the app does.
+
+For each chunk size the corpus is split and embedded once. Every index type, retrieval
+mode and k is then searched through RetrievalService. Each configuration reports:
+- recall@k: the share of queries with a correct law in the top k.
+- MRR: the mean reciprocal rank of the first correct law, counted as 0 beyond k.
+- Per-query retrieve latency.
+Query vectors are encoded once up front and served from the query cache, so the latency
+covers search and fusion. The single-query encode time of the model is the same for every
+configuration and is reported once. For each k the script recommends the fastest
+configuration whose recall is within --tolerance of the best.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+from app.core.cache import LRUCache, normalize_query
+from app.core.document_loader import DocumentLoader, COMBINED_TEXT_LABELS
+from app.core.embeddings import EmbeddingGenerator, EMBEDDING_BACKENDS
+from app.core.text_splitter import TextSplitter
+from app.core.vector_store import VectorStore, INDEX_TYPES
+from app.services.retrieval_service import RetrievalService, RETRIEVAL_MODES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUERY_FIELDS = ("when_applicable", "example_cases")
+# Filled in by DocumentLoader for empty cells; not a usable query
+MISSING_TEXT = "Information not available."
+
+
+def law_key(doc: Dict[str, Any]) -> str:
+    """The law a document is about: its law name, casefolded and with whitespace collapsed."""
+    return " ".join((doc.get("law_name") or "").split()).casefold()
+
+
+def build_golden_set(documents: List[Dict[str, Any]], max_queries: int) -> List[Tuple[str, set]]:
+    """(query, laws) pairs. A text that appears under several laws accepts any of them."""
+    labels: Dict[str, set] = {}
+    for doc in documents:
+        label = law_key(doc)
+        if not label:
+            continue
+        for field in QUERY_FIELDS:
+            text = (doc.get(field) or "").strip()
+            if text and text != MISSING_TEXT:
+                labels.setdefault(text, set()).add(label)
+    return list(labels.items())[:max_queries]
+
+
+def index_documents(documents: List[Dict[str, Any]], keep_query_fields: bool) -> List[Dict[str, Any]]:
+    """The documents to index, with the query fields left out of combined_text unless kept."""
+    if keep_query_fields:
+        return documents
+    indexed = []
+    for doc in documents:
+        parts = [f"{label}: {doc.get(field) or ''}" for field, label in COMBINED_TEXT_LABELS if field not in QUERY_FIELDS]
+        indexed.append({**doc, "combined_text": "\n".join(parts)})
+    return indexed
+
+
+def evaluate(retrieval_service: RetrievalService, golden: List[Tuple[str, set]], k: int) -> Dict[str, Any]:
+    """Run every golden query through the retrieval service; returns recall@k, MRR and latency."""
+    hits, reciprocal_ranks, latencies, search_seconds = 0, [], [], []
+    for query, laws in golden:
+        started = time.perf_counter()
+        output = retrieval_service.retrieve(query, k=k)
+        latencies.append(time.perf_counter() - started)
+        search_seconds.append(output["timings"].get("search", 0.0))
+        rank = next((position for position, hit in enumerate(output["results"][:k], start=1)
+                     if law_key(hit["document"]) in laws), None)
+        hits += rank is not None
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+    latency_ms = np.array(latencies) * 1000
+    return {
+        "recall": round(hits / len(golden), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "latency_ms": {
+            "mean": round(float(latency_ms.mean()), 3),
+            "p50": round(float(np.percentile(latency_ms, 50)), 3),
+            "p95": round(float(np.percentile(latency_ms, 95)), 3)
+        },
+        "search_ms_mean": round(float(np.mean(search_seconds)) * 1000, 3)
+    }
+
+
+def _time_single_encode(embedding_generator: EmbeddingGenerator, queries: List[str]) -> Dict[str, float]:
+    """Encode latency of one query at a time, as on the live request path."""
+    model = embedding_generator.model
+    model.encode(queries[:1], show_progress_bar=False)  # warm-up
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        model.encode([query], show_progress_bar=False)
+        latencies.append(time.perf_counter() - started)
+    return {
+        "single_p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 3),
+        "single_p95_ms": round(float(np.percentile(latencies, 95)) * 1000, 3)
+    }
+
+
+def recommend(results: List[Dict[str, Any]], tolerance: float) -> Dict[str, Dict[str, Any]]:
+    """For each k, the configuration with the lowest p50 latency among those within `tolerance` of the best recall."""
+    recommended = {}
+    for k in sorted({result["k"] for result in results}):
+        candidates = [result for result in results if result["k"] == k]
+        best = max(result["recall"] for result in candidates)
+        eligible = [result for result in candidates if result["recall"] >= best - tolerance]
+        choice = min(eligible, key=lambda result: (result["latency_ms"]["p50"], -result["mrr"]))
+        recommended[str(k)] = {key: choice[key] for key in ("chunk_size", "index_type", "mode", "recall", "mrr")}
+        recommended[str(k)]["latency_p50_ms"] = choice["latency_ms"]["p50"]
+        recommended[str(k)]["best_recall"] = best
+    return recommended
+
+
+def _csv_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep retrieval settings and report recall@k, MRR and latency.")
+    parser.add_argument("--data-dir", default=os.environ.get('DATA_DIR', 'data'), help="Folder with the legal CSV/XLSX files")
+    parser.add_argument("--model", default=os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'), help="Sentence-transformers model name")
+    parser.add_argument("--backend", default=os.environ.get('EMBEDDING_BACKEND', 'torch'), choices=EMBEDDING_BACKENDS)
+    parser.add_argument("--model-dir", default=os.environ.get('EMBEDDING_MODEL_DIR'), help="Local model directory (see export_model.py)")
+    parser.add_argument("--onnx-file", default=os.environ.get('EMBEDDING_ONNX_FILE'), help="ONNX graph inside the model directory")
+    parser.add_argument("--chunk-sizes", default="250,500,1000", help="Comma-separated TextSplitter chunk sizes")
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument("--index-types", default="flat_ip,ivf,hnsw", help=f"Comma-separated index types ({', '.join(INDEX_TYPES)})")
+    parser.add_argument("--modes", default="dense,hybrid", help=f"Comma-separated retrieval modes ({', '.join(RETRIEVAL_MODES)})")
+    parser.add_argument("--k", default="1,3,5,10", help="Comma-separated numbers of laws retrieved per query")
+    parser.add_argument("--nlist", type=int, default=int(os.environ.get('IVF_NLIST', '1024')))
+    parser.add_argument("--nprobe", type=int, default=int(os.environ.get('SEARCH_NPROBE', '16')))
+    parser.add_argument("--hnsw-m", type=int, default=int(os.environ.get('HNSW_M', '32')))
+    parser.add_argument("--ef-construction", type=int, default=int(os.environ.get('HNSW_EF_CONSTRUCTION', '200')))
+    parser.add_argument("--ef-search", type=int, default=int(os.environ.get('SEARCH_EF', '64')))
+    parser.add_argument("--fetch-factor", type=int, default=int(os.environ.get('SEARCH_FETCH_FACTOR', '4')))
+    parser.add_argument("--rrf-k", type=int, default=int(os.environ.get('RRF_K', '60')))
+    parser.add_argument("--max-queries", type=int, default=1000)
+    parser.add_argument("--keep-query-fields", action="store_true", help="Index the applicability and example texts too")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Recall a recommended configuration may lose against the best")
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    index_types, modes = _csv_list(args.index_types), _csv_list(args.modes)
+    for index_type in index_types:
+        if index_type not in INDEX_TYPES:
+            parser.error(f"Unknown index type {index_type!r}, expected one of {', '.join(INDEX_TYPES)}")
+    for mode in modes:
+        if mode not in RETRIEVAL_MODES:
+            parser.error(f"Unknown retrieval mode {mode!r}, expected one of {', '.join(RETRIEVAL_MODES)}")
+    chunk_sizes = [int(size) for size in _csv_list(args.chunk_sizes)]
+    ks = [int(k) for k in _csv_list(args.k)]
+
+    documents = DocumentLoader(args.data_dir).load_documents()
+    golden = build_golden_set(documents, args.max_queries)
+    if not golden:
+        logger.error(f"No query texts found in {args.data_dir}")
+        return 1
+    documents = index_documents(documents, args.keep_query_fields)
+    queries = [query for query, _ in golden]
+    logger.info(f"Golden set: {len(golden)} queries over {len({law for _, laws in golden for law in laws})} laws "
+                f"({len(documents)} documents)")
+
+    embedding_generator = EmbeddingGenerator(args.model, backend=args.backend, model_dir=args.model_dir, onnx_file=args.onnx_file)
+    encode_latency = _time_single_encode(embedding_generator, queries[:100])
+    # Every configuration reads the query vectors from this cache, so they are encoded once
+    query_cache = LRUCache(len(queries))
+    for query, embedding in zip(queries, embedding_generator.model.encode(queries, show_progress_bar=False)):
+        query_cache.put(normalize_query(query), np.array(embedding))
+
+    results = []
+    for chunk_size in chunk_sizes:
+        chunks = TextSplitter(chunk_size=chunk_size, chunk_overlap=args.chunk_overlap).split_documents(documents)
+        started = time.perf_counter()
+        embeddings = embedding_generator.generate_embeddings(chunks)
+        embed_seconds = time.perf_counter() - started
+        for index_type in index_types:
+            vector_store = VectorStore(dimension=embeddings.shape[1], index_type=index_type, nlist=args.nlist,
+                                       nprobe=args.nprobe, hnsw_m=args.hnsw_m, ef_construction=args.ef_construction,
+                                       ef_search=args.ef_search)
+            started = time.perf_counter()
+            vector_store.add_documents(documents, chunks, embeddings)
+            vector_store.finalize()
+            build_seconds = time.perf_counter() - started
+            for mode in modes:
+                retrieval_service = RetrievalService(vector_store, embedding_generator, fetch_factor=args.fetch_factor,
+                                                     mode=mode, rrf_k=args.rrf_k, batch_max_wait_ms=0)
+                retrieval_service.query_cache = query_cache
+                for k in ks:
+                    result = {
+                        "chunk_size": chunk_size,
+                        "chunk_overlap": args.chunk_overlap,
+                        "index_type": index_type,
+                        "mode": mode,
+                        "k": k,
+                        "chunks": len(chunks),
+                        "embed_seconds": round(embed_seconds, 3),
+                        "index_build_seconds": round(build_seconds, 3),
+                        **evaluate(retrieval_service, golden, k)
+                    }
+                    results.append(result)
+                    logger.info(f"chunk_size={chunk_size} index={index_type} mode={mode} k={k}: "
+                                f"recall {result['recall']:.3f}, MRR {result['mrr']:.3f}, "
+                                f"p50 {result['latency_ms']['p50']:.2f}ms")
+
+    report = {
+        "data_dir": args.data_dir,
+        "model": args.model_dir or args.model,
+        "backend": args.backend,
+        "queries": len(golden),
+        "documents": len(documents),
+        "query_fields_indexed": args.keep_query_fields,
+        "encode_latency": encode_latency,
+        "results": results,
+        "recommended": recommend(results, args.tolerance)
+    }
+    print(json.dumps(report, indent=2))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    for k, choice in report["recommended"].items():
+        logger.info(f"k={k}: chunk_size={choice['chunk_size']} index={choice['index_type']} mode={choice['mode']} "
+                    f"(recall {choice['recall']:.3f} of best {choice['best_recall']:.3f}, p50 {choice['latency_p50_ms']:.2f}ms)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Save the embedding model to a local directory, optionally as an int8 ONNX graph.
+
+Usage:
+    python export_model.py --output-dir models/all-MiniLM-L6-v2
+    python export_model.py --output-dir models/all-MiniLM-L6-v2 --onnx --quantize avx2
+
+The app then loads it without the model hub via EMBEDDING_MODEL_DIR, and with
+EMBEDDING_BACKEND=onnx EMBEDDING_ONNX_FILE=<printed file> runs it on onnxruntime.
+The ONNX export needs the optional extras: pip install "sentence-transformers[onnx]".
+"""
+import argparse
+import logging
+import os
+import sys
+from sentence_transformers import SentenceTransformer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_CONFIGS = ("arm64", "avx2", "avx512", "avx512_vnni")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model for local and quantized inference.")
+    parser.add_argument("--model", default=os.environ.get('EMBEDDING_MODEL', 'all-MiniLM-L6-v2'), help="Sentence-transformers model name")
+    parser.add_argument("--output-dir", required=True, help="Local directory the model is written to")
+    parser.add_argument("--onnx", action="store_true", help="Also export an ONNX graph (onnx/model.onnx)")
+    parser.add_argument("--quantize", choices=QUANTIZATION_CONFIGS,
+                        help="Also write a dynamically int8-quantized ONNX graph tuned for this CPU family")
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model, device="cpu")
+    model.save(args.output_dir)
+    logger.info(f"Saved {args.model} to {args.output_dir}")
+
+    if args.onnx or args.quantize:
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        onnx_model = SentenceTransformer(args.output_dir, device="cpu", backend="onnx", local_files_only=True)
+        onnx_model.save(args.output_dir)
+        logger.info("Exported ONNX graph: EMBEDDING_ONNX_FILE=onnx/model.onnx")
+        if args.quantize:
+            export_dynamic_quantized_onnx_model(onnx_model, args.quantize, args.output_dir)
+            # Named model_qint8_<config>.onnx, or model_quint8_<config>.onnx for avx2
+            quantized = [f for f in os.listdir(os.path.join(args.output_dir, "onnx")) if f.endswith(f"int8_{args.quantize}.onnx")]
+            logger.info(f"Exported int8 ONNX graph: EMBEDDING_ONNX_FILE=onnx/{quantized[0]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,38 @@
 import { useState } from 'react';
 import './App.css';
 
-const API_URL = '/api/chat';
+const API_URL = '/api/chat/stream';
+
+// Parse a server-sent event stream into {event, data} objects as the chunks arrive
+async function* readEvents(body) {
+  const reader = body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      let data = '';
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+      }
+      if (data) yield { event, data: JSON.parse(data) };
+    }
+  }
+}
+
+// Set the value at path (e.g. ['legal_references', 0, 'summary']) without mutating the response
+function applyUpdate(node, [key, ...rest], value) {
+  const copy = Array.isArray(node) ? [...node] : { ...node };
+  copy[key] = rest.length ? applyUpdate(node[key], rest, value) : value;
+  return copy;
+}
 
 function App() {
   const [query, setQuery] = useState('');
@@ -10,11 +41,13 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [result, setResult] = useState(null);
+  const [pending, setPending] = useState(0);
 
   const handleSubmit = async (e) => {
     e.preventDefault();
     setError('');
     setResult(null);
+    setPending(0);
     setLoading(true);
     try {
       const res = await fetch(API_URL, {
@@ -22,13 +55,30 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ query, language })
       });
-      if (!res.ok) throw new Error('Server error');
-      const data = await res.json();
-      setResult(data);
+      if (!res.ok || !res.body) throw new Error('Server error');
+      // The English answer arrives first; translated fields replace it as they complete
+      for await (const { event, data } of readEvents(res.body)) {
+        if (event === 'answer') {
+          setResult(data.response);
+          setPending(data.pending_translations);
+          setLoading(false);
+        } else if (event === 'translation') {
+          setResult(prev => data.updates.reduce((response, { path, value }) => applyUpdate(response, path, value), prev));
+          setPending(n => Math.max(n - 1, 0));
+        } else if (event === 'translation_error') {
+          setPending(n => Math.max(n - 1, 0));
+        } else if (event === 'done') {
+          setResult(data.response);
+          setPending(0);
+        } else if (event === 'error') {
+          throw new Error(data.error);
+        }
+      }
     } catch (err) {
       setError('Failed to get response. Please try again.');
     } finally {
       setLoading(false);
+      setPending(0);
     }
   };
 
@@ -60,6 +110,7 @@ function App() {
       {result && (
         <div className="result">
           <h2>Main Answer</h2>
+          {pending > 0 && <div className="translating">Translating… ({pending} remaining)</div>}
           <div className="main-answer">{result.main_answer}</div>
           {result.legal_references && result.legal_references.length > 0 && (
             <div className="references">
@@ -0,0 +1,40 @@
+"""Gunicorn settings for the Flask app.
+
+Usage:
+    gunicorn -c gunicorn.conf.py
+
+By default each worker binds right away and loads the pipeline in the background
+(/health answers immediately, /ready reports progress); INDEX_MMAP=true lets the workers
+share the index pages through the page cache.
+
+With GUNICORN_PRELOAD=true the embedding model, FAISS index and documents are instead
+loaded once in the master and the workers are forked from it, so they share those pages
+copy-on-write instead of each loading its own copy. The port is only bound once loading
+has finished. Threads, pools and connections are recreated in each worker
+(app/core/forksafe.py) and the knowledge-base watcher is started per worker in post_fork.
+"""
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# Worker count comes from WEB_CONCURRENCY, which gunicorn reads on its own
+threads = int(os.environ.get('GUNICORN_THREADS', '1'))
+# Micro-batching only helps when a worker serves concurrent requests
+if threads > 1:
+    os.environ.setdefault('QUERY_BATCH_MAX_WAIT_MS', '2')
+loglevel = os.environ.get('LOG_LEVEL', 'debug')
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'false').lower() == 'true'
+wsgi_app = "app_loader:create_app(start_background=False)" if preload_app else "app_loader:create_app()"
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach, so collections in the
+    # workers don't write to (and un-share) the pages holding the preloaded objects
+    if preload_app:
+        gc.freeze()
+        server.log.info(f"Preloaded app; {gc.get_freeze_count()} objects frozen before forking workers")
+
+def post_fork(server, worker):
+    if preload_app:
+        import app_loader
+        app_loader.start_background_services()
@@ -0,0 +1,74 @@
+import hashlib
+import numpy as np
+import pandas as pd
+import pytest
+from app.core.embeddings import EmbeddingGenerator
+from app.core.lexical_index import tokenize
+
+DIMENSION = 384
+
+
+class StubModel:
+    """Stands in for SentenceTransformer: hashed bag-of-words vectors, so tests need no model download."""
+
+    def encode(self, texts, show_progress_bar=False, **kwargs):
+        vectors = np.full((len(texts), DIMENSION), 1e-3, dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                vectors[row, int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:4], "little") % DIMENSION] += 1.0
+        return vectors
+
+
+class StubEmbeddingGenerator(EmbeddingGenerator):
+    def __init__(self, model_name: str = "stub"):
+        self.model_name = model_name
+        self.backend = "torch"
+        self.model_dir = None
+        self.model = StubModel()
+        self.load_seconds = 0.0
+
+
+class StubTranslator:
+    """Stands in for googletrans.Translator; Tamil detection goes by script only."""
+
+    def translate(self, text, dest='en', src='auto'):
+        return type("Translated", (), {"text": text if dest == 'en' else f"[{dest}] {text}"})()
+
+    def detect(self, text):
+        return type("Detected", (), {"lang": "ta"})()
+
+
+LAWS = [
+    ("IPC", "IPC Section 302 - Murder", "Punishment for murder.", "When a person is killed intentionally."),
+    ("IPC", "IPC Section 379 - Theft", "Punishment for theft of movable property.", "If your phone, vehicle or any item is stolen."),
+    ("IPC", "IPC Section 420 - Cheating", "Cheating and dishonestly inducing delivery of property.", "When someone cheats you out of money."),
+    ("IT Act", "IT Act Section 66C - Identity theft", "Punishment for identity theft.", "If someone misuses your password or OTP."),
+    ("IT Act", "IT Act Section 66D - Cheating by personation", "Cheating by personation using a computer resource.", "When a fraudster impersonates a bank official online."),
+    ("Taxation", "Income Tax Act Section 234A/B/C - Interest", "Interest for defaults in filing and advance tax.", "When the income tax return is filed late.")
+]
+
+
+def write_laws(path, laws):
+    pd.DataFrame(laws, columns=["Law Type", "Law Name/Section", "Law Summary", "Applicability"]).to_csv(path, index=False)
+
+
+@pytest.fixture
+def stub_generator():
+    return StubEmbeddingGenerator()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    folder = tmp_path / "data"
+    folder.mkdir()
+    write_laws(folder / "ipc.csv", LAWS[:3])
+    write_laws(folder / "it.csv", LAWS[3:])
+    return folder
+
+
+@pytest.fixture
+def translation_service(monkeypatch):
+    # Imported here so the modules that don't translate run without googletrans
+    from app.services import translation_service as module
+    monkeypatch.setattr(module, "Translator", StubTranslator)
+    return module.TranslationService(max_workers=2)
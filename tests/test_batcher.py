@@ -0,0 +1,54 @@
+import threading
+import pytest
+from app.core.batcher import MicroBatcher
+
+
+def _submit_concurrently(batcher, items):
+    results = {}
+    start = threading.Barrier(len(items))
+
+    def call(item):
+        start.wait()
+        try:
+            results[item] = batcher.submit(item)
+        except Exception as e:
+            results[item] = e
+    threads = [threading.Thread(target=call, args=(item,)) for item in items]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_submits_share_a_batch():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(list(items)) or [item * 2 for item in items],
+                           max_batch_size=8, max_wait_ms=200, name="test_coalesce_batcher")
+    assert _submit_concurrently(batcher, [1, 2, 3, 4]) == {1: 2, 2: 4, 3: 6, 4: 8}
+    assert len(batches) < 4
+    assert sorted(item for batch in batches for item in batch) == [1, 2, 3, 4]
+
+
+def test_item_error_is_raised_in_its_caller_only():
+    batcher = MicroBatcher(lambda items: [ValueError(item) if item == "bad" else item.upper() for item in items],
+                           max_wait_ms=50, name="test_item_error_batcher")
+    results = _submit_concurrently(batcher, ["ok", "bad", "fine"])
+    assert (results["ok"], results["fine"]) == ("OK", "FINE")
+    assert isinstance(results["bad"], ValueError)
+    with pytest.raises(ValueError):
+        batcher.submit("bad")
+
+
+def test_batch_failure_reaches_every_caller():
+    def fail(items):
+        raise RuntimeError("model unavailable")
+    batcher = MicroBatcher(fail, max_wait_ms=50, name="test_batch_error_batcher")
+    results = _submit_concurrently(batcher, ["a", "b"])
+    assert all(isinstance(error, RuntimeError) for error in results.values())
+
+
+def test_wrong_number_of_results_is_an_error():
+    batcher = MicroBatcher(lambda items: [], max_wait_ms=0, name="test_short_batcher")
+    with pytest.raises(RuntimeError, match="returned 0 results for 1 items"):
+        batcher.submit("a")
@@ -0,0 +1,100 @@
+import threading
+from app.core import cache as cache_module
+from app.core.cache import LRUCache, ResponseCache, SQLiteResponseCache, create_response_cache, normalize_query
+
+
+def test_normalize_query():
+    assert normalize_query("  What IS   Section 302? ") == "what is section 302?"
+    assert normalize_query("ＩＰＣ 302") == "ipc 302"
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.put("a", 1)
+    lru.put("b", 2)
+    assert lru.get("a") == 1
+    lru.put("c", 3)
+    assert lru.get("b") is None
+    assert lru.get("a") == 1 and lru.get("c") == 3
+    assert lru.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "evictions": 1, "hit_rate": 0.75}
+
+
+def test_lru_with_zero_size_stores_nothing():
+    lru = LRUCache(maxsize=0)
+    lru.put("a", 1)
+    assert lru.get("a") is None and len(lru) == 0
+
+
+def test_expired_response_is_a_miss_and_frees_its_slot(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    responses = ResponseCache(maxsize=2, ttl=10)
+    responses.put(("q", "en", (), "v1"), {"answer": 1})
+    assert responses.get(("q", "en", (), "v1")) == {"answer": 1}
+    now[0] += 11
+    assert responses.get(("q", "en", (), "v1")) is None
+    stats = responses.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 0)
+
+
+def test_cached_response_cannot_be_mutated_by_callers():
+    responses = ResponseCache()
+    responses.put(("q", "en", (), "v1"), {"answer": [1]})
+    responses.get(("q", "en", (), "v1"))["answer"].append(2)
+    assert responses.get(("q", "en", (), "v1")) == {"answer": [1]}
+
+
+def test_invalidate_keeps_only_the_live_version():
+    responses = ResponseCache()
+    responses.put(("q", "en", (), "v1"), {"answer": 1})
+    responses.put(("q", "en", (), "v2"), {"answer": 2})
+    responses.invalidate(keep_version="v2")
+    assert responses.get(("q", "en", (), "v1")) is None
+    assert responses.get(("q", "en", (), "v2")) == {"answer": 2}
+
+
+def test_sqlite_cache_roundtrip_ttl_and_invalidation(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    responses = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), ttl=10)
+    responses.put(("q", "ta", (), "v1"), {"answer": "பதில்"})
+    responses.put(("q", "ta", (), "v2"), {"answer": "new"})
+    assert responses.get(("q", "ta", (), "v1")) == {"answer": "பதில்"}
+    # Other workers on the host share the file
+    assert SQLiteResponseCache(str(tmp_path / "cache.sqlite3")).get(("q", "ta", (), "v2")) == {"answer": "new"}
+
+    responses.invalidate(keep_version="v2")
+    assert responses.get(("q", "ta", (), "v1")) is None
+    now[0] += 11
+    assert responses.get(("q", "ta", (), "v2")) is None
+    assert (responses.stats()["hits"], responses.stats()["misses"]) == (1, 2)
+
+
+def test_sqlite_cache_trims_to_maxsize(tmp_path):
+    responses = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"), maxsize=3, trim_every=1)
+    for number in range(5):
+        responses.put((f"q{number}", "en", (), "v1"), {"answer": number})
+    assert responses.stats()["size"] == 3
+
+
+def test_sqlite_cache_counts_every_lookup_across_threads(tmp_path):
+    responses = SQLiteResponseCache(str(tmp_path / "cache.sqlite3"))
+    responses.put(("q", "en", (), "v1"), {"answer": 1})
+
+    def lookups():
+        for _ in range(50):
+            responses.get(("q", "en", (), "v1"))
+            responses.get(("other", "en", (), "v1"))
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (responses.stats()["hits"], responses.stats()["misses"]) == (400, 400)
+
+
+def test_create_response_cache(tmp_path):
+    assert create_response_cache("none") is None
+    assert create_response_cache("memory", maxsize=0) is None
+    assert isinstance(create_response_cache("memory"), ResponseCache)
+    assert isinstance(create_response_cache("sqlite", path=str(tmp_path / "c.sqlite3")), SQLiteResponseCache)
@@ -0,0 +1,78 @@
+import json
+import pytest
+from app.api.routes import sse_event
+from app.core.cache import ResponseCache
+from app.core.index_builder import IndexBuilder
+from app.services import translation_service as translation_module
+from app.services.chat_service import ChatService
+from app.services.retrieval_service import RetrievalService
+from conftest import StubTranslator
+
+
+class FailingTranslator(StubTranslator):
+    """Fails every text containing `marker`."""
+    marker = "fail"
+
+    def translate(self, text, dest='en', src='auto'):
+        if self.marker in text:
+            raise ConnectionError("translation backend unavailable")
+        return super().translate(text, dest=dest, src=src)
+
+
+@pytest.fixture
+def chat_service(data_dir, tmp_path, stub_generator, translation_service):
+    vector_store = IndexBuilder(str(data_dir), str(tmp_path / "index"), model_name="stub", load_workers=1).build(stub_generator)
+    return ChatService(RetrievalService(vector_store, stub_generator), translation_service, response_cache=ResponseCache())
+
+
+def test_batch_errors_stay_with_their_query(chat_service, monkeypatch):
+    monkeypatch.setattr(translation_module, "Translator", FailingTranslator)
+    responses = chat_service.process_batch([
+        {"query": "my phone was stolen"},
+        {"query": "   "},
+        {"query": "திருட்டு fail", "language": "ta"},
+        {"query": "someone misused my OTP", "language": "ta"}
+    ])
+    assert responses[0]["legal_references"] and "error" not in responses[0]
+    assert responses[1] == {"error": "Query is required"}
+    assert responses[2]["error"] == "Could not translate query"
+    assert responses[3]["legal_references"][0]["summary"].startswith("[ta] ")
+
+
+def test_batch_matches_single_queries(chat_service):
+    items = [{"query": "my phone was stolen"}, {"query": "cheating for money", "language": "ta"}]
+    single = [chat_service.process_query(item["query"], item.get("language", "en")) for item in items]
+    chat_service.response_cache.invalidate()
+    batch = chat_service.process_batch(items)
+    assert [response["legal_references"] for response in batch] == [response["legal_references"] for response in single]
+
+
+def test_stream_sends_answer_then_translations_then_done(chat_service):
+    events = list(chat_service.stream_query("my phone was stolen", "ta"))
+    names = [event for event, _ in events]
+    assert names[0] == "answer" and names[-1] == "done"
+    assert set(names[1:-1]) == {"translation"}
+    assert len(names) - 2 == events[0][1]["pending_translations"]
+    assert events[-1][1]["response"] == chat_service.process_query("my phone was stolen", "ta")
+
+    # The second request is served from the cache: nothing is left to translate
+    cached = list(chat_service.stream_query("my phone was stolen", "ta"))
+    assert [event for event, _ in cached] == ["answer", "done"]
+    assert cached[0][1]["pending_translations"] == 0
+
+
+def test_stream_reports_failed_translations(chat_service, monkeypatch):
+    monkeypatch.setattr(FailingTranslator, "marker", "stolen")
+    monkeypatch.setattr(translation_module, "Translator", FailingTranslator)
+    events = list(chat_service.stream_query("my phone was stolen", "ta"))
+    names = [event for event, _ in events]
+    assert names[0] == "answer" and names[-1] == "done"
+    assert "translation_error" in names
+    # Strings that could not be translated stay in English, and the response isn't cached
+    assert "is stolen" in events[-1][1]["response"]["main_answer"]
+    assert chat_service.response_cache.stats()["size"] == 0
+
+
+def test_sse_event():
+    assert sse_event("done", {"answer": "பதில்"}) == 'event: done\ndata: {"answer": "பதில்"}\n\n'
+    assert json.loads(sse_event("answer", {"n": 1}).split("data: ")[1]) == {"n": 1}
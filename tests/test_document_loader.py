@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+from app.core.document_loader import DocumentLoader
+
+
+def test_coalesce_skips_nan_and_blank_cells():
+    df = pd.DataFrame({
+        "Law Name / Code": [np.nan, "   ", "Section 1", None],
+        "Law Name/Section": ["Section 2", "Section 3", "Section 4", np.nan]
+    })
+    values = DocumentLoader._coalesce(df, ["Law Name / Code", "Law Name/Section"], "default")
+    assert values.tolist() == ["Section 2", "Section 3", "Section 1", "default"]
+
+
+def test_coalesce_all_missing_column_uses_default():
+    df = pd.DataFrame({"Law Summary": pd.Series([np.nan, np.nan], dtype=float), "Law Details": ["", None]})
+    values = DocumentLoader._coalesce(df, ["Law Summary", "Law Details"], "Information not available.")
+    assert values.tolist() == ["Information not available."] * 2
+
+
+def test_documents_never_contain_nan_text():
+    df = pd.DataFrame({
+        "Law Type": ["IPC"],
+        "Law Name/Section": ["IPC Section 302 - Murder"],
+        "Law Summary": [np.nan],
+        "Law Details": [np.nan],
+        "Applicability": ["  "]
+    })
+    doc = DocumentLoader("unused").to_documents(df, "test.csv")[0]
+    assert doc["summary"] == "Information not available."
+    assert doc["details"] == ""
+    assert doc["when_applicable"] == "Information not available."
+    assert "nan" not in doc["combined_text"]
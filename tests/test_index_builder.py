@@ -0,0 +1,102 @@
+import json
+import numpy as np
+from app.core.index_builder import IndexBuilder
+from conftest import LAWS, write_laws
+
+
+def _builder(data_dir, tmp_path, name="index", **kwargs):
+    return IndexBuilder(str(data_dir), str(tmp_path / name), model_name="stub", load_workers=1, **kwargs)
+
+
+def _snapshot(vector_store):
+    vector_store.finalize()
+    chunks = {
+        int(chunk_id): (vector_store.documents[doc_row]["doc_id"], int(offset), int(length))
+        for chunk_id, doc_row, offset, length in zip(vector_store.chunk_ids, vector_store.chunk_doc,
+                                                     vector_store.chunk_offset, vector_store.chunk_length)
+    }
+    return sorted(doc["doc_id"] for doc in vector_store.documents), chunks
+
+
+def test_incremental_ingest_matches_full_rebuild(data_dir, tmp_path, stub_generator):
+    builder = _builder(data_dir, tmp_path)
+    builder.build(stub_generator)
+    # Change one row, drop one, add one and remove a whole file
+    write_laws(data_dir / "ipc.csv", [LAWS[0], (*LAWS[1][:2], "Theft of movable property, amended.", LAWS[1][3]), LAWS[5]])
+    (data_dir / "it.csv").unlink()
+    write_laws(data_dir / "tax.csv", [LAWS[4]])
+    ingested = builder.ingest(stub_generator)
+
+    rebuilt = _builder(data_dir, tmp_path, name="rebuilt").build(stub_generator)
+    assert _snapshot(ingested) == _snapshot(rebuilt)
+    assert ingested.index.ntotal == rebuilt.index.ntotal == rebuilt.num_chunks
+    assert len(ingested.lexical) == len(rebuilt.lexical)
+    assert ingested.lexical.postings == rebuilt.lexical.postings
+
+    query = stub_generator.model.encode(["my phone was stolen"])
+    assert [hit["document"]["doc_id"] for hit in ingested.search(query, k=3)] == \
+           [hit["document"]["doc_id"] for hit in rebuilt.search(query, k=3)]
+
+
+def test_unchanged_rows_keep_their_chunk_ids(data_dir, tmp_path, stub_generator):
+    builder = _builder(data_dir, tmp_path)
+    _, before = _snapshot(builder.build(stub_generator))
+    write_laws(data_dir / "ipc.csv", LAWS[:2])
+    _, after = _snapshot(builder.ingest(stub_generator))
+
+    removed_doc = {doc_id for doc_id, _, _ in before.values()} - {doc_id for doc_id, _, _ in after.values()}
+    assert len(removed_doc) == 1
+    assert {chunk_id: chunk for chunk_id, chunk in before.items() if chunk[0] not in removed_doc} == after
+
+
+def test_snapshot_is_current_until_inputs_change(data_dir, tmp_path, stub_generator):
+    builder = _builder(data_dir, tmp_path)
+    assert not builder.is_current()
+    vector_store = builder.build(stub_generator)
+    assert builder.is_current()
+    assert builder.read_manifest()["version"] == vector_store.version
+    assert builder.load_or_build(stub_generator).version == vector_store.version
+
+    # Other splitter settings make the snapshot stale and force a full rebuild
+    rechunked = _builder(data_dir, tmp_path, chunk_size=120, chunk_overlap=10)
+    assert not rechunked.is_current()
+    assert not IndexBuilder._same_settings(builder.read_manifest(), rechunked.compute_manifest())
+
+    write_laws(data_dir / "it.csv", LAWS[3:5])
+    assert not builder.is_current()
+    assert IndexBuilder._same_settings(builder.read_manifest(), builder.compute_manifest())
+    assert builder.load_or_build(stub_generator).version == builder.compute_manifest()["version"]
+    assert builder.is_current()
+
+
+def test_manifest_ignores_unrelated_index_params(data_dir, tmp_path):
+    flat = _builder(data_dir, tmp_path, index_type="flat_ip", index_params={"nlist": 8, "hnsw_m": 16})
+    other = _builder(data_dir, tmp_path, index_type="flat_ip", index_params={"nlist": 64, "hnsw_m": 32})
+    assert flat.compute_manifest()["version"] == other.compute_manifest()["version"]
+    hnsw = _builder(data_dir, tmp_path, index_type="hnsw", index_params={"hnsw_m": 16})
+    assert hnsw.compute_manifest()["version"] != flat.compute_manifest()["version"]
+
+
+def test_ingest_extends_a_carried_over_phrasebook(data_dir, tmp_path, stub_generator):
+    class Translator:
+        def build_phrasebook(self, texts, dest='ta', existing=None):
+            return {text: (existing or {}).get(text, f"[{dest}] {text}") for text in texts}
+
+    texts_for_document = lambda doc: [doc["summary"], doc["when_applicable"]]
+    builder = _builder(data_dir, tmp_path, translation_service=Translator(), texts_for_document=texts_for_document)
+    vector_store = builder.build(stub_generator)
+    builder.build_translations(vector_store, Translator(), texts_for_document, ["ta"])
+
+    write_laws(data_dir / "tax.csv", [("Taxation", "Income Tax Act Section 139", "Filing of returns.", "Every taxpayer.")])
+    vector_store = builder.ingest(stub_generator)
+    with open(tmp_path / "index" / "snapshots" / vector_store.version / "translations.json", encoding="utf-8") as f:
+        phrasebook = json.load(f)["ta"]
+    assert phrasebook["Filing of returns."] == "[ta] Filing of returns."
+    assert builder.load_translations()["ta"] == phrasebook
+
+
+def test_streamed_build_matches_single_batch(data_dir, tmp_path, stub_generator):
+    single = _builder(data_dir, tmp_path, name="single", load_chunksize=None).build(stub_generator)
+    streamed = _builder(data_dir, tmp_path, name="streamed", load_chunksize=1).build(stub_generator)
+    assert _snapshot(single) == _snapshot(streamed)
+    assert np.all(np.diff(streamed.chunk_ids) > 0)
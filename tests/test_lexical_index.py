@@ -0,0 +1,76 @@
+from app.core.lexical_index import LexicalIndex, tokenize
+from app.services.retrieval_service import RetrievalService
+
+DOCS = [
+    {"doc_id": "a", "combined_text": "IT Act Section 66C identity theft password OTP"},
+    {"doc_id": "b", "combined_text": "IPC Section 379 theft of movable property phone"},
+    {"doc_id": "c", "combined_text": "IPC Section 420 cheating property money"},
+    {"doc_id": "d", "combined_text": "IT Act Section 66D cheating by personation online"}
+]
+
+
+def _index(documents):
+    index = LexicalIndex()
+    index.add_documents(documents)
+    return index
+
+
+def test_tokenize():
+    assert tokenize("Section 66C, u/s 139(1)") == ["section", "66c", "u", "s", "139", "1"]
+
+
+def test_exact_tokens_rank_first():
+    index = _index(DOCS)
+    assert index.search("section 66c", k=1)[0][0] == "a"
+    assert {doc_id for doc_id, _ in index.search("theft")} == {"a", "b"}
+    assert index.search("unrelated words") == []
+
+
+def test_add_and_remove_match_a_rebuild():
+    index = _index(DOCS[:3])
+    index.search("theft")
+    index.add_documents([{"doc_id": "b", "combined_text": "IPC Section 379 theft amended"}, DOCS[3]])
+    index.remove_documents(["a", "missing"])
+    rebuilt = _index([{"doc_id": "b", "combined_text": "IPC Section 379 theft amended"}, DOCS[2], DOCS[3]])
+    assert index.postings == rebuilt.postings
+    assert index.doc_lengths == rebuilt.doc_lengths and index.total_length == rebuilt.total_length
+    assert index.search("theft cheating", k=3) == rebuilt.search("theft cheating", k=3)
+
+
+def test_save_and_load(tmp_path):
+    index = _index(DOCS)
+    index.save(str(tmp_path / "lexical.pkl"))
+    loaded = LexicalIndex()
+    loaded.load(str(tmp_path / "lexical.pkl"))
+    loaded.remove_documents(["a"])
+    index.remove_documents(["a"])
+    assert loaded.postings == index.postings and loaded.total_length == index.total_length
+
+
+def _hit(doc_id, score, chunk_text="chunk"):
+    return {"document": {"doc_id": doc_id}, "chunk_text": chunk_text, "score": score}
+
+
+def test_reciprocal_rank_fusion():
+    retrieval = RetrievalService.__new__(RetrievalService)
+    retrieval.rrf_k = 60
+    retrieval.collapse_documents = True
+    dense = [_hit("a", 0.9), _hit("b", 0.8), _hit("c", 0.7)]
+    lexical = [_hit("c", 12.0), _hit("d", 9.0)]
+    results, stats = retrieval._fuse(dense, {"chunk_hits": 3}, lexical, k=3)
+
+    assert [entry["document"]["doc_id"] for entry in results] == ["c", "a", "b"]
+    assert results[0]["score"] == 1 / 63 + 1 / 61
+    assert (results[0]["dense_score"], results[0]["lexical_score"]) == (0.7, 12.0)
+    assert (results[1]["score"], results[1]["lexical_score"]) == (1 / 61, None)
+    assert stats == {"chunk_hits": 3, "lexical_hits": 2, "collapsed_hits": 4}
+
+
+def test_fusion_keeps_chunks_apart_without_collapsing():
+    retrieval = RetrievalService.__new__(RetrievalService)
+    retrieval.rrf_k = 60
+    retrieval.collapse_documents = False
+    dense = [_hit("a", 0.9, "first"), _hit("a", 0.8, "second")]
+    lexical = [_hit("a", 5.0, "first")]
+    results, _ = retrieval._fuse(dense, {}, lexical, k=5)
+    assert [(entry["chunk_text"], entry["score"]) for entry in results] == [("first", 2 / 61), ("second", 1 / 62)]
@@ -0,0 +1,38 @@
+from app.core.section_index import SectionIndex, parse_statute_reference
+
+
+def test_parse_statute_reference():
+    assert parse_statute_reference("IPC 302") == ("ipc", "302")
+    assert parse_statute_reference("What is Sec. 420 of the Indian Penal Code?") == ("ipc", "420")
+    assert parse_statute_reference("u/s 41 CrPC") == ("crpc", "41")
+    assert parse_statute_reference("Section 66C") == (None, "66c")
+    assert parse_statute_reference("66D IT Act") == ("it", "66d")
+    assert parse_statute_reference("someone stole my phone") is None
+    assert parse_statute_reference("IPC 302 punishment for murder") is None
+
+
+def test_slash_suffixes_expand_to_each_section():
+    doc = {"doc_id": "tax", "law_category": "Taxation", "law_name": "Income Tax Act Section 234A/B/C - Interest"}
+    assert SectionIndex.keys_for(doc) == [("income tax", "234a"), ("income tax", "234b"), ("income tax", "234c")]
+
+    index = SectionIndex()
+    index.add_documents([doc, {"doc_id": "murder", "law_category": "IPC", "law_name": "IPC Section 302 - Murder"}])
+    assert index.lookup("income tax", "234b") == ["tax"]
+    assert index.lookup(None, "234c") == ["tax"]
+    assert index.lookup("ipc", "234a") == []
+    assert index.lookup(None, "302") == ["murder"]
+
+
+def test_act_in_the_name_wins_over_the_category():
+    doc = {"doc_id": "x", "law_category": "Cybercrime", "law_name": "Section 420 IPC - Online cheating"}
+    assert SectionIndex.keys_for(doc) == [("ipc", "420")]
+    assert SectionIndex.keys_for({"doc_id": "y", "law_category": "Unknown", "law_name": "Section 5"}) == []
+
+
+def test_remove_and_replace():
+    index = SectionIndex()
+    index.add_documents([{"doc_id": "a", "law_category": "IT Act", "law_name": "IT Act Section 66C - Identity theft"}])
+    index.add_documents([{"doc_id": "a", "law_category": "IT Act", "law_name": "IT Act Section 66D - Personation"}])
+    assert (index.lookup("it", "66c"), index.lookup("it", "66d")) == ([], ["a"])
+    index.remove_documents(["a"])
+    assert index.lookup(None, "66d") == [] and len(index) == 0
@@ -0,0 +1,34 @@
+def test_tamil_script_is_decided_by_script(translation_service):
+    assert translation_service.detect_language_with_tier("எனது தொலைபேசி திருடப்பட்டது") == ("ta", "script")
+    assert translation_service.detect_language_with_tier("IPC 302 பற்றி சொல்லுங்கள்") == ("ta", "script")
+
+
+def test_text_without_letters_is_english(translation_service):
+    assert translation_service.detect_language_with_tier("302") == ("en", "script")
+
+
+def test_known_english_words_skip_langdetect(translation_service):
+    assert translation_service.detect_language_with_tier("what is the punishment for theft") == ("en", "vocabulary")
+    assert translation_service.detect_language_with_tier("cyber fraud complaint")[1] != "vocabulary"
+    translation_service.set_vocabulary(frozenset({"cyber", "fraud", "complaint"}))
+    assert translation_service.detect_language_with_tier("cyber fraud complaint") == ("en", "vocabulary")
+
+
+def test_romanized_tamil_goes_to_the_remote_tier(translation_service):
+    translation_service.set_vocabulary(frozenset({"complaint"}))
+    assert translation_service.detect_language_with_tier("enakku complaint kodukkanum") == ("ta", "remote")
+
+
+def test_unfamiliar_latin_text_is_decided_by_langdetect(translation_service):
+    lang, tier = translation_service.detect_language_with_tier(
+        "Quelle est la peine prévue pour le vol d'un téléphone portable dans la loi indienne?")
+    assert (lang, tier) == ("fr", "langdetect")
+    assert translation_service.stats()["detection_tiers"]["langdetect"] == 1
+
+
+def test_phrasebook_entries_are_reused(translation_service):
+    phrasebook = translation_service.build_phrasebook(["Theft", "Murder", " ", "Theft"], existing={"Murder": "கொலை"})
+    assert phrasebook == {"Murder": "கொலை", "Theft": "[ta] Theft"}
+    translation_service.set_phrasebook({"ta": phrasebook})
+    assert translation_service.translate_batch(["Murder", "Cheating", "Murder"]) == ["கொலை", "[ta] Cheating", "கொலை"]
+    assert (translation_service.phrasebook_hits, translation_service.phrasebook_misses) == (1, 1)